@@ -0,0 +1,115 @@
+"""
+Gemini calls and latency of /api/analyze-text with llm_fallback under a burst:
+every paragraph of a page is sent at once, as a frontend highlighting a long
+article would. Runs with the micro-batcher off (one Gemini call per text) and
+on, then sends the same page through /api/analyze-text/batch. Without
+batching the burst queues past the analyze latency budget and part of it is
+shed: those texts only get their local matches (llm_fallback_skipped).
+Each round uses new paragraphs, so the per-text LLM cache does not help.
+Usage: python bench_analyze_batch.py [paragraphs] [gemini_delay_seconds]
+"""
+import asyncio
+import os
+import sys
+import time
+
+FAKE_PORT = 8786
+APP_PORT = 8787
+
+os.environ.update({
+    "GEMINI_API_KEY": "fake",
+    "GEMINI_BASE_URL": f"http://127.0.0.1:{FAKE_PORT}",
+    "LLM_CACHE_PATH": "",
+    "SHARED_SNAPSHOT_PATH": "",
+    "QUIZ_POOL_SIZE": "0",
+    "LLM_REQUESTS_PER_MINUTE": "0",
+    "LLM_REQUESTS_PER_DAY": "0",
+})
+
+import httpx  # noqa: E402
+
+import main  # noqa: E402  (configured through the environment above)
+from bench_nonblocking import start_server  # noqa: E402
+from fake_gemini import create_app  # noqa: E402
+
+PARAGRAPH = (
+    "Paragraph {i} of the round {r} briefing: delegates from Norvania and Castoria met in Geneva "
+    "to discuss the border accord, while Presidente Amaral urged a ceasefire."
+)
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p / 100))]
+
+
+def page(paragraphs: int, round_id: int):
+    return [PARAGRAPH.format(i=i, r=round_id) for i in range(paragraphs)]
+
+
+async def burst(client: httpx.AsyncClient, texts):
+    async def one(text):
+        start = time.perf_counter()
+        resp = await client.post("/api/analyze-text", json={"text": text, "llm_fallback": True})
+        resp.raise_for_status()
+        result = resp.json()
+        return time.perf_counter() - start, None if result["llm_fallback_skipped"] else result["entities"]
+
+    return await asyncio.gather(*(one(text) for text in texts))
+
+
+async def run(fake, paragraphs: int):
+    results = {}
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{APP_PORT}", timeout=300) as client:
+        for round_id, (label, batch_size) in enumerate((("one call per text", 1), ("micro-batched", 16))):
+            main.analyze_batcher.max_items = batch_size
+            calls = fake.state.calls
+            start = time.perf_counter()
+            answers = await burst(client, page(paragraphs, round_id))
+            total = time.perf_counter() - start
+            latencies = [latency for latency, _ in answers]
+            served = [(entities, text) for (_, entities), text in zip(answers, page(paragraphs, round_id)) if entities is not None]
+            anchored = all(entity["text"] == text[entity["start"]:entity["end"]] for entities, text in served for entity in entities)
+            found = sum(len(entities) for entities, _ in served)
+            shed = len(answers) - len(served)
+            results[label] = (fake.state.calls - calls, percentile(latencies, 95), found, anchored, shed)
+            print(f"  {label:<20} Gemini calls {fake.state.calls - calls:3d}   burst {total:5.2f}s   "
+                  f"p50 {percentile(latencies, 50):5.2f}s p95 {percentile(latencies, 95):5.2f}s   "
+                  f"shed {shed:2d}   entities {found}   offsets {'ok' if anchored else 'WRONG'}")
+
+        calls = fake.state.calls
+        texts = page(paragraphs, 2)
+        start = time.perf_counter()
+        resp = await client.post("/api/analyze-text/batch", json={"texts": texts, "llm_fallback": True})
+        resp.raise_for_status()
+        found = sum(len(result["entities"]) for result in resp.json()["results"])
+        print(f"  {'batch endpoint':<20} Gemini calls {fake.state.calls - calls:3d}   request {time.perf_counter() - start:5.2f}s   "
+              f"entities {found}")
+        results["batch endpoint"] = (fake.state.calls - calls, None, found, True, 0)
+    return results
+
+
+if __name__ == "__main__":
+    paragraphs = int(sys.argv[1]) if len(sys.argv) > 1 else 64
+    delay = float(sys.argv[2]) if len(sys.argv) > 2 else 1.0
+
+    fake = create_app(delay=delay, structured=True)
+    start_server(fake, FAKE_PORT)
+    start_server(main.app, APP_PORT)
+    print(f"{paragraphs} paragraphs at once; fake Gemini {delay}s per call, "
+          f"{main.GEMINI_MAX_CONCURRENCY} concurrent calls, batch window {main.analyze_batcher.window * 1000:.0f} ms")
+    results = asyncio.run(run(fake, paragraphs))
+
+    single, batched, endpoint = results["one call per text"], results["micro-batched"], results["batch endpoint"]
+    # Every text has the same number of mentions, so shed texts are the only difference
+    per_text = batched[2] / paragraphs
+    if (
+        batched[0] * 10 <= paragraphs and endpoint[0] * 10 <= paragraphs
+        and batched[4] == 0 and batched[2] == endpoint[2] == per_text * paragraphs
+        and single[2] == per_text * (paragraphs - single[4]) and batched[3] and single[3]
+        and batched[1] < single[1]
+    ):
+        print(f"\n✅ Gemini calls {single[0]} -> {batched[0]} for {paragraphs} texts, none shed, "
+              f"same entities per text; p95 {single[1]:.2f}s -> {batched[1]:.2f}s")
+    else:
+        print("\n❌ Batching did not cut Gemini calls tenfold, shed or lost entities, or was slower")
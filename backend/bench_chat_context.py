@@ -0,0 +1,149 @@
+"""
+Chat prompt size, grounding and latency: the retrieval-augmented prompt of
+chat_context against the previous prompt (context names plus the last five
+history messages, untrimmed).
+Each question is asked after a short conversation, a long one and one where
+the user pasted an article, against a local fake Gemini server whose latency
+grows with the prompt (prompt_delay seconds per 1000 tokens). A question
+counts as grounded when the dataset's description of the event or figure it
+is about made it into the prompt.
+Usage: python bench_chat_context.py [rounds] [prompt_delay_seconds]
+"""
+import os
+import sys
+import time
+
+from fake_gemini import create_app
+from bench_nonblocking import start_server
+
+FAKE_PORT = 8778
+
+os.environ.update({
+    "GEMINI_API_KEY": "fake",
+    "GEMINI_BASE_URL": f"http://127.0.0.1:{FAKE_PORT}",
+    "LLM_CACHE_PATH": "",
+    "QUIZ_POOL_SIZE": "0",
+    "LLM_REQUESTS_PER_MINUTE": "0",
+    "LLM_REQUESTS_PER_DAY": "0",
+})
+
+import main  # noqa: E402  (configured through the environment above)
+from fastapi.testclient import TestClient  # noqa: E402
+
+# (question, context sent by the frontend, event title or figure name the answer depends on)
+QUESTIONS = [
+    ("Who won the 2024 presidential election?", {"country": "United States of America"}, "2024 Presidential Election"),
+    ("Why did people protest the pension reform?", {"country": "France"}, "Pension Reform Protests"),
+    ("What happened to Shinzo Abe?", {"country": "Japan"}, "Assassination of Shinzo Abe"),
+    ("What was the Abraham Accords about?", {"country": "Israel"}, "Abraham Accords Normalization"),
+    ("How did the Freedom Convoy end?", {"country": "Canada"}, "Freedom Convoy Protests"),
+    ("What is AUKUS?", {"country": "Australia"}, "AUKUS Security Pact"),
+    ("Tell me about the Brexit referendum", {"country": "United Kingdom"}, "Brexit Referendum Vote"),
+    ("Why was Nord Stream 2 suspended?", {"country": "Germany"}, "Nord Stream 2 Suspension"),
+    ("What did Nazarbayev do after independence?", {"figure": "Nursultan Nazarbayev"}, "Nursultan Nazarbayev"),
+    ("How did Lula come back to power?", {"country": "Brazil"}, "Lula's Political Comeback"),
+]
+
+# Earlier turns: short user questions, assistant answers of the requested 2-3 paragraphs
+ANSWER = ("Political developments rarely have a single cause. " * 12 + "\n\n") * 3
+ARTICLE = "Paste of a long news article about the region and its politics. " * 400
+CONVERSATIONS = {
+    "short conversation": [{"role": "user", "content": "Hi"}, {"role": "assistant", "content": "Hello! Ask me anything."}],
+    "long conversation": [
+        {"role": role, "content": f"Earlier question {i}?" if role == "user" else ANSWER}
+        for i in range(6) for role in ("user", "assistant")
+    ],
+    "pasted article": [{"role": "user", "content": ARTICLE}, {"role": "assistant", "content": ANSWER}],
+}
+
+
+def dataset_text(name: str) -> str:
+    """Start of the description of the event titled name, or of the biography of the figure"""
+    for country in main.COUNTRIES_DB.values():
+        for event in country.current_events:
+            if event.title == name:
+                return event.description[:60]
+        for figure in country.historical_figures:
+            if figure.name == name:
+                return figure.biography[:60]
+    raise KeyError(name)
+
+
+def legacy_prompt(request: main.ChatRequest) -> str:
+    """The chat prompt before retrieval: context names and the last 5 history messages"""
+    context_info = ""
+    if request.context:
+        if "country" in request.context:
+            context_info += f"\nUser is currently viewing: {request.context['country']}"
+        if "event" in request.context:
+            context_info += f"\nRelated event: {request.context['event']}"
+    history_text = ""
+    for msg in (request.history or [])[-5:]:
+        history_text += f"\n{msg.role.upper()}: {msg.content}"
+    return f"""
+You are an expert AI Political Navigator assistant helping users understand 21st century politics.
+You provide clear, balanced, factual information about political events, policies, and figures.
+
+{context_info}
+
+Previous conversation:
+{history_text}
+
+User question: {request.message}
+
+Provide a clear, informative response. Be objective and cite relevant historical context when helpful.
+Keep your response concise (2-3 paragraphs maximum).
+"""
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))] if ordered else float("nan")
+
+
+def measure(label: str, build, client: TestClient, history: list, rounds: int):
+    main._build_chat_prompt = build
+    latencies, tokens, grounded = [], [], 0
+    for round_ in range(rounds):
+        for question, context, source in QUESTIONS:
+            request = main.ChatRequest(message=f"{question} ({round_})", context=context, history=history)
+            prompt = build(request)
+            tokens.append(len(prompt) / 4)
+            grounded += dataset_text(source) in prompt
+            start = time.perf_counter()
+            resp = client.post("/api/chat", json=request.model_dump())
+            latencies.append(time.perf_counter() - start)
+            resp.raise_for_status()
+    total = len(latencies)
+    print(f"  {label:<17} prompt tokens mean {sum(tokens) / total:6.0f} max {max(tokens):6.0f}   "
+          f"grounded {grounded:2d}/{total}   latency p50 {percentile(latencies, 50):.2f}s p95 {percentile(latencies, 95):.2f}s")
+    return max(tokens), grounded, percentile(latencies, 95)
+
+
+if __name__ == "__main__":
+    rounds = int(sys.argv[1]) if len(sys.argv) > 1 else 2
+    prompt_delay = float(sys.argv[2]) if len(sys.argv) > 2 else 0.5
+
+    fake = create_app(delay=0.2, prompt_delay=prompt_delay)
+    start_server(fake, FAKE_PORT)
+    print(f"{len(QUESTIONS)} questions x {rounds} rounds per conversation; "
+          f"fake Gemini 0.2s + {prompt_delay}s per 1000 prompt tokens, budget {main.CHAT_PROMPT_TOKENS} tokens")
+
+    retrieval = main._build_chat_prompt
+    results = {}
+    with TestClient(main.app) as client:
+        for name, history in CONVERSATIONS.items():
+            print(f"\n{name} ({sum(len(m['content']) for m in history)} chars of history)")
+            results[name] = (
+                measure("previous prompt", legacy_prompt, client, history, rounds),
+                measure("retrieval prompt", retrieval, client, history, rounds),
+            )
+
+    within_budget = all(new[0] <= main.CHAT_PROMPT_TOKENS * 1.05 for _, new in results.values())
+    more_grounded = all(new[1] > old[1] for old, new in results.values())
+    legacy_worst = max(old[2] for old, _ in results.values())
+    new_worst = max(new[2] for _, new in results.values())
+    if within_budget and more_grounded and new_worst < legacy_worst:
+        print(f"\n✅ Prompts stayed within budget and carried the dataset facts; worst p95 {legacy_worst:.2f}s -> {new_worst:.2f}s")
+    else:
+        print("\n❌ Retrieval prompt missed its budget, grounding or latency target")
@@ -0,0 +1,211 @@
+"""
+Relationship queries over the entity graph against answering them by
+scanning the DB, the way a client linking related_* names has to today.
+1. Builds a synthetic world (countries whose events and figures name other
+   countries and figures, with the spelling variations seen in the data),
+   then times: who is connected to a figure (neighbors), what lies within
+   two hops of a country, and the shortest connection between two countries.
+   The scan baseline resolves names with the same rules on every query.
+2. Write cost: re-indexing one country in place against rebuilding the graph.
+3. The same queries over HTTP on the real data, checked against the graph.
+Usage: python bench_entity_graph.py [countries] [events_per_country]
+"""
+import os
+import random
+import sys
+import time
+from collections import deque
+
+APP_PORT = 8788
+
+os.environ.update({
+    "GEMINI_API_KEY": "",
+    "LLM_CACHE_PATH": "",
+    "SHARED_SNAPSHOT_PATH": "",
+    "QUIZ_POOL_SIZE": "0",
+})
+
+import httpx  # noqa: E402
+
+import main  # noqa: E402  (configured through the environment above)
+from bench_nonblocking import start_server  # noqa: E402
+from entity_graph import EntityGraph, normalize_name  # noqa: E402
+from entity_matcher import COUNTRY_ALIASES  # noqa: E402
+from main import Country  # noqa: E402
+
+
+def synthetic_world(count: int, events: int, figures: int = 8, seed: int = 7):
+    rng = random.Random(seed)
+    names = [f"Republic of Land {i}" for i in range(count)]
+    figure_names = [[f"Leader {j} of Land {i}" for j in range(figures)] for i in range(count)]
+
+    def spelled(name):
+        # The data writes names with varying case and punctuation
+        return rng.choice([name, name.upper(), f"the {name}", name.replace(" ", "  ")])
+
+    world = []
+    for i in range(count):
+        world.append(Country(
+            id=f"land_{i}", name=names[i], code=f"L{i:04d}", capital=f"Capital {i}", population=1_000_000,
+            gdp=1.0, government_type="Republic",
+            current_events=[{
+                "id": f"event_{k}", "title": f"Summit {k} of Land {i}", "date": f"2020-01-{k % 28 + 1:02d}",
+                "category": "foreign_policy", "severity": "medium", "description": "Talks.",
+                "related_countries": [spelled(names[rng.randrange(count)]) for _ in range(3)] + ["Several nations"],
+                "related_figures": [spelled(rng.choice(figure_names[rng.randrange(count)])) for _ in range(2)],
+            } for k in range(events)],
+            historical_figures=[{
+                "id": f"land_{i}_leader_{j}", "name": figure_names[i][j], "role": "President", "birth_year": 1950,
+                "death_year": None, "biography": "Led the country.", "achievements": [],
+                "related_countries": [names[i]],
+            } for j in range(figures)],
+        ))
+    return world
+
+
+# --- scan baseline: resolve names from the DB on every query ---
+
+def scan_resolver(world):
+    """name -> node key, built per query as a client has to"""
+    countries, figures = {}, {}
+    for country in world:
+        for name in (country.id, country.name, country.code, *COUNTRY_ALIASES.get(country.code, [])):
+            countries[normalize_name(name)] = f"country:{country.id}"
+        for figure in country.historical_figures:
+            figures[normalize_name(figure.name)] = f"figure:{figure.id}"
+    return countries, figures
+
+
+def scan_graph(world):
+    """Adjacency of every node, from one pass over the DB"""
+    countries, figures = scan_resolver(world)
+    adjacency = {}
+
+    def link(a, b):
+        if a is not None and b is not None and a != b:
+            adjacency.setdefault(a, set()).add(b)
+            adjacency.setdefault(b, set()).add(a)
+
+    for country in world:
+        this = f"country:{country.id}"
+        for event in country.current_events:
+            node = f"event:{country.id}/{event.id}"
+            link(this, node)
+            for name in event.related_countries:
+                link(node, countries.get(normalize_name(name)))
+            for name in event.related_figures:
+                link(node, figures.get(normalize_name(name)))
+        for figure in country.historical_figures:
+            node = f"figure:{figure.id}"
+            link(this, node)
+            for name in figure.related_countries:
+                link(node, countries.get(normalize_name(name)))
+    return adjacency
+
+
+def scan_path_length(world, source, target):
+    adjacency = scan_graph(world)
+    distance = {source: 0}
+    queue = deque([source])
+    while queue:
+        node = queue.popleft()
+        if node == target:
+            return distance[node]
+        for neighbor in adjacency.get(node, ()):
+            if neighbor not in distance:
+                distance[neighbor] = distance[node] + 1
+                queue.append(neighbor)
+    return None
+
+
+def timed(fn, rounds=1):
+    start = time.perf_counter()
+    for _ in range(rounds):
+        result = fn()
+    return result, (time.perf_counter() - start) / rounds * 1000
+
+
+def measure_queries(world) -> bool:
+    graph = EntityGraph()
+    _, build_ms = timed(lambda: [graph.index_country(country) for country in world])
+    stats = graph.stats()
+    print(f"{len(world)} countries: {stats['nodes']} nodes, {stats['edges']} edges, "
+          f"{stats['unresolved_names']} unresolved names, built in {build_ms:.0f} ms")
+
+    figure = f"figure:{world[len(world) // 2].historical_figures[0].id}"
+    country = f"country:{world[1].id}"
+    source, target = f"country:{world[0].id}", f"country:{world[-1].id}"
+
+    scan_found, scan_ms = timed(lambda: scan_graph(world).get(figure, set()))
+    graph_found, graph_ms = timed(lambda: graph.neighbors(figure, limit=10_000), rounds=200)
+    neighbors_ok = {n["node"] for n in graph_found["neighbors"]} == scan_found
+    print(f"  neighbors of a figure   scan {scan_ms:8.2f} ms   graph {graph_ms:6.3f} ms   "
+          f"{len(scan_found)} nodes, {'same' if neighbors_ok else 'DIFFERENT'}")
+
+    def scan_two_hops():
+        adjacency = scan_graph(world)
+        first = adjacency.get(country, set())
+        return first.union(*(adjacency[node] for node in first)) - {country}
+
+    scan_hops, scan_ms = timed(scan_two_hops)
+    graph_hops, graph_ms = timed(lambda: graph.expand(country, 2, limit=100_000), rounds=20)
+    expand_ok = {n["node"] for n in graph_hops["nodes"]} == scan_hops
+    print(f"  2 hops from a country   scan {scan_ms:8.2f} ms   graph {graph_ms:6.3f} ms   "
+          f"{len(scan_hops)} nodes, {'same' if expand_ok else 'DIFFERENT'}")
+
+    scan_length, scan_ms = timed(lambda: scan_path_length(world, source, target))
+    path, graph_ms = timed(lambda: graph.shortest_path(source, target, max_hops=12), rounds=50)
+    path_ok = path and len(path) - 1 == scan_length and all(
+        graph._lookup.get(b["node"]) in graph._adjacency[graph._lookup.get(a["node"])] for a, b in zip(path, path[1:])
+    )
+    print(f"  path between countries  scan {scan_ms:8.2f} ms   graph {graph_ms:6.3f} ms   "
+          f"{scan_length} hops, {'same length' if path_ok else 'DIFFERENT'}")
+
+    changed = world[3].model_copy(update={"current_events": world[3].current_events[1:]})
+    _, write_ms = timed(lambda: (graph.index_country(changed), graph.index_country(world[3])), rounds=50)
+    rebuilt = EntityGraph()
+    _, rebuild_ms = timed(lambda: [rebuilt.index_country(country) for country in world])
+    same_after = rebuilt.stats() == graph.stats() and rebuilt.neighbors(figure) == graph.neighbors(figure)
+    print(f"  one country write       re-index {write_ms / 2:6.3f} ms   full rebuild {rebuild_ms:7.1f} ms   "
+          f"{'consistent' if same_after else 'INCONSISTENT'} with a rebuild")
+    return neighbors_ok and expand_ok and bool(path_ok) and same_after
+
+
+def measure_http() -> bool:
+    country = next(iter(main.COUNTRIES_DB.values()))
+    event = country.current_events[0]
+    node = f"event:{country.id}/{event.id}"
+    with httpx.Client(base_url=f"http://127.0.0.1:{APP_PORT}") as client:
+        neighbors = client.get("/api/graph/neighbors", params={"node": node}).json()
+        expand = client.get("/api/graph/expand", params={"node": f"country:{country.id}", "hops": 2, "type": "figure"}).json()
+        other = list(main.COUNTRIES_DB)[-1]
+        path = client.get("/api/graph/path", params={"source": f"country:{country.id}", "target": f"country:{other}"})
+        missing = client.get("/api/graph/neighbors", params={"node": "country:atlantis"}).status_code
+
+    linked = {n["name"] for n in neighbors["neighbors"]}
+    print(f"\nHTTP on political_data.json: {event.title!r}")
+    print(f"  related names {event.related_countries + event.related_figures}")
+    print(f"  linked {sorted(linked)}, unresolved {neighbors['unresolved']}")
+    print(f"  {len(expand['nodes'])} figures within 2 hops of {country.name}; "
+          f"path to {other}: {path.json().get('hops') if path.status_code == 200 else path.status_code}")
+    written = event.related_countries + event.related_figures
+    return (
+        missing == 404
+        and set(neighbors["unresolved"]) <= set(written)
+        and len(neighbors["unresolved"]) < len(written)
+        and all(n["type"] == "figure" for n in expand["nodes"])
+    )
+
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 300
+    events = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+
+    queries_ok = measure_queries(synthetic_world(count, events))
+    start_server(main.app, APP_PORT)
+    http_ok = measure_http()
+
+    if queries_ok and http_ok:
+        print("\n✅ Graph answers match the DB scan, writes re-index one country, endpoints resolve related names")
+    else:
+        print("\n❌ Graph answers differ from the DB scan, or the endpoints did not resolve related names")
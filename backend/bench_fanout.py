@@ -0,0 +1,106 @@
+"""
+WebSocket fan-out benchmark with simulated local clients.
+Connects N in-process fake sockets to a Broadcaster, a few of which are slow
+or dead, broadcasts messages one after another, and reports how long each
+broadcast() call takes and how long until every healthy client has the
+message. The old sequential loop (await send_json per socket) is timed on
+the same clients for comparison.
+Usage: python bench_fanout.py [clients] [messages]
+"""
+import asyncio
+import json
+import sys
+import time
+
+from ws_broadcast import Broadcaster
+
+SLOW_CLIENTS = 10
+DEAD_CLIENTS = 10
+SLOW_SEND_SECONDS = 1.0
+QUEUE_SIZE = 8
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))] * 1000
+
+
+class FakeSocket:
+    def __init__(self, kind: str = "fast"):
+        self.kind = kind
+        self.received = 0
+        self.closed_with = None
+
+    async def accept(self):
+        pass
+
+    async def send_text(self, text: str):
+        if self.kind == "dead":
+            raise ConnectionResetError("peer went away")
+        if self.kind == "slow":
+            await asyncio.sleep(SLOW_SEND_SECONDS)
+        self.received += 1
+
+    async def send_json(self, message: dict):
+        await self.send_text(json.dumps(message))
+
+    async def close(self, code: int = 1000):
+        self.closed_with = code
+
+
+def make_clients(n: int):
+    kinds = ["slow"] * SLOW_CLIENTS + ["dead"] * DEAD_CLIENTS
+    return [FakeSocket(kinds[i] if i < len(kinds) else "fast") for i in range(n)]
+
+
+async def run_broadcaster(n_clients: int, n_messages: int, policy: str):
+    broadcaster = Broadcaster(queue_size=QUEUE_SIZE, slow_policy=policy)
+    sockets = make_clients(n_clients)
+    for socket in sockets:
+        await broadcaster.connect(socket)
+    healthy = [s for s in sockets if s.kind == "fast"]
+
+    enqueue, latencies = [], []
+    for i in range(n_messages):
+        start = time.perf_counter()
+        broadcaster.broadcast({"type": "country.update", "seq": i, "fields": {"name": "x" * 200}})
+        enqueue.append(time.perf_counter() - start)
+        while any(s.received <= i for s in healthy):
+            await asyncio.sleep(0.001)
+        latencies.append(time.perf_counter() - start)
+
+    stats = broadcaster.stats()
+    print(f"Broadcaster ({policy}): broadcast() p50 {percentile(enqueue, 50):6.1f} ms, "
+          f"delivered to all healthy clients p50 {percentile(latencies, 50):6.1f} ms / p99 {percentile(latencies, 99):6.1f} ms")
+    print(f"  connections left {stats['connections']}, dropped {stats['dropped']}, "
+          f"slow disconnects {stats['slow_disconnects']}, send errors {stats['send_errors']}")
+    for connection in list(broadcaster.connections):
+        broadcaster.disconnect(connection)
+    await asyncio.sleep(0)
+
+
+async def run_sequential(n_clients: int, n_messages: int):
+    """The previous ConnectionManager.broadcast"""
+    sockets = make_clients(n_clients)
+    latencies = []
+    for i in range(n_messages):
+        start = time.perf_counter()
+        for socket in sockets:
+            try:
+                await socket.send_json({"type": "country.update", "seq": i, "fields": {"name": "x" * 200}})
+            except Exception:
+                pass
+        latencies.append(time.perf_counter() - start)
+    print(f"Sequential loop: each broadcast p50 {percentile(latencies, 50):6.1f} ms / p99 {percentile(latencies, 99):6.1f} ms "
+          f"(slow clients stall everyone, dead sockets are never pruned)")
+
+
+if __name__ == "__main__":
+    n_clients = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000
+    n_messages = int(sys.argv[2]) if len(sys.argv) > 2 else 30
+    print(f"{n_clients} clients ({SLOW_CLIENTS} slow, {DEAD_CLIENTS} dead), {n_messages} messages, "
+          f"queue size {QUEUE_SIZE}\n")
+    # Only a few rounds: each sequential broadcast waits on every slow client in turn
+    asyncio.run(run_sequential(n_clients, 3))
+    asyncio.run(run_broadcaster(n_clients, n_messages, "drop"))
+    asyncio.run(run_broadcaster(n_clients, n_messages, "disconnect"))
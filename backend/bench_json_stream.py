@@ -0,0 +1,166 @@
+"""
+JSON extraction from LLM answers: the linear JsonStreamParser against the
+previous regex cleanup (strip fences, then a greedy DOTALL match from the
+first bracket to the last one).
+1. Correctness on answer shapes Gemini produces: fenced, with a preamble,
+   with a remark after the JSON (which the greedy match swallows), and
+   braces inside strings. Plus extraction time on a full country answer.
+2. Streaming country generation: a /ws client subscribed to "all" times the
+   first country.progress frame (first validated event) against the end of
+   the generation, with a fake Gemini that streams the answer word by word.
+Usage: python bench_json_stream.py [events] [chunk_delay_seconds]
+"""
+import asyncio
+import json
+import os
+import re
+import sys
+import tempfile
+import time
+
+FAKE_PORT = 8784
+APP_PORT = 8785
+
+os.environ.update({
+    "GEMINI_API_KEY": "fake",
+    "GEMINI_BASE_URL": f"http://127.0.0.1:{FAKE_PORT}",
+    "LLM_CACHE_PATH": "",
+    "SHARED_SNAPSHOT_PATH": "",
+    "COUNTRY_STORE_PATH": os.path.join(tempfile.mkdtemp(), "generated_countries"),
+    "QUIZ_POOL_SIZE": "0",
+    "LLM_REQUESTS_PER_MINUTE": "0",
+    "LLM_REQUESTS_PER_DAY": "0",
+})
+
+import httpx  # noqa: E402
+import websockets  # noqa: E402
+
+import main  # noqa: E402  (configured through the environment above)
+from bench_nonblocking import start_server  # noqa: E402
+from fake_gemini import create_app  # noqa: E402
+from json_stream import extract_json  # noqa: E402
+
+
+def legacy_clean(text: str) -> str:
+    text = re.sub(r'```json\s*', '', text)
+    text = re.sub(r'```', '', text)
+    match = re.search(r'(\{.*\}|\[.*\])', text, re.DOTALL)
+    if match:
+        return match.group(1)
+    return text
+
+
+def country_answer(name: str, events: int, figures: int) -> dict:
+    slug = name.lower()
+    return {
+        "id": slug, "name": name, "code": slug[:3].upper(), "capital": f"{name} City", "population": 4_200_000,
+        "gdp": 81.5, "government_type": "Parliamentary republic",
+        "current_events": [{
+            "id": f"{slug}_event_{i}", "title": f"Reform package {i} {{phase {i}}}", "date": f"20{10 + i % 15:02d}-03-01",
+            "category": "domestic_policy", "severity": "medium",
+            "description": f"Parliament passed reform {i} after months of debate [see annex {i}]. " * 3,
+            "related_countries": [name], "related_figures": [f"{slug}_figure_0"],
+        } for i in range(events)],
+        "historical_figures": [{
+            "id": f"{slug}_figure_{i}", "name": f"Leader {i} of {name}", "role": "Prime Minister",
+            "birth_year": 1950 + i, "death_year": None,
+            "biography": f"Served as head of government and led coalition talks {{{i}}}. " * 3,
+            "achievements": ["Coalition agreement", "Budget reform"], "related_countries": [name],
+        } for i in range(figures)],
+    }
+
+
+def answer_shapes(value) -> dict:
+    body = json.dumps(value, indent=2)
+    return {
+        "fenced": f"```json\n{body}\n```",
+        "preamble": f"Here is the requested data:\n\n{body}",
+        "remark after": f"```json\n{body}\n```\n\nNote: figures are estimates {{as of 2024}} [approx.].",
+        "second example": f"{body}\n\nA shorter variant would be: {{\"id\": \"x\"}}",
+    }
+
+
+def measure_extraction(events: int) -> bool:
+    country = country_answer("Freedonia", events, 8)
+    entities = [{"text": "France", "type": "country", "id": "france", "start": 0, "end": 6}]
+    print("Extraction (answer shape: previous regex / stream parser)")
+    correct = {"regex": 0, "parser": 0}
+    total = 0
+    for value in (country, entities):
+        for shape, text in answer_shapes(value).items():
+            results = []
+            for label, extract in (("regex", legacy_clean), ("parser", lambda t: extract_json(t) or t)):
+                try:
+                    ok = json.loads(extract(text)) == value
+                except ValueError:
+                    ok = False
+                correct[label] += ok
+                results.append("ok" if ok else "WRONG")
+            total += 1
+            print(f"  {type(value).__name__:<5} {shape:<15} {results[0]:>5} / {results[1]}")
+
+    text = answer_shapes(country)["remark after"]
+    timings = {}
+    for label, extract in (("regex", legacy_clean), ("parser", extract_json)):
+        rounds = 2000
+        start = time.perf_counter()
+        for _ in range(rounds):
+            extract(text)
+        timings[label] = (time.perf_counter() - start) / rounds * 1e6
+    print(f"  {len(text)} char country answer: regex {timings['regex']:.0f} us, parser {timings['parser']:.0f} us")
+    print(f"  correct: regex {correct['regex']}/{total}, parser {correct['parser']}/{total}")
+    return correct["parser"] == total
+
+
+async def measure_generation(events: int) -> bool:
+    name = "Freedonia"
+    async with websockets.connect(f"ws://127.0.0.1:{APP_PORT}/ws") as ws:
+        await ws.send(json.dumps({"type": "subscribe", "topics": ["all"]}))
+        await ws.recv()
+        progress = []
+
+        async def listen():
+            async for frame in ws:
+                message = json.loads(frame)
+                if message["type"] == "country.progress":
+                    progress.append((time.perf_counter(), message))
+
+        listener = asyncio.create_task(listen())
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{APP_PORT}", timeout=120) as client:
+            start = time.perf_counter()
+            resp = await client.post(f"/api/generate-country-info/{name}")
+            done = time.perf_counter() - start
+        await asyncio.sleep(0.2)
+        listener.cancel()
+
+    resp.raise_for_status()
+    country = resp.json()["country"]
+    pushed_events = sum("event" in message for _, message in progress)
+    pushed_figures = sum("figure" in message for _, message in progress)
+    first = progress[0][0] - start if progress else float("inf")
+    print(f"\nStreaming generation ({events} events, 8 figures)")
+    print(f"  first event pushed after {first:.2f}s, country stored after {done:.2f}s")
+    print(f"  pushed {pushed_events} events and {pushed_figures} figures; "
+          f"stored {len(country['current_events'])} events and {len(country['historical_figures'])} figures")
+    return (
+        pushed_events == len(country["current_events"]) == events
+        and pushed_figures == len(country["historical_figures"]) == 8
+        and first < done / 2
+    )
+
+
+if __name__ == "__main__":
+    events = int(sys.argv[1]) if len(sys.argv) > 1 else 12
+    chunk_delay = float(sys.argv[2]) if len(sys.argv) > 2 else 0.002
+
+    extraction_ok = measure_extraction(events)
+
+    reply = json.dumps(country_answer("Freedonia", events, 8), indent=2)
+    start_server(create_app(delay=0.0, reply=reply, chunk_delay=chunk_delay), FAKE_PORT)
+    start_server(main.app, APP_PORT)
+    streaming_ok = asyncio.run(measure_generation(events))
+
+    if extraction_ok and streaming_ok:
+        print("\n✅ Parser extracted every answer shape, and events were pushed before the generation finished")
+    else:
+        print("\n❌ Parser missed an answer shape, or progress was not pushed ahead of the result")
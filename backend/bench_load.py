@@ -0,0 +1,377 @@
+"""
+End-to-end load test: `uvicorn main:app` against a local fake Gemini server.
+Every endpoint is driven as its own scenario at a fixed concurrency (closed
+loop: each client sends its next request when the previous one returns).
+Results are throughput, status counts and p50/p95/p99 latency (plus time to
+first chunk for streamed answers) as JSON, so a run can serve as the
+baseline of the next one:
+
+    python bench_load.py --output baseline.json
+    ... change something ...
+    python bench_load.py --baseline baseline.json --output after.json
+
+Chat questions carry a run id and a counter, so the LLM paths are measured
+without the answer caches unless --repeat-prompts is given.
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+import httpx
+import numpy as np
+import websockets
+
+from bench_nonblocking import start_server
+from fake_gemini import create_app
+
+FAKE_PORT = 8781
+APP_PORT = 8782
+
+READ_SCENARIOS = ("countries", "country", "figures", "figure", "search", "timeline", "ws_ping")
+LLM_SCENARIOS = ("chat", "chat_stream", "ws_chat", "analyze_local", "analyze_llm", "quiz", "generate_country")
+
+QUESTIONS = [
+    "What caused the war in Ukraine?", "Who won the 2024 presidential election?", "What is AUKUS?",
+    "Why did people protest the pension reform?", "What is the Belt and Road Initiative?",
+]
+ANALYZE_TEXT = (
+    "Talks between France and Germany resumed after Emmanuel Macron met Olaf Scholz, "
+    "while Ukraine asked the Pentagon and Brussels for more air defence."
+)
+SEARCH_TERMS = ["election", "protest", "trade", "war", "reform", "president", "climate", "sanctions"]
+
+# (status, seconds to the first chunk of a streamed answer or None)
+Outcome = Tuple[int, Optional[float]]
+
+
+class Scenarios:
+    """One coroutine per scenario; i numbers the requests of a run"""
+
+    def __init__(self, client: httpx.AsyncClient, ws_url: str, run_id: str, repeat_prompts: bool):
+        self.client = client
+        self.ws_url = ws_url
+        self.run_id = run_id
+        self.repeat_prompts = repeat_prompts
+        self.country_ids: List[str] = []
+        self.figure_ids: List[str] = []
+        self._sockets: Dict[int, "websockets.ClientConnection"] = {}
+
+    async def prepare(self):
+        self.country_ids = [c["id"] for c in (await self.client.get("/api/countries")).json()["countries"]]
+        self.figure_ids = [f["id"] for f in (await self.client.get("/api/figures")).json()["figures"]]
+
+    def question(self, scenario: str, i: int) -> str:
+        question = QUESTIONS[i % len(QUESTIONS)]
+        # A number of its own per request, so neither the exact nor the semantic cache can answer it
+        number = LLM_SCENARIOS.index(scenario) * 1_000_000 + i
+        return question if self.repeat_prompts else f"{question} (run {self.run_id}, request {number})"
+
+    async def _get(self, path: str, **params) -> Outcome:
+        return (await self.client.get(path, params=params)).status_code, None
+
+    async def countries(self, i: int) -> Outcome:
+        return await self._get("/api/countries")
+
+    async def country(self, i: int) -> Outcome:
+        return await self._get(f"/api/countries/{self.country_ids[i % len(self.country_ids)]}")
+
+    async def figures(self, i: int) -> Outcome:
+        return await self._get("/api/figures")
+
+    async def figure(self, i: int) -> Outcome:
+        return await self._get(f"/api/figures/{self.figure_ids[i % len(self.figure_ids)]}")
+
+    async def search(self, i: int) -> Outcome:
+        return await self._get("/api/search", q=SEARCH_TERMS[i % len(SEARCH_TERMS)])
+
+    async def timeline(self, i: int) -> Outcome:
+        return await self._get("/api/timeline", limit=50, order="desc" if i % 2 else "asc")
+
+    async def chat(self, i: int) -> Outcome:
+        resp = await self.client.post("/api/chat", json={"message": self.question("chat", i), "context": None, "history": []})
+        return resp.status_code, None
+
+    async def chat_stream(self, i: int) -> Outcome:
+        start = time.perf_counter()
+        first = None
+        body = {"message": self.question("chat_stream", i), "context": None, "history": []}
+        event = None
+        async with self.client.stream("POST", "/api/chat/stream", json=body) as resp:
+            if resp.status_code != 200:
+                return resp.status_code, None
+            async for line in resp.aiter_lines():
+                if line.startswith("event: "):
+                    event = line[len("event: "):]
+                    if event == "delta" and first is None:
+                        first = time.perf_counter() - start
+                elif line.startswith("data: ") and event == "error":
+                    # The answer failed after the stream had started
+                    return json.loads(line[len("data: "):]).get("status", 500), first
+        return 200, first
+
+    async def ws_chat(self, i: int) -> Outcome:
+        start = time.perf_counter()
+        first = None
+        async with websockets.connect(self.ws_url, max_size=None) as socket:
+            stream_id = f"s{i}"
+            await socket.send(json.dumps({
+                "type": "chat", "id": stream_id, "message": self.question("ws_chat", i), "context": None, "history": [],
+            }))
+            async for raw in socket:
+                frame = json.loads(raw)
+                if frame.get("id") != stream_id:
+                    continue
+                if frame["type"] == "chat.delta" and first is None:
+                    first = time.perf_counter() - start
+                elif frame["type"] == "chat.done":
+                    return 200, first
+                elif frame["type"] == "chat.error":
+                    return frame.get("status", 500), first
+        return 0, first
+
+    async def ws_ping(self, i: int, worker: int) -> Outcome:
+        # One socket per client, reused like a browser tab's
+        socket = self._sockets.get(worker)
+        if socket is None:
+            socket = self._sockets[worker] = await websockets.connect(self.ws_url)
+        await socket.send(json.dumps({"type": "ping"}))
+        while True:
+            frame = json.loads(await socket.recv())
+            if frame.get("type") == "pong":
+                return 200, None
+
+    async def analyze_local(self, i: int) -> Outcome:
+        resp = await self.client.post("/api/analyze-text", json={"text": f"{ANALYZE_TEXT} ({i})"})
+        return resp.status_code, None
+
+    async def analyze_llm(self, i: int) -> Outcome:
+        text = ANALYZE_TEXT if self.repeat_prompts else f"{ANALYZE_TEXT} Report {self.run_id}-{i}."
+        resp = await self.client.post("/api/analyze-text", json={"text": text, "llm_fallback": True})
+        return resp.status_code, None
+
+    async def quiz(self, i: int) -> Outcome:
+        return (await self.client.post("/api/quiz/generate-question")).status_code, None
+
+    async def generate_country(self, i: int) -> Outcome:
+        name = "Benchland" if self.repeat_prompts else f"Benchland {self.run_id} {i}"
+        return (await self.client.post(f"/api/generate-country-info/{name}")).status_code, None
+
+    async def close(self):
+        for socket in self._sockets.values():
+            await socket.close()
+
+
+def summarize(values: List[float]) -> Optional[Dict[str, float]]:
+    if not values:
+        return None
+    ms = np.array(values) * 1000
+    return {
+        "mean": round(float(ms.mean()), 2),
+        "p50": round(float(np.percentile(ms, 50)), 2),
+        "p95": round(float(np.percentile(ms, 95)), 2),
+        "p99": round(float(np.percentile(ms, 99)), 2),
+        "max": round(float(ms.max()), 2),
+    }
+
+
+async def run_scenario(call: Callable[..., Awaitable[Outcome]], requests: int, concurrency: int, per_worker: bool) -> dict:
+    latencies, ok_latencies, ttfbs, statuses = [], [], [], {}
+    counter = iter(range(requests))
+
+    async def client(worker: int):
+        for i in counter:
+            start = time.perf_counter()
+            try:
+                status, ttfb = await (call(i, worker) if per_worker else call(i))
+            except (httpx.HTTPError, websockets.WebSocketException, OSError) as e:
+                status, ttfb = type(e).__name__, None
+            elapsed = time.perf_counter() - start
+            latencies.append(elapsed)
+            statuses[str(status)] = statuses.get(str(status), 0) + 1
+            if status == 200:
+                ok_latencies.append(elapsed)
+                if ttfb is not None:
+                    ttfbs.append(ttfb)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client(w) for w in range(min(concurrency, requests))))
+    duration = time.perf_counter() - start
+    result = {
+        "requests": requests,
+        "concurrency": concurrency,
+        "ok": statuses.get("200", 0),
+        "statuses": statuses,
+        "duration_s": round(duration, 3),
+        "throughput_rps": round(requests / duration, 2),
+        "latency_ms": summarize(latencies),
+        "ok_latency_ms": summarize(ok_latencies),
+    }
+    if ttfbs:
+        result["first_chunk_ms"] = summarize(ttfbs)
+    return result
+
+
+def start_app(args, store_dir: str) -> subprocess.Popen:
+    env = {
+        **os.environ,
+        "GEMINI_API_KEY": "fake",
+        "GEMINI_BASE_URL": f"http://127.0.0.1:{FAKE_PORT}",
+        "GEMINI_TIMEOUT": str(args.gemini_timeout),
+        "LLM_CACHE_PATH": "",
+        "LLM_REQUESTS_PER_MINUTE": str(args.rpm),
+        "LLM_REQUESTS_PER_DAY": str(args.rpd),
+        "COUNTRY_STORE_PATH": store_dir,
+        "SHARED_SNAPSHOT_PATH": "",
+    }
+    env.update(item.split("=", 1) for item in args.env)
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--workers", str(args.workers),
+         "--host", "127.0.0.1", "--port", str(APP_PORT), "--log-level", "warning"],
+        cwd=os.path.dirname(os.path.abspath(__file__)), env=env,
+        stdout=None if args.verbose else subprocess.DEVNULL, stderr=None if args.verbose else subprocess.DEVNULL,
+    )
+
+
+def wait_ready(timeout: float = 120.0):
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        try:
+            if httpx.get(f"http://127.0.0.1:{APP_PORT}/api/countries", timeout=5).status_code == 200:
+                return
+        except httpx.TransportError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError("main:app did not come up")
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> List[str]:
+    """Scenarios whose p95 latency or throughput got worse than the baseline by more than tolerance"""
+    regressions = []
+    print(f"\n{'scenario':<17} {'p95 ms':>19} {'throughput rps':>23}")
+    for name, now in results["scenarios"].items():
+        before = baseline.get("scenarios", {}).get(name)
+        if not before or not now["latency_ms"] or not before["latency_ms"]:
+            continue
+        p95, base_p95 = now["latency_ms"]["p95"], before["latency_ms"]["p95"]
+        rps, base_rps = now["throughput_rps"], before["throughput_rps"]
+        worse = p95 > base_p95 * (1 + tolerance) or rps < base_rps * (1 - tolerance)
+        print(f"{name:<17} {base_p95:9.1f} -> {p95:7.1f} {base_rps:11.1f} -> {rps:8.1f}  {'❌' if worse else '✅'}")
+        if worse:
+            regressions.append(name)
+    return regressions
+
+
+async def run(args) -> dict:
+    base_url = f"http://127.0.0.1:{APP_PORT}"
+    limits = httpx.Limits(max_connections=args.concurrency * 2, max_keepalive_connections=args.concurrency * 2)
+    results = {}
+    async with httpx.AsyncClient(base_url=base_url, timeout=args.gemini_timeout + 60, limits=limits) as client:
+        scenarios = Scenarios(client, f"ws://127.0.0.1:{APP_PORT}/ws", uuid.uuid4().hex[:8], args.repeat_prompts)
+        await scenarios.prepare()
+        for name in args.scenarios:
+            requests = args.read_requests if name in READ_SCENARIOS else args.llm_requests
+            result = await run_scenario(getattr(scenarios, name), requests, args.concurrency, per_worker=name == "ws_ping")
+            results[name] = result
+            latency = result["latency_ms"]
+            print(f"  {name:<17} {result['throughput_rps']:8.1f} req/s   p50 {latency['p50']:8.1f} ms   "
+                  f"p95 {latency['p95']:8.1f} ms   p99 {latency['p99']:8.1f} ms   {result['statuses']}", file=sys.stderr)
+        await scenarios.close()
+    return results
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0], formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenarios", nargs="+", default=list(READ_SCENARIOS + LLM_SCENARIOS),
+                        choices=READ_SCENARIOS + LLM_SCENARIOS)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--read-requests", type=int, default=1000, help="requests per read scenario")
+    parser.add_argument("--llm-requests", type=int, default=100, help="requests per LLM scenario")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn workers")
+    parser.add_argument("--gemini-delay", type=float, default=0.5, help="fake Gemini answer latency (s)")
+    parser.add_argument("--jitter", type=float, default=0.2, help="extra random latency, up to (s)")
+    parser.add_argument("--chunk-delay", type=float, default=0.02, help="delay per streamed word (s)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of Gemini calls answered 429")
+    parser.add_argument("--timeout-rate", type=float, default=0.0, help="share of Gemini calls that hang past the timeout")
+    parser.add_argument("--gemini-timeout", type=float, default=5.0, help="GEMINI_TIMEOUT of the app (s)")
+    parser.add_argument("--rpm", type=int, default=0, help="LLM_REQUESTS_PER_MINUTE of the app (0 = no limit)")
+    parser.add_argument("--rpd", type=int, default=0, help="LLM_REQUESTS_PER_DAY of the app (0 = no limit)")
+    parser.add_argument("--repeat-prompts", action="store_true", help="reuse prompts, so the answer caches are hit")
+    parser.add_argument("--env", action="append", default=[], metavar="KEY=VALUE", help="extra environment for the app")
+    parser.add_argument("--output", default="-", help="JSON results file ('-' = stdout)")
+    parser.add_argument("--baseline", help="earlier JSON results to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed p95/throughput regression")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--verbose", action="store_true", help="show the app's log")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    fake = create_app(
+        delay=args.gemini_delay, chunk_delay=args.chunk_delay, jitter=args.jitter, error_rate=args.error_rate,
+        timeout_rate=args.timeout_rate, hang=args.gemini_timeout + 5, structured=True, seed=args.seed,
+        reply="Here is a balanced summary of the question, with the main causes, the people involved and what happened next.",
+    )
+    start_server(fake, FAKE_PORT)
+
+    with tempfile.TemporaryDirectory() as store_dir:
+        app = start_app(args, store_dir)
+        try:
+            wait_ready()
+            print(f"main:app ({args.workers} worker(s)) against fake Gemini {args.gemini_delay}s + up to {args.jitter}s, "
+                  f"{args.error_rate:.0%} 429s, {args.timeout_rate:.0%} timeouts; concurrency {args.concurrency}",
+                  file=sys.stderr)
+            scenario_results = asyncio.run(run(args))
+        finally:
+            app.terminate()
+            app.wait()
+
+    results = {
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "commit": git_commit(),
+        "config": {k: v for k, v in vars(args).items() if k not in ("output", "baseline", "verbose")},
+        "fake_gemini": {
+            "calls": fake.state.calls,
+            "injected_errors": fake.state.injected_errors,
+            "injected_timeouts": fake.state.injected_timeouts,
+        },
+        "scenarios": scenario_results,
+    }
+    if args.output == "-":
+        print(json.dumps(results, indent=2))
+    else:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nResults written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        if regressions:
+            print(f"\n❌ Slower than the baseline by more than {args.tolerance:.0%}: {', '.join(regressions)}")
+            sys.exit(1)
+        print(f"\n✅ No scenario regressed by more than {args.tolerance:.0%}")
+    else:
+        failed = {name for name, r in scenario_results.items() if r["ok"] == 0}
+        if failed:
+            print(f"\n❌ No successful requests in: {', '.join(sorted(failed))}")
+            sys.exit(1)
+        print("\n✅ Every scenario completed")
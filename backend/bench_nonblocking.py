@@ -0,0 +1,78 @@
+"""
+Checks that read endpoints stay fast while slow Gemini calls are pending.
+Starts a local fake Gemini server and the backend, then measures
+/api/countries latency before and during N outstanding /api/chat calls.
+Usage: python bench_nonblocking.py [pending_calls] [gemini_delay_seconds]
+"""
+import asyncio
+import os
+import statistics
+import sys
+import threading
+import time
+
+import httpx
+import uvicorn
+
+from fake_gemini import create_app
+
+FAKE_PORT = 8765
+APP_PORT = 8766
+
+
+def start_server(app, port: int) -> uvicorn.Server:
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return server
+
+
+async def measure_reads(client: httpx.AsyncClient, count: int = 20) -> list:
+    timings = []
+    for _ in range(count):
+        start = time.perf_counter()
+        resp = await client.get("/api/countries")
+        resp.raise_for_status()
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+async def run(pending: int, delay: float):
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{APP_PORT}", timeout=delay * pending + 30) as client:
+        baseline = await measure_reads(client)
+
+        chats = [
+            asyncio.create_task(client.post("/api/chat", json={"message": f"question {i}"}))
+            for i in range(pending)
+        ]
+        await asyncio.sleep(0.2)  # let the chat calls reach the fake Gemini server
+        during = await measure_reads(client)
+        chat_done_early = sum(t.done() for t in chats)
+        responses = await asyncio.gather(*chats)
+
+    print(f"Read latency idle:    p50 {statistics.median(baseline):.1f} ms, max {max(baseline):.1f} ms")
+    print(f"Read latency pending: p50 {statistics.median(during):.1f} ms, max {max(during):.1f} ms")
+    print(f"Chat calls: {len(responses)} sent, {sum(r.status_code == 200 for r in responses)} ok, "
+          f"{chat_done_early} finished before reads completed")
+
+    if max(during) < delay * 1000 / 2 and chat_done_early == 0:
+        print("\n✅ Reads stayed fast while Gemini calls were pending")
+        return True
+    print("\n❌ Reads were blocked behind Gemini calls")
+    return False
+
+
+if __name__ == "__main__":
+    pending = int(sys.argv[1]) if len(sys.argv) > 1 else 8
+    delay = float(sys.argv[2]) if len(sys.argv) > 2 else 3.0
+
+    os.environ["GEMINI_BASE_URL"] = f"http://127.0.0.1:{FAKE_PORT}"
+    os.environ.setdefault("GOOGLE_API_KEY", "fake-key")
+    os.environ["GEMINI_MAX_CONCURRENCY"] = str(pending)
+    import main  # imported after the env is set so the client targets the stub
+
+    start_server(create_app(delay), FAKE_PORT)
+    start_server(main.app, APP_PORT)
+    ok = asyncio.run(run(pending, delay))
+    sys.exit(0 if ok else 1)
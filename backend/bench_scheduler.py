@@ -0,0 +1,100 @@
+"""
+Interactive latency under contention for the LLM scheduler.
+A burst of background calls (quiz prefetch and country generation) is
+queued against a local fake Gemini server, then chat calls arrive at a
+steady pace. Chat latency is measured with one FIFO rate-limited queue
+(every call in the same class, nothing shed) and with the priority
+classes and latency budgets of LLMScheduler.
+Usage: python bench_scheduler.py [background_calls] [chat_calls] [gemini_delay_seconds]
+"""
+import asyncio
+import os
+import sys
+import time
+
+from fake_gemini import create_app
+from bench_nonblocking import start_server
+
+FAKE_PORT = 8777
+RPM = 120
+CONCURRENCY = 4
+CHAT_INTERVAL = 0.5
+
+os.environ.update({
+    "GEMINI_API_KEY": "fake",
+    "GEMINI_BASE_URL": f"http://127.0.0.1:{FAKE_PORT}",
+    "GEMINI_MAX_CONCURRENCY": str(CONCURRENCY),
+    "LLM_CACHE_PATH": "",
+    "QUIZ_POOL_SIZE": "0",
+})
+
+import main  # noqa: E402  (configured through the environment above)
+from fastapi import HTTPException  # noqa: E402
+from llm_scheduler import LLMScheduler  # noqa: E402
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))] if ordered else float("nan")
+
+
+async def timed_call(prompt: str, priority: str, results: dict):
+    start = time.perf_counter()
+    try:
+        await main.call_gemini(prompt, priority=priority)
+        results.setdefault(priority, []).append(time.perf_counter() - start)
+    except HTTPException as e:
+        results.setdefault(f"{priority} {e.status_code}", []).append(time.perf_counter() - start)
+
+
+async def measure(label: str, scheduler: LLMScheduler, background: int, chats: int, fifo: bool):
+    main.llm_scheduler = scheduler
+    background_results, chat_results = {}, {}
+    tasks = [
+        asyncio.create_task(timed_call(
+            f"background {label} {i}", "chat" if fifo else ("prefetch" if i % 2 else "generate"), background_results
+        ))
+        for i in range(background)
+    ]
+    await asyncio.sleep(0.1)
+    for i in range(chats):
+        tasks.append(asyncio.create_task(timed_call(f"chat {label} {i}", "chat", chat_results)))
+        await asyncio.sleep(CHAT_INTERVAL)
+    await asyncio.gather(*tasks)
+
+    ok = chat_results.get("chat", [])
+    shed = sum(len(v) for k, v in chat_results.items() if k != "chat")
+    print(f"\n{label}")
+    print(f"  chat: {len(ok)} ok, {shed} refused; latency p50 {percentile(ok, 50):.2f}s  "
+          f"p95 {percentile(ok, 95):.2f}s  max {max(ok, default=float('nan')):.2f}s")
+    for key in sorted(background_results):
+        values = background_results[key]
+        print(f"  background {key:<14} {len(values):3d} calls, p50 {percentile(values, 50):6.2f}s")
+    return ok
+
+
+if __name__ == "__main__":
+    n_background = int(sys.argv[1]) if len(sys.argv) > 1 else 60
+    n_chats = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    delay = float(sys.argv[3]) if len(sys.argv) > 3 else 0.5
+
+    start_server(create_app(delay=delay), FAKE_PORT)
+    print(f"{n_background} background calls queued, then {n_chats} chats every {CHAT_INTERVAL}s; "
+          f"{RPM} requests/minute, {CONCURRENCY} concurrent, Gemini delay {delay}s")
+
+    async def main_bench():
+        unbounded = {name: float("inf") for name in ("chat", "analyze", "generate", "prefetch")}
+        fifo = await measure(
+            "FIFO queue (same limits, no priorities)",
+            LLMScheduler(RPM, 0, CONCURRENCY, latency_budget=unbounded), n_background, n_chats, fifo=True,
+        )
+        prioritized = await measure(
+            "Priority scheduler", LLMScheduler(RPM, 0, CONCURRENCY), n_background, n_chats, fifo=False,
+        )
+        await main.gemini.close()
+        if prioritized and fifo and percentile(prioritized, 95) < percentile(fifo, 95) / 2:
+            print("\n✅ Interactive chat kept a short, predictable latency under background load")
+        else:
+            print("\n❌ Chat latency did not improve under contention")
+
+    asyncio.run(main_bench())
@@ -0,0 +1,108 @@
+"""
+Search latency benchmark on a synthetic corpus.
+Builds SearchIndex over N generated events and reports index build time and
+p50/p95/p99 query latency, with and without filters.
+Usage: python bench_search.py [events] [queries]
+"""
+import random
+import statistics
+import sys
+import time
+
+from main import Country, CountryEvent, HistoricalFigure
+from search_index import SearchIndex
+
+CATEGORIES = ["foreign_policy", "domestic_policy", "economy", "social", "military", "environment"]
+SEVERITIES = ["low", "medium", "high"]
+P99_TARGET_MS = 50.0
+
+random.seed(42)
+VOCABULARY = [f"term{i}" for i in range(5000)] + [
+    "election", "sanctions", "treaty", "nuclear", "protest", "summit", "reform", "inflation",
+    "border", "ceasefire", "referendum", "coalition", "tariff", "climate", "pipeline",
+]
+
+
+def words(n: int) -> str:
+    # Zipf-like skew so some terms have very long posting lists
+    return " ".join(VOCABULARY[min(int(random.paretovariate(1.1)) * 7 % len(VOCABULARY), len(VOCABULARY) - 1)]
+                    if random.random() < 0.7 else random.choice(VOCABULARY) for _ in range(n))
+
+
+def build_corpus(n_events: int, n_countries: int = 200):
+    countries = []
+    per_country = n_events // n_countries
+    for c in range(n_countries):
+        events = [
+            CountryEvent(
+                id=f"c{c}_e{e}",
+                title=words(6),
+                date=f"{random.randint(2000, 2026)}-{random.randint(1, 12):02d}-{random.randint(1, 28):02d}",
+                category=random.choice(CATEGORIES),
+                description=words(30),
+                severity=random.choice(SEVERITIES),
+                background=words(40),
+                full_history=words(120),
+            )
+            for e in range(per_country)
+        ]
+        figures = [
+            HistoricalFigure(id=f"c{c}_f{f}", name=f"Figure {c} {f}", role="leader", birth_year=None,
+                             death_year=None, biography=words(60), achievements=[words(8)], related_countries=[])
+            for f in range(3)
+        ]
+        countries.append(Country(id=f"country{c}", name=f"Country {c}", code=f"C{c:02d}", capital="Capital",
+                                 population=1, gdp=None, government_type="Republic",
+                                 current_events=events, historical_figures=figures))
+    return countries
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def run_queries(index: SearchIndex, n_queries: int, filtered: bool):
+    timings = []
+    for _ in range(n_queries):
+        query = " ".join(random.choice(VOCABULARY[-15:] + VOCABULARY[:200]) for _ in range(random.randint(1, 3)))
+        filters = {}
+        if filtered:
+            filters = random.choice([
+                {"category": random.choice(CATEGORIES)},
+                {"severity": "high", "date_from": "2020-01-01", "date_to": "2022-12-31"},
+                {"country": f"country{random.randint(0, 199)}"},
+            ])
+        start = time.perf_counter()
+        index.search(query, limit=20, **filters)
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+if __name__ == "__main__":
+    n_events = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    n_queries = int(sys.argv[2]) if len(sys.argv) > 2 else 500
+
+    print(f"Generating {n_events} events...")
+    countries = build_corpus(n_events)
+
+    index = SearchIndex()
+    start = time.perf_counter()
+    for country in countries:
+        index.index_country(country)
+    print(f"Indexed {len(index)} documents in {time.perf_counter() - start:.1f}s")
+
+    start = time.perf_counter()
+    index.index_country(countries[0])
+    print(f"Incremental re-index of one country: {(time.perf_counter() - start) * 1000:.1f} ms")
+
+    ok = True
+    for label, filtered in (("unfiltered", False), ("filtered", True)):
+        timings = run_queries(index, n_queries, filtered)
+        p99 = percentile(timings, 99)
+        print(f"{label:>10}: p50 {statistics.median(timings):.1f} ms, "
+              f"p95 {percentile(timings, 95):.1f} ms, p99 {p99:.1f} ms")
+        ok = ok and p99 <= P99_TARGET_MS
+
+    print(f"\n✅ p99 within {P99_TARGET_MS:.0f} ms" if ok else f"\n❌ p99 above {P99_TARGET_MS:.0f} ms target")
+    sys.exit(0 if ok else 1)
@@ -0,0 +1,177 @@
+"""
+Semantic chat cache: hit rate on paraphrased traffic, wrong answers served,
+lookup cost, and end-to-end /api/chat latency against a local fake Gemini.
+Traffic draws questions from a set of intents, each asked in several
+wordings with varying lead-ins, case and punctuation, with a Zipf-like
+popularity; some intents are near misses of others (a different year, a
+different aspect, another leader, the same two countries the other way
+round) and must not share answers. An exact-prompt cache (what
+the LLM response cache gives chat today) is the baseline.
+Usage: python bench_semantic_cache.py [requests] [gemini_delay_seconds]
+"""
+import os
+import random
+import sys
+import time
+
+import numpy as np
+
+from fake_gemini import create_app
+from bench_nonblocking import start_server
+
+FAKE_PORT = 8779
+
+os.environ.update({
+    "GEMINI_API_KEY": "fake",
+    "GEMINI_BASE_URL": f"http://127.0.0.1:{FAKE_PORT}",
+    "LLM_CACHE_PATH": "",
+    "QUIZ_POOL_SIZE": "0",
+    "LLM_REQUESTS_PER_MINUTE": "0",
+    "LLM_REQUESTS_PER_DAY": "0",
+})
+
+import main  # noqa: E402  (configured through the environment above)
+from fastapi.testclient import TestClient  # noqa: E402
+from semantic_cache import SemanticCache  # noqa: E402
+
+# intent -> (context, wordings)
+INTENTS = {
+    "iran deal": (None, [
+        "What happened with the Iran nuclear deal?", "explain JCPOA", "Tell me about the Iran nuclear deal",
+        "what's the JCPOA?",
+    ]),
+    "election 2024": ({"country": "United States of America"}, [
+        "Who won the 2024 presidential election?", "who won the 2024 election", "2024 presidential election winner?",
+    ]),
+    "election 2020": ({"country": "United States of America"}, [
+        "Who won the 2020 presidential election?", "who won the 2020 election",
+    ]),
+    "pension protests": ({"country": "France"}, [
+        "Why did people protest the pension reform?", "why were there pension reform protests",
+        "What were the pension reform protests about?",
+    ]),
+    "brexit economy": ({"country": "United Kingdom"}, [
+        "How did Brexit affect the economy?", "What was the economic impact of Brexit?",
+    ]),
+    "brexit ireland": ({"country": "United Kingdom"}, [
+        "How did Brexit affect Northern Ireland?", "What did Brexit mean for Northern Ireland?",
+    ]),
+    "belt and road": ({"country": "China"}, [
+        "What is the Belt and Road Initiative?", "explain belt and road", "Tell me about the Belt and Road Initiative",
+    ]),
+    "putin": (None, ["Who is Vladimir Putin?", "Tell me about Vladimir Putin", "who's Putin"]),
+    "zelenskyy": (None, ["Who is Volodymyr Zelenskyy?", "Tell me about Zelenskyy"]),
+    "ukraine war": ({"country": "Ukraine"}, [
+        "What caused the war in Ukraine?", "What were the causes of the Ukraine war?", "why did russia invade ukraine",
+    ]),
+    "aukus": ({"country": "Australia"}, ["What is AUKUS?", "explain the AUKUS pact", "What is the AUKUS security pact?"]),
+    "putin nato": (None, [
+        "What is Putin position on NATO expansion", "What is Putin's stance on NATO expansion?",
+    ]),
+    "biden nato": (None, [
+        "What is Biden position on NATO expansion", "What is Biden's stance on NATO expansion?",
+    ]),
+    "russia invaded ukraine": (None, ["Why did Russia invade Ukraine", "Why did Russia invade Ukraine?"]),
+    "ukraine invaded russia": (None, ["Why did Ukraine invade Russia", "Why did Ukraine invade Russia?"]),
+    "abe": ({"country": "Japan"}, [
+        "What happened to Shinzo Abe?", "How was Shinzo Abe killed?", "Tell me about the assassination of Shinzo Abe",
+    ]),
+}
+
+
+LEAD_INS = ["", "", "Tell me about: ", "Can you explain ", "Quick question: ", "Please explain ", "hey, "]
+
+
+def traffic(n: int, seed: int = 7):
+    rng = random.Random(seed)
+    names = list(INTENTS)
+    weights = [1 / (rank + 1) for rank in range(len(names))]
+    for _ in range(n):
+        if rng.random() < 0.15:
+            # One-off questions nobody repeats
+            yield "unique", None, f"What is the political history of region {rng.randrange(10**6)}?"
+            continue
+        intent = rng.choices(names, weights)[0]
+        context, wordings = INTENTS[intent]
+        question = rng.choice(LEAD_INS) + rng.choice(wordings)
+        if rng.random() < 0.3:
+            question = question.lower().rstrip("?")
+        yield intent, context, question
+
+
+def replay_direct(n: int):
+    """Cache decisions only: Gemini's answer is the name of the intent it was asked about"""
+    cache = SemanticCache(capacity=256, entities=main.question_entities)
+    exact = set()
+    hits = exact_hits = wrong = 0
+    for intent, context, question in traffic(n):
+        key = (question.lower().strip(), repr(context))
+        exact_hits += key in exact
+        exact.add(key)
+        hit = cache.lookup(question, context)
+        if hit is None:
+            cache.store(question, context, intent)
+        else:
+            hits += 1
+            wrong += hit[0] != intent
+    return hits, exact_hits, wrong, cache.stats()
+
+
+def lookup_cost(capacity: int = 1024, batch: int = 256):
+    cache = SemanticCache(capacity=capacity)
+    for i in range(capacity):
+        cache.store(f"question number {i} about topic {i * 7} and place {i * 13}", {"country": f"c{i % 50}"}, "a")
+    questions = [f"question about topic {i * 7} and place {i * 13}" for i in range(batch)]
+    contexts = [{"country": f"c{i % 50}"} for i in range(batch)]
+    start = time.perf_counter()
+    for q, c in zip(questions, contexts):
+        cache.lookup(q, c)
+    single = (time.perf_counter() - start) / batch
+    start = time.perf_counter()
+    cache.lookup_many(questions, contexts)
+    batched = (time.perf_counter() - start) / batch
+    return single, batched
+
+
+def replay_http(client: TestClient, n: int, use_cache: bool):
+    """Latencies of n chat requests; the exact LLM response cache stays on in both runs, as today"""
+    main.semantic_cache = SemanticCache(
+        capacity=256 if use_cache else 1, threshold=0.75 if use_cache else 2.0, entities=main.question_entities,
+    )
+    latencies = []
+    for _, context, question in traffic(n, seed=11):
+        start = time.perf_counter()
+        resp = client.post("/api/chat", json={"message": question, "context": context, "history": []})
+        latencies.append(time.perf_counter() - start)
+        resp.raise_for_status()
+    return np.array(latencies)
+
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    delay = float(sys.argv[2]) if len(sys.argv) > 2 else 0.3
+
+    # The entity matcher the cache keys on is built from the data
+    main.load_initial_data()
+    hits, exact_hits, wrong, stats = replay_direct(n)
+    print(f"{n} chat questions over {len(INTENTS)} intents ({sum(len(w) for _, w in INTENTS.values())} wordings), 15% one-off")
+    print(f"  exact-prompt cache:  hit rate {exact_hits / n:.1%}, {n - exact_hits} Gemini calls")
+    print(f"  semantic cache:      hit rate {hits / n:.1%}, {n - hits} Gemini calls, wrong answers {wrong}, "
+          f"evictions {stats['evictions']}, mean hit similarity {stats['avg_hit_similarity']}")
+
+    single, batched = lookup_cost()
+    print(f"  lookup against 1024 entries: {single * 1e6:.0f}µs one by one, {batched * 1e6:.0f}µs per question batched")
+
+    start_server(create_app(delay=delay), FAKE_PORT)
+    http_n = min(n, 200)
+    with TestClient(main.app) as client:
+        baseline = replay_http(client, http_n, use_cache=False)
+        main.llm_cache._memory.clear()
+        cached = replay_http(client, http_n, use_cache=True)
+    print(f"  /api/chat x{http_n}, Gemini {delay}s: mean {baseline.mean():.3f}s -> {cached.mean():.3f}s, "
+          f"p50 {np.percentile(baseline, 50):.3f}s -> {np.percentile(cached, 50):.3f}s")
+
+    if n - hits < (n - exact_hits) * 0.75 and wrong == 0 and cached.mean() < baseline.mean():
+        print(f"\n✅ Paraphrases saved {1 - (n - hits) / (n - exact_hits):.0%} of the Gemini calls without a wrong answer")
+    else:
+        print("\n❌ Semantic cache did not beat the exact-prompt cache safely")
@@ -0,0 +1,63 @@
+"""
+Startup benchmark for the political data loader.
+Times a cold load of political_data.json (parse + sort + validate) against
+loading the pre-validated snapshot, for the real file and for a synthetic
+dataset with N events.
+Usage: python bench_startup.py [events]
+"""
+import json
+import os
+import sys
+import tempfile
+import time
+
+os.environ["DATA_SNAPSHOT_PATH"] = ""  # the benchmark manages its own snapshot files
+
+import main
+from bench_search import build_corpus
+from data_snapshot import load_snapshot, write_snapshot
+
+
+def best_of(fn, runs: int = 3) -> float:
+    best = float("inf")
+    for _ in range(runs):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def compare(label: str, data_file: str, snapshot_path: str):
+    schema_key = main._schema_key()
+    countries = main._read_political_data(data_file)
+    write_snapshot(snapshot_path, data_file, schema_key, countries)
+
+    restored = load_snapshot(snapshot_path, data_file, schema_key)
+    assert restored == countries, "snapshot does not round-trip"
+
+    cold = best_of(lambda: main._read_political_data(data_file))
+    warm = best_of(lambda: load_snapshot(snapshot_path, data_file, schema_key))
+    size = os.path.getsize(data_file) / 1e6
+    print(f"{label:<28} {size:7.1f} MB  cold {cold * 1000:8.1f} ms  "
+          f"snapshot {warm * 1000:8.1f} ms  ({cold / warm:4.1f}x)")
+
+
+if __name__ == "__main__":
+    n_events = int(sys.argv[1]) if len(sys.argv) > 1 else 20_000
+
+    with tempfile.TemporaryDirectory() as tmp:
+        real_file = os.path.join(os.path.dirname(__file__), "political_data.json")
+        compare("political_data.json", real_file, os.path.join(tmp, "real.snapshot"))
+
+        synthetic_file = os.path.join(tmp, "political_data.json")
+        corpus = build_corpus(n_events, max(n_events // 100, 1))
+        with open(synthetic_file, "w", encoding="utf-8") as f:
+            json.dump({"countries": [c.model_dump() for c in corpus]}, f)
+        compare(f"synthetic ({n_events} events)", synthetic_file, os.path.join(tmp, "synthetic.snapshot"))
+
+        # A changed source file must invalidate the snapshot
+        with open(synthetic_file, "a", encoding="utf-8") as f:
+            f.write("\n")
+        stale = load_snapshot(os.path.join(tmp, "synthetic.snapshot"), synthetic_file, main._schema_key())
+        assert stale is None, "stale snapshot was accepted"
+        print("\n✅ Snapshot matches the JSON load and is rejected once the JSON changes")
@@ -0,0 +1,88 @@
+"""
+Compares time-to-first-token of /api/chat/stream and /ws chat frames with the
+full-completion wait of /api/chat, and checks that disconnecting a stream
+aborts the upstream Gemini call. Runs against a local fake Gemini server.
+Usage: python bench_streaming.py [words] [seconds_per_word]
+"""
+import asyncio
+import json
+import os
+import sys
+import time
+
+import httpx
+import websockets
+
+from bench_nonblocking import start_server, FAKE_PORT, APP_PORT
+from fake_gemini import create_app
+
+
+async def run(fake_app, total: float):
+    base = f"http://127.0.0.1:{APP_PORT}"
+    async with httpx.AsyncClient(base_url=base, timeout=total + 30) as client:
+        # Distinct messages so the LLM cache never answers for us
+        start = time.perf_counter()
+        resp = await client.post("/api/chat", json={"message": "full answer please"})
+        full_ms = (time.perf_counter() - start) * 1000
+        resp.raise_for_status()
+
+        start = time.perf_counter()
+        sse_first_ms = None
+        async with client.stream("POST", "/api/chat/stream", json={"message": "stream it"}) as resp:
+            async for line in resp.aiter_lines():
+                if line.startswith("event: delta") and sse_first_ms is None:
+                    sse_first_ms = (time.perf_counter() - start) * 1000
+        sse_total_ms = (time.perf_counter() - start) * 1000
+
+        # Disconnect after the first delta; the fake server must see the stream cancelled
+        before = fake_app.state.cancelled_streams
+        async with client.stream("POST", "/api/chat/stream", json={"message": "abandon me"}) as resp:
+            async for line in resp.aiter_lines():
+                if line.startswith("event: delta"):
+                    break
+        await asyncio.sleep(0.5)
+        sse_cancelled = fake_app.state.cancelled_streams - before
+
+    async with websockets.connect(f"ws://127.0.0.1:{APP_PORT}/ws") as ws:
+        start = time.perf_counter()
+        await ws.send(json.dumps({"type": "chat", "id": "b1", "message": "over the socket"}))
+        ws_first_ms = None
+        while True:
+            frame = json.loads(await ws.recv())
+            if frame["type"] == "chat.delta" and ws_first_ms is None:
+                ws_first_ms = (time.perf_counter() - start) * 1000
+            if frame["type"] in ("chat.done", "chat.error"):
+                break
+
+        before = fake_app.state.cancelled_streams
+        await ws.send(json.dumps({"type": "chat", "id": "b2", "message": "cancel me"}))
+        while json.loads(await ws.recv())["type"] != "chat.delta":
+            pass
+        await ws.send(json.dumps({"type": "chat.cancel", "id": "b2"}))
+        await asyncio.sleep(0.5)
+        ws_cancelled = fake_app.state.cancelled_streams - before
+
+    print(f"/api/chat full answer:       {full_ms:.0f} ms")
+    print(f"/api/chat/stream first token: {sse_first_ms:.0f} ms (complete {sse_total_ms:.0f} ms)")
+    print(f"/ws chat first token:         {ws_first_ms:.0f} ms")
+    print(f"Upstream aborted on SSE disconnect: {bool(sse_cancelled)}, on ws cancel: {bool(ws_cancelled)}")
+
+    ok = sse_first_ms < full_ms / 2 and ws_first_ms < full_ms / 2 and sse_cancelled and ws_cancelled
+    print("\n✅ Streaming works" if ok else "\n❌ Streaming check failed")
+    return ok
+
+
+if __name__ == "__main__":
+    words = int(sys.argv[1]) if len(sys.argv) > 1 else 40
+    per_word = float(sys.argv[2]) if len(sys.argv) > 2 else 0.05
+    total = words * per_word
+
+    os.environ["GEMINI_BASE_URL"] = f"http://127.0.0.1:{FAKE_PORT}"
+    os.environ.setdefault("GOOGLE_API_KEY", "fake-key")
+    os.environ["LLM_CACHE_PATH"] = ""
+    import main
+
+    fake_app = create_app(delay=total, reply=" ".join(f"word{i}" for i in range(words)), chunk_delay=per_word)
+    start_server(fake_app, FAKE_PORT)
+    start_server(main.app, APP_PORT)
+    sys.exit(0 if asyncio.run(run(fake_app, total)) else 1)
@@ -0,0 +1,137 @@
+"""
+Multi-worker benchmark: `uvicorn main:app --workers N` with and without the
+shared snapshot.
+Generates a synthetic political_data.json, starts the cluster, and reports
+per-worker memory (RSS, PSS and private bytes from /proc/<pid>/smaps_rollup)
+plus, in shared mode, how long a country generated through one worker takes
+to become visible in every worker. Linux only.
+Usage: python bench_workers.py [workers] [events]
+"""
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+from bench_nonblocking import start_server
+from fake_gemini import create_app
+
+FAKE_PORT = 8775
+APP_PORT = 8776
+
+NEW_COUNTRY = {
+    "id": "atlantis", "name": "Atlantis", "code": "ATL", "capital": "Poseidonis", "population": 1000,
+    "gdp": None, "government_type": "Thalassocracy", "current_events": [], "historical_figures": [],
+}
+
+
+def memory_of(pid: int) -> dict:
+    fields = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            name, _, value = line.partition(":")
+            if value.strip().endswith("kB"):
+                fields[name] = int(value.split()[0]) * 1024
+    return {
+        "rss": fields["Rss"],
+        "pss": fields["Pss"],
+        "private": fields["Private_Clean"] + fields["Private_Dirty"],
+    }
+
+
+def worker_pids(parent: int):
+    with open(f"/proc/{parent}/task/{parent}/children") as f:
+        return [int(pid) for pid in f.read().split()]
+
+
+def statuses(client: httpx.Client, tries: int = 200) -> dict:
+    """Latest /api/shared/status per worker pid (requests land on workers at random)"""
+    seen = {}
+    for _ in range(tries):
+        # A fresh connection each time; keep-alive would pin every request to one worker
+        status = client.get("/api/shared/status", headers={"Connection": "close"}).json()
+        seen[status["pid"]] = status
+    return seen
+
+
+def run_cluster(label: str, workers: int, env: dict, expected: int):
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--workers", str(workers),
+         "--host", "127.0.0.1", "--port", str(APP_PORT), "--log-level", "warning"],
+        cwd=os.path.dirname(os.path.abspath(__file__)), env=env,
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        with httpx.Client(base_url=f"http://127.0.0.1:{APP_PORT}", timeout=60) as client:
+            start = time.perf_counter()
+            while True:
+                try:
+                    seen = statuses(client, 50)
+                    if len(seen) == workers and all(s["countries"] == expected for s in seen.values()):
+                        break
+                except httpx.TransportError:
+                    pass
+                if time.perf_counter() - start > 300:
+                    raise RuntimeError(f"{label}: workers did not come up")
+                time.sleep(0.5)
+            print(f"\n{label}: {workers} workers ready in {time.perf_counter() - start:.1f}s")
+
+            total = {"rss": 0, "pss": 0, "private": 0}
+            for pid in worker_pids(process.pid):
+                memory = memory_of(pid)
+                role = seen.get(pid, {}).get("role", "-")
+                print(f"  worker {pid} ({role:<6}) RSS {memory['rss'] / 1e6:7.1f} MB   "
+                      f"PSS {memory['pss'] / 1e6:7.1f} MB   private {memory['private'] / 1e6:7.1f} MB")
+                for name in total:
+                    total[name] += memory[name]
+            print(f"  total                  RSS {total['rss'] / 1e6:7.1f} MB   "
+                  f"PSS {total['pss'] / 1e6:7.1f} MB   private {total['private'] / 1e6:7.1f} MB")
+
+            if env.get("SHARED_SNAPSHOT_PATH"):
+                start = time.perf_counter()
+                client.post("/api/generate-country-info/Atlantis").raise_for_status()
+                while True:
+                    seen = statuses(client, 50)
+                    if len(seen) == workers and all(s["countries"] == expected + 1 for s in seen.values()):
+                        break
+                    time.sleep(0.05)
+                print(f"  new country visible in all workers after {time.perf_counter() - start:.2f}s")
+    finally:
+        process.terminate()
+        process.wait()
+
+
+if __name__ == "__main__":
+    n_workers = int(sys.argv[1]) if len(sys.argv) > 1 else 4
+    n_events = int(sys.argv[2]) if len(sys.argv) > 2 else 20_000
+
+    start_server(create_app(reply=json.dumps(NEW_COUNTRY)), FAKE_PORT)
+
+    from bench_search import build_corpus
+
+    with tempfile.TemporaryDirectory() as tmp:
+        data_file = os.path.join(tmp, "political_data.json")
+        n_countries = max(n_events // 100, 1)
+        corpus = build_corpus(n_events, n_countries)
+        with open(data_file, "w", encoding="utf-8") as f:
+            json.dump({"countries": [c.model_dump() for c in corpus]}, f)
+        print(f"Dataset: {n_countries} countries, {n_events} events, {os.path.getsize(data_file) / 1e6:.1f} MB JSON")
+
+        base_env = {
+            **os.environ,
+            "POLITICAL_DATA_PATH": data_file,
+            "DATA_SNAPSHOT_PATH": "",
+            "DATA_RELOAD_INTERVAL": "0",
+            "LLM_CACHE_PATH": "",
+            "QUIZ_POOL_SIZE": "0",
+            "GEMINI_API_KEY": "fake",
+            "GEMINI_BASE_URL": f"http://127.0.0.1:{FAKE_PORT}",
+        }
+        run_cluster("Separate copies", n_workers,
+                    {**base_env, "COUNTRY_STORE_PATH": os.path.join(tmp, "separate")}, n_countries)
+        run_cluster("Shared snapshot", n_workers,
+                    {**base_env, "COUNTRY_STORE_PATH": os.path.join(tmp, "shared"),
+                     "SHARED_SNAPSHOT_PATH": os.path.join(tmp, "shared.snapshot")}, n_countries)
@@ -0,0 +1,193 @@
+"""
+Retrieval-augmented context for chat prompts.
+
+The question (plus the country/event/figure the user is looking at) is run
+through the BM25 search index. The hits are cut into passages: an event's
+summary, its impact and background, and its full_history paragraph by
+paragraph; a figure's biography; a country's profile. Passages are ranked
+by the score of their document and by how many question terms they share,
+then packed greedily into what is left of a fixed token budget after the
+instructions, the question and the trimmed history.
+
+Tokens are estimated at 4 characters each; there is no tokenizer locally.
+"""
+import re
+from typing import Any, Callable, Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+from search_index import SearchIndex, tokenize
+
+CHARS_PER_TOKEN = 4
+
+# Longest passage; longer paragraphs are split at sentence ends
+PASSAGE_TOKENS = 160
+
+# Documents taken from the index per question
+SEARCH_HITS = 12
+
+# Share of the budget history may take when retrieval needs the rest
+HISTORY_SHARE = 0.3
+
+# A single history message or the question is cut to this share of the budget
+MESSAGE_SHARE = 0.25
+
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+
+
+def estimate_tokens(text: str) -> int:
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def truncate(text: str, tokens: int) -> str:
+    """Cut text to about tokens, at a word boundary, marking the cut"""
+    limit = tokens * CHARS_PER_TOKEN
+    if len(text) <= limit:
+        return text
+    cut = text.rfind(" ", 0, limit - 1)
+    return text[:cut if cut > 0 else limit - 1] + "…"
+
+
+class Passage(NamedTuple):
+    score: float
+    source: str  # "event:<country>:<id>", "figure:<id>" or "country:<id>"
+    text: str
+
+
+def split_passages(text: str, max_tokens: int = PASSAGE_TOKENS) -> List[str]:
+    """Paragraphs of text, with long ones split into runs of whole sentences"""
+    passages = []
+    for paragraph in re.split(r"\n\s*\n", text or ""):
+        paragraph = " ".join(paragraph.split())
+        if not paragraph:
+            continue
+        if estimate_tokens(paragraph) <= max_tokens:
+            passages.append(paragraph)
+            continue
+        current = ""
+        for sentence in _SENTENCE_END.split(paragraph):
+            if current and estimate_tokens(current) + estimate_tokens(sentence) + 1 > max_tokens:
+                passages.append(truncate(current, max_tokens))
+                current = ""
+            current = f"{current} {sentence}".strip()
+        if current:
+            passages.append(truncate(current, max_tokens))
+    return passages
+
+
+def _overlap(terms: set, text: str) -> float:
+    """Share of the question terms that occur in text"""
+    if not terms:
+        return 0.0
+    return len(terms & set(tokenize(text))) / len(terms)
+
+
+def _event_passages(event, country_name: str, score: float, terms: set, source: str) -> List[Passage]:
+    summary = f"Event ({event.date}, {country_name}): {event.title}. {event.description}"
+    passages = [Passage(score * 1.5, source, truncate(summary, PASSAGE_TOKENS))]
+    for label, text in (("Impact", event.impact), ("Background", event.background)):
+        if text:
+            text = truncate(f"{label} of {event.title}: {text}", PASSAGE_TOKENS)
+            passages.append(Passage(score * (0.5 + _overlap(terms, text)), source, text))
+    for chunk in split_passages(event.full_history):
+        # Only paragraphs that talk about the question earn their place
+        overlap = _overlap(terms, chunk)
+        if overlap:
+            passages.append(Passage(score * overlap, source, f"{event.title}: {chunk}"))
+    return passages
+
+
+def retrieve_passages(
+    question: str,
+    focus: Sequence[str],
+    index: SearchIndex,
+    get_country: Callable[[str], Optional[Any]],
+    hits: int = SEARCH_HITS,
+) -> List[Passage]:
+    """Passages for the question, best first; focus names (the page the user is on) widen the query"""
+    terms = set(tokenize(question))
+    _, results = index.search(" ".join([question, *focus]), limit=hits)
+    passages: List[Passage] = []
+    for result in results:
+        country = get_country(result["country_id"])
+        if country is None:
+            continue
+        score = result["score"]
+        if result["type"] == "event":
+            event = next((e for e in country.current_events if e.id == result["id"]), None)
+            if event is not None:
+                source = f"event:{country.id}:{event.id}"
+                passages.extend(_event_passages(event, country.name, score, terms, source))
+        elif result["type"] == "figure":
+            figure = next((f for f in country.historical_figures if f.id == result["id"]), None)
+            if figure is not None:
+                years = f"{figure.birth_year or '?'}-{figure.death_year or ''}"
+                text = f"Figure: {figure.name} ({figure.role}, {years}). {figure.biography}"
+                passages.append(Passage(score, f"figure:{figure.id}", truncate(text, PASSAGE_TOKENS)))
+        else:
+            text = (f"Country: {country.name}, capital {country.capital}, {country.government_type}, "
+                    f"population {country.population:,}" + (f", GDP ${country.gdp}B" if country.gdp else ""))
+            passages.append(Passage(score, f"country:{country.id}", text))
+    passages.sort(key=lambda p: p.score, reverse=True)
+    return passages
+
+
+def pack_passages(passages: Iterable[Passage], budget: int) -> Tuple[List[Passage], int]:
+    """Best passages that fit in budget tokens, skipping repeats; returns them and the tokens used"""
+    chosen, seen, used = [], set(), 0
+    for passage in passages:
+        cost = estimate_tokens(passage.text) + 1
+        if passage.text in seen or used + cost > budget:
+            continue
+        chosen.append(passage)
+        seen.add(passage.text)
+        used += cost
+    return chosen, used
+
+
+def trim_history(history: Sequence[Tuple[str, str]], budget: int, message_tokens: int) -> Tuple[List[Tuple[str, str]], int]:
+    """Newest (role, content) messages that fit in budget, each cut to message_tokens, oldest first"""
+    kept, used = [], 0
+    for role, content in reversed(history):
+        content = truncate(content, message_tokens)
+        cost = estimate_tokens(content) + 2
+        if used + cost > budget:
+            break
+        kept.append((role, content))
+        used += cost
+    kept.reverse()
+    return kept, used
+
+
+def build_context(
+    question: str,
+    focus: Sequence[str],
+    history: Sequence[Tuple[str, str]],
+    budget: int,
+    fixed_tokens: int,
+    index: SearchIndex,
+    get_country: Callable[[str], Optional[Any]],
+) -> Dict[str, Any]:
+    """Split budget between history and retrieved passages once fixed_tokens (instructions) are paid.
+    Returns the question (trimmed), history, passages and a token breakdown."""
+    message_tokens = max(1, int(budget * MESSAGE_SHARE))
+    question = truncate(question, message_tokens)
+    available = max(0, budget - fixed_tokens - estimate_tokens(question))
+
+    passages = retrieve_passages(question, focus, index, get_country)
+    # History may use its share, or more when retrieval found little to say
+    wanted = sum(estimate_tokens(p.text) + 1 for p in passages)
+    history_budget = max(int(available * HISTORY_SHARE), available - wanted)
+    kept_history, history_used = trim_history(history, history_budget, message_tokens)
+    chosen, context_used = pack_passages(passages, available - history_used)
+    return {
+        "question": question,
+        "history": kept_history,
+        "passages": chosen,
+        "tokens": {
+            "budget": budget,
+            "fixed": fixed_tokens + estimate_tokens(question),
+            "history": history_used,
+            "context": context_used,
+            "history_dropped": len(history) - len(kept_history),
+            "passages_considered": len(passages),
+        },
+    }
@@ -0,0 +1,157 @@
+"""
+Durable storage for AI-generated countries.
+
+Every generated country is appended as one JSON line to a write-ahead log
+by a background writer thread, which fsyncs each batch, so the event loop
+never waits on disk. Once the log holds enough records it is compacted
+into a snapshot (latest record per country id). On startup the snapshot is
+read and the log replayed on top of it.
+"""
+import json
+import logging
+import os
+import queue
+import threading
+from typing import Dict, List, Optional
+
+log = logging.getLogger(__name__)
+
+_STOP = object()
+
+
+class CountryStore:
+    def __init__(self, path: str, compact_every: int = 1000, fsync: bool = True):
+        self.log_path = path + ".log"
+        self.snapshot_path = path + ".snapshot"
+        self.compact_every = compact_every
+        self.fsync = fsync
+        self._queue: "queue.Queue" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        # country id -> JSON line of its latest record; owned by the writer thread once started
+        self._records: Dict[str, str] = {}
+        self._log_entries = 0
+        self.writes = 0
+        self.compactions = 0
+        self.write_errors = 0
+
+    # --- recovery ---
+
+    def _read_lines(self, path: str, parsed: Dict[str, dict]) -> int:
+        if not os.path.exists(path):
+            return 0
+        count = 0
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    record = json.loads(line)
+                    country_id = record["id"]
+                except (ValueError, KeyError, TypeError):
+                    # A torn last line after a crash; everything before it is intact
+                    log.warning("⚠️ Skipping unreadable record in %s", os.path.basename(path))
+                    continue
+                # Re-insert so iteration follows the latest write
+                self._records.pop(country_id, None)
+                self._records[country_id] = line
+                parsed.pop(country_id, None)
+                parsed[country_id] = record
+                count += 1
+        return count
+
+    def load(self) -> List[dict]:
+        """Replay snapshot + log and return the latest record of every country"""
+        self._records.clear()
+        parsed: Dict[str, dict] = {}
+        self._read_lines(self.snapshot_path, parsed)
+        self._log_entries = self._read_lines(self.log_path, parsed)
+        return list(parsed.values())
+
+    # --- writes ---
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._writer, name="country-store-writer", daemon=True)
+            self._thread.start()
+
+    def put(self, country_id: str, country_json: str):
+        """Queue a country record for durable storage; never blocks"""
+        self._queue.put((country_id, country_json))
+
+    def _writer(self):
+        while True:
+            batch = [self._queue.get()]
+            # Group commit: one write + fsync for everything queued meanwhile
+            while True:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            stop = any(item is _STOP for item in batch)
+            records = [item for item in batch if item is not _STOP]
+            try:
+                if records:
+                    self._append(records)
+                if self._log_entries >= self.compact_every:
+                    self.compact()
+            except OSError as e:
+                self.write_errors += 1
+                log.error("❌ Country store write failed: %s", e)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+            if stop:
+                return
+
+    def _append(self, records):
+        with open(self.log_path, "a", encoding="utf-8") as f:
+            for country_id, line in records:
+                f.write(line + "\n")
+            f.flush()
+            if self.fsync:
+                os.fsync(f.fileno())
+        for country_id, line in records:
+            self._records.pop(country_id, None)
+            self._records[country_id] = line
+        self._log_entries += len(records)
+        self.writes += len(records)
+
+    def compact(self):
+        """Fold the log into a fresh snapshot and start an empty log"""
+        tmp_path = self.snapshot_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            for line in self._records.values():
+                f.write(line + "\n")
+            f.flush()
+            if self.fsync:
+                os.fsync(f.fileno())
+        os.replace(tmp_path, self.snapshot_path)
+        # Only truncate the log once the snapshot holding its records is in place
+        with open(self.log_path, "w", encoding="utf-8") as f:
+            if self.fsync:
+                os.fsync(f.fileno())
+        self._log_entries = 0
+        self.compactions += 1
+
+    def flush(self):
+        """Block until every queued record is on disk"""
+        if self._thread is not None:
+            self._queue.join()
+
+    def close(self):
+        if self._thread is not None:
+            self._queue.put(_STOP)
+            self._thread.join()
+            self._thread = None
+
+    def stats(self) -> dict:
+        return {
+            "countries": len(self._records),
+            "log_entries": self._log_entries,
+            "pending": self._queue.qsize(),
+            "writes": self.writes,
+            "compactions": self.compactions,
+            "write_errors": self.write_errors,
+        }
@@ -0,0 +1,75 @@
+"""
+Compiled snapshot of political_data.json.
+
+Holds the already sorted and validated Country models, with the content
+hash of each country's JSON, in a binary pickle next to the source file.
+The header records the source file's size, mtime and SHA-256 plus a
+fingerprint of the model schema, so a snapshot is only used while it still
+matches both; otherwise the loader falls back to the JSON file and writes a
+fresh snapshot.
+
+The snapshot is a local cache written by this process. It is not meant to
+be shared or downloaded: pickle must never read untrusted files.
+"""
+import gc
+import hashlib
+import os
+import pickle
+from typing import Any, Optional
+
+SNAPSHOT_FORMAT = 2
+
+
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _source_header(source_path: str, schema_key: str) -> dict:
+    stat = os.stat(source_path)
+    return {
+        "format": SNAPSHOT_FORMAT,
+        "schema": schema_key,
+        "size": stat.st_size,
+        "mtime_ns": stat.st_mtime_ns,
+        "sha256": file_sha256(source_path),
+    }
+
+
+def load_snapshot(snapshot_path: str, source_path: str, schema_key: str) -> Optional[Any]:
+    """Return the snapshot's countries if it matches the source file, else None"""
+    if not snapshot_path or not os.path.exists(snapshot_path):
+        return None
+    try:
+        with open(snapshot_path, "rb") as f:
+            header = pickle.load(f)
+            if header.get("format") != SNAPSHOT_FORMAT or header.get("schema") != schema_key:
+                return None
+            stat = os.stat(source_path)
+            if (header["size"], header["mtime_ns"]) != (stat.st_size, stat.st_mtime_ns):
+                # Touched but maybe unchanged (e.g. a git checkout): compare contents
+                if header["size"] != stat.st_size or header["sha256"] != file_sha256(source_path):
+                    return None
+            # Unpickling only allocates; collector passes over the new objects are wasted work
+            gc_enabled = gc.isenabled()
+            gc.disable()
+            try:
+                return pickle.load(f)
+            finally:
+                if gc_enabled:
+                    gc.enable()
+    except (OSError, pickle.UnpicklingError, EOFError, AttributeError, KeyError, ImportError):
+        return None
+
+
+def write_snapshot(snapshot_path: str, source_path: str, schema_key: str, countries: Any):
+    """Atomically write a snapshot for the current state of source_path"""
+    header = _source_header(source_path, schema_key)
+    tmp_path = snapshot_path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        pickle.dump(header, f, protocol=pickle.HIGHEST_PROTOCOL)
+        pickle.dump(countries, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, snapshot_path)
@@ -0,0 +1,474 @@
+"""
+Relationship graph between countries, events and figures.
+
+Events name the countries and figures they involve, and figures the
+countries they belong to, as free text ("United States", "Joe Biden").
+The graph resolves those names to database ids once, on write, and keeps
+undirected adjacency between node numbers:
+
+    country -- its events and figures
+    event   -- the countries and figures it names
+    figure  -- the countries it names
+
+A name resolves when exactly one country (by name, code, id or alias) or
+figure (by name) carries it, compared case- and punctuation-insensitively.
+Names nobody carries yet are remembered, so a country added later is linked
+to the events that already mention it. Like the search and timeline
+indexes, the graph is updated one country at a time; every edge counts the
+countries that contributed it, so removing a country takes back exactly
+its share. Neighbors, k-hop expansion and shortest paths are breadth-first
+searches over the adjacency and never touch the DB.
+"""
+import json
+import re
+from bisect import bisect_left
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+import numpy as np
+
+from entity_matcher import COUNTRY_ALIASES
+from shared_snapshot import PackedRows, pack_rows
+
+NODE_TYPES = ("country", "event", "figure")
+
+_NON_WORD_RE = re.compile(r"[\W_]+", re.UNICODE)
+
+# (country or figure, normalized name)
+NameKey = Tuple[str, str]
+
+
+def normalize_name(name: str) -> str:
+    """"U.S." -> "u s", "Türkiye" -> "türkiye"; a leading "the" is dropped"""
+    words = _NON_WORD_RE.sub(" ", name.casefold()).split()
+    if len(words) > 1 and words[0] == "the":
+        words = words[1:]
+    return " ".join(words)
+
+
+def country_node(country_id: str) -> str:
+    return f"country:{country_id}"
+
+
+def figure_node(figure_id: str) -> str:
+    return f"figure:{figure_id}"
+
+
+def event_node(country_id: str, event_id: str) -> str:
+    # Event ids are only unique within their country
+    return f"event:{country_id}/{event_id}"
+
+
+def describe_node(key: str, name: str) -> Dict[str, Any]:
+    """API shape of a node: its key, type, database id and display name"""
+    node_type, _, node_id = key.partition(":")
+    node = {"node": key, "type": node_type, "id": node_id, "name": name}
+    if node_type == "event":
+        node["country_id"], _, node["id"] = node_id.partition("/")
+    return node
+
+
+class _Contribution:
+    """What one indexed country added to the graph, so it can be taken back"""
+
+    __slots__ = ("nodes", "edges", "names", "refs")
+
+    def __init__(self):
+        self.nodes: List[int] = []
+        self.edges: List[Tuple[int, int]] = []
+        self.names: List[Tuple[NameKey, int]] = []
+        # (source node, name key, name as written)
+        self.refs: List[Tuple[int, NameKey, str]] = []
+
+
+class _PublishedAdjacency:
+    """Node -> neighbor nodes over CSR sections"""
+
+    def __init__(self, offsets: np.ndarray, targets: np.ndarray):
+        self._offsets = offsets
+        self._targets = targets
+
+    def __getitem__(self, node: int) -> List[int]:
+        return self._targets[self._offsets[node]:self._offsets[node + 1]].tolist()
+
+
+class _PublishedLookup:
+    """Key -> node over the published keys, which are sorted"""
+
+    def __init__(self, keys: PackedRows):
+        self._keys = keys
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def __getitem__(self, i: int) -> str:
+        return self._keys[i]
+
+    def get(self, key: str) -> Optional[int]:
+        pos = bisect_left(self, key)
+        return pos if pos < len(self._keys) and self._keys[pos] == key else None
+
+
+class EntityGraph:
+    def __init__(self):
+        # Node number -> key ("country:usa") and display name; None for free numbers
+        self._keys: List[Optional[str]] = []
+        self._names: List[Optional[str]] = []
+        self._lookup: Dict[str, int] = {}
+        # Node -> {neighbor: number of countries that contributed the edge}
+        self._adjacency: List[Dict[int, int]] = []
+        # Node -> number of countries it belongs to (a figure may be listed by two)
+        self._owners: List[int] = []
+        self._free: List[int] = []
+        self._contributions: Dict[str, _Contribution] = {}
+        # Name key -> {node carrying it: count}, and -> {source node naming it: count}
+        self._carriers: Dict[NameKey, Dict[int, int]] = {}
+        self._referrers: Dict[NameKey, Dict[int, int]] = {}
+        # (source, name key) -> node the name currently resolves to
+        self._resolved: Dict[Tuple[int, NameKey], int] = {}
+        # Source node -> names it refers to, as written
+        self._refs: Dict[int, List[Tuple[NameKey, str]]] = {}
+        self._unresolved: Optional[Dict[int, List[str]]] = None
+        self._edge_count = 0
+        self.read_only = False
+
+    def __len__(self) -> int:
+        return len(self._lookup)
+
+    @property
+    def edge_count(self) -> int:
+        return self._edge_count
+
+    def _check_writable(self):
+        if self.read_only:
+            raise RuntimeError("this graph was loaded from a shared snapshot and is read-only")
+
+    # --- writes ---
+
+    def _acquire(self, key: str, name: str, contribution: _Contribution) -> int:
+        node = self._lookup.get(key)
+        if node is None:
+            if self._free:
+                node = self._free.pop()
+                self._keys[node], self._adjacency[node], self._owners[node] = key, {}, 0
+            else:
+                node = len(self._keys)
+                self._keys.append(key)
+                self._names.append(None)
+                self._adjacency.append({})
+                self._owners.append(0)
+            self._lookup[key] = node
+        self._names[node] = name
+        self._owners[node] += 1
+        contribution.nodes.append(node)
+        return node
+
+    def _release(self, node: int):
+        self._owners[node] -= 1
+        if self._owners[node] == 0:
+            # Edges into it went with the names it carried
+            del self._lookup[self._keys[node]]
+            self._keys[node] = self._names[node] = None
+            self._adjacency[node] = {}
+            self._free.append(node)
+
+    def _link(self, a: int, b: int):
+        if a == b:
+            return
+        count = self._adjacency[a].get(b, 0)
+        if count == 0:
+            self._edge_count += 1
+        self._adjacency[a][b] = count + 1
+        self._adjacency[b][a] = count + 1
+
+    def _unlink(self, a: int, b: int):
+        if a == b:
+            return
+        count = self._adjacency[a][b] - 1
+        if count == 0:
+            del self._adjacency[a][b], self._adjacency[b][a]
+            self._edge_count -= 1
+        else:
+            self._adjacency[a][b] = self._adjacency[b][a] = count
+
+    def _resolve(self, name_key: NameKey) -> Optional[int]:
+        carriers = self._carriers.get(name_key)
+        if carriers is None or len(carriers) != 1:
+            return None
+        return next(iter(carriers))
+
+    def _re_resolve(self, name_key: NameKey):
+        """The carriers of name_key changed: move the edges of the nodes naming it"""
+        target = self._resolve(name_key)
+        for source in self._referrers.get(name_key, ()):
+            previous = self._resolved.pop((source, name_key), None)
+            if previous == target:
+                if target is not None:
+                    self._resolved[(source, name_key)] = target
+                continue
+            if previous is not None:
+                self._unlink(source, previous)
+            if target is not None:
+                self._link(source, target)
+                self._resolved[(source, name_key)] = target
+
+    def _carry(self, node_type: str, name: Optional[str], node: int, contribution: _Contribution):
+        name_key = (node_type, normalize_name(name or ""))
+        if not name_key[1]:
+            return
+        carriers = self._carriers.setdefault(name_key, {})
+        carriers[node] = carriers.get(node, 0) + 1
+        contribution.names.append((name_key, node))
+        if carriers[node] == 1:
+            self._re_resolve(name_key)
+
+    def _uncarry(self, name_key: NameKey, node: int):
+        carriers = self._carriers[name_key]
+        carriers[node] -= 1
+        if carriers[node] == 0:
+            del carriers[node]
+            if not carriers:
+                del self._carriers[name_key]
+            self._re_resolve(name_key)
+
+    def _refer(self, source: int, node_type: str, name: str, contribution: _Contribution):
+        name_key = (node_type, normalize_name(name or ""))
+        if not name_key[1]:
+            return
+        self._refs.setdefault(source, []).append((name_key, name))
+        contribution.refs.append((source, name_key, name))
+        referrers = self._referrers.setdefault(name_key, {})
+        referrers[source] = referrers.get(source, 0) + 1
+        if referrers[source] == 1:
+            target = self._resolve(name_key)
+            if target is not None:
+                self._link(source, target)
+                self._resolved[(source, name_key)] = target
+
+    def _unrefer(self, source: int, name_key: NameKey, name: str):
+        refs = self._refs[source]
+        refs.remove((name_key, name))
+        if not refs:
+            del self._refs[source]
+        referrers = self._referrers[name_key]
+        referrers[source] -= 1
+        if referrers[source] == 0:
+            del referrers[source]
+            if not referrers:
+                del self._referrers[name_key]
+            target = self._resolved.pop((source, name_key), None)
+            if target is not None:
+                self._unlink(source, target)
+
+    def index_country(self, country):
+        """Replace the nodes and edges one country contributes"""
+        self.remove_country(country.id)
+        contribution = _Contribution()
+        this = self._acquire(country_node(country.id), country.name, contribution)
+        events = [
+            (self._acquire(event_node(country.id, event.id), event.title, contribution), event)
+            for event in country.current_events
+        ]
+        figures = [
+            (self._acquire(figure_node(figure.id), figure.name, contribution), figure)
+            for figure in country.historical_figures
+        ]
+
+        for node, _ in events + figures:
+            self._link(this, node)
+            contribution.edges.append((this, node))
+
+        for name in [country.id, country.name, country.code, *COUNTRY_ALIASES.get(country.code, [])]:
+            self._carry("country", name, this, contribution)
+        for node, figure in figures:
+            self._carry("figure", figure.name, node, contribution)
+
+        for node, event in events:
+            for name in event.related_countries:
+                self._refer(node, "country", name, contribution)
+            for name in event.related_figures:
+                self._refer(node, "figure", name, contribution)
+        for node, figure in figures:
+            for name in figure.related_countries:
+                self._refer(node, "country", name, contribution)
+        self._contributions[country.id] = contribution
+
+    def remove_country(self, country_id: str):
+        """Take back what one country contributed"""
+        self._check_writable()
+        contribution = self._contributions.pop(country_id, None)
+        if contribution is None:
+            return
+        for source, name_key, name in contribution.refs:
+            self._unrefer(source, name_key, name)
+        for name_key, node in contribution.names:
+            self._uncarry(name_key, node)
+        for a, b in contribution.edges:
+            self._unlink(a, b)
+        for node in contribution.nodes:
+            self._release(node)
+
+    # --- sharing between processes ---
+
+    def export(self) -> Dict[str, bytes]:
+        """The graph as CSR sections for a shared snapshot, nodes sorted by key; see load()"""
+        order = sorted(self._lookup.values(), key=self._keys.__getitem__)
+        position = {node: i for i, node in enumerate(order)}
+        offsets = np.zeros(len(order) + 1, dtype=np.int64)
+        targets = []
+        for i, node in enumerate(order):
+            targets.extend(sorted(position[neighbor] for neighbor in self._adjacency[node]))
+            offsets[i + 1] = len(targets)
+        keys, key_offsets = pack_rows(self._keys[node].encode("utf-8") for node in order)
+        names, name_offsets = pack_rows(self._names[node].encode("utf-8") for node in order)
+        unresolved = {position[node]: names for node, names in self._unresolved_names().items()}
+        return {
+            "header": json.dumps({"unresolved": unresolved, "edges": self._edge_count}, ensure_ascii=False).encode("utf-8"),
+            "keys": keys,
+            "key_offsets": key_offsets,
+            "names": names,
+            "name_offsets": name_offsets,
+            "offsets": offsets.tobytes(),
+            "targets": np.array(targets, dtype=np.int32).tobytes(),
+        }
+
+    @classmethod
+    def load(cls, sections: Dict[str, memoryview]) -> "EntityGraph":
+        """Read-only graph over sections from export()"""
+        header = json.loads(bytes(sections["header"]))
+        decode = lambda row: row.decode("utf-8")  # noqa: E731
+        graph = cls()
+        graph._keys = PackedRows(sections["keys"], sections["key_offsets"], decode)
+        graph._names = PackedRows(sections["names"], sections["name_offsets"], decode)
+        graph._lookup = _PublishedLookup(graph._keys)
+        graph._adjacency = _PublishedAdjacency(
+            np.frombuffer(sections["offsets"], dtype=np.int64), np.frombuffer(sections["targets"], dtype=np.int32)
+        )
+        graph._unresolved = {int(node): names for node, names in header["unresolved"].items()}
+        graph._edge_count = header["edges"]
+        graph.read_only = True
+        return graph
+
+    def _unresolved_names(self) -> Dict[int, List[str]]:
+        if self._unresolved is not None:
+            return self._unresolved
+        unresolved = {}
+        for source, refs in self._refs.items():
+            names = [name for name_key, name in refs if (source, name_key) not in self._resolved]
+            if names:
+                unresolved[source] = names
+        return unresolved
+
+    # --- queries ---
+
+    def _describe(self, node: int, **extra) -> Dict[str, Any]:
+        return {**describe_node(self._keys[node], self._names[node]), **extra}
+
+    def _neighbors(self, node: int, types: Optional[Set[str]] = None) -> List[int]:
+        neighbors = sorted(self._adjacency[node], key=self._keys.__getitem__)
+        if types:
+            neighbors = [n for n in neighbors if self._keys[n].partition(":")[0] in types]
+        return neighbors
+
+    def node(self, key: str) -> Optional[Dict[str, Any]]:
+        node = self._lookup.get(key)
+        return None if node is None else self._describe(node)
+
+    def neighbors(self, key: str, types: Optional[Set[str]] = None, limit: int = 100) -> Optional[Dict[str, Any]]:
+        """Nodes one edge away, plus the names the node mentions that resolved to nothing"""
+        node = self._lookup.get(key)
+        if node is None:
+            return None
+        neighbors = self._neighbors(node, types)
+        if self._unresolved is not None:
+            unresolved = self._unresolved.get(node, [])
+        else:
+            unresolved = [name for name_key, name in self._refs.get(node, []) if (node, name_key) not in self._resolved]
+        return {
+            "node": self._describe(node),
+            "total": len(neighbors),
+            "neighbors": [self._describe(n) for n in neighbors[:limit]],
+            "unresolved": unresolved,
+        }
+
+    def expand(self, key: str, hops: int, types: Optional[Set[str]] = None, limit: int = 200) -> Optional[Dict[str, Any]]:
+        """Nodes within hops edges, nearest first. types filters what is returned, not what is walked."""
+        start = self._lookup.get(key)
+        if start is None:
+            return None
+        distance = {start: 0}
+        frontier = [start]
+        found: List[int] = []
+        truncated = False
+        for hop in range(1, hops + 1):
+            next_frontier = []
+            for node in frontier:
+                for neighbor in self._neighbors(node):
+                    if neighbor in distance:
+                        continue
+                    distance[neighbor] = hop
+                    next_frontier.append(neighbor)
+                    if not types or self._keys[neighbor].partition(":")[0] in types:
+                        found.append(neighbor)
+            frontier = next_frontier
+            if len(found) >= limit:
+                truncated = len(found) > limit or bool(frontier and hop < hops)
+                break
+            if not frontier:
+                break
+        return {
+            "node": self._describe(start),
+            "hops": hops,
+            "truncated": truncated,
+            "nodes": [self._describe(n, distance=distance[n]) for n in found[:limit]],
+        }
+
+    def shortest_path(self, source: str, target: str, max_hops: int = 6) -> Optional[List[Dict[str, Any]]]:
+        """Nodes of a shortest path from source to target, both included; [] when they are
+        not connected within max_hops, None when either node is unknown"""
+        start, goal = self._lookup.get(source), self._lookup.get(target)
+        if start is None or goal is None:
+            return None
+        if start == goal:
+            return [self._describe(start)]
+        # Bidirectional BFS, always growing the smaller side by one level. The whole
+        # level is scanned so the meeting node with the shortest total is kept
+        parents: Tuple[Dict[int, Optional[int]], Dict[int, Optional[int]]] = ({start: None}, {goal: None})
+        depths: Tuple[Dict[int, int], Dict[int, int]] = ({start: 0}, {goal: 0})
+        frontiers = [[start], [goal]]
+        meeting, best = None, max_hops + 1
+        hops = 0
+        while meeting is None and frontiers[0] and frontiers[1] and hops < max_hops:
+            side = 0 if len(frontiers[0]) <= len(frontiers[1]) else 1
+            seen, depth, other = parents[side], depths[side], depths[1 - side]
+            next_frontier = []
+            for node in frontiers[side]:
+                for neighbor in self._neighbors(node):
+                    if neighbor in seen:
+                        continue
+                    seen[neighbor] = node
+                    depth[neighbor] = depth[node] + 1
+                    if neighbor in other and depth[neighbor] + other[neighbor] < best:
+                        meeting, best = neighbor, depth[neighbor] + other[neighbor]
+                    next_frontier.append(neighbor)
+            frontiers[side] = next_frontier
+            hops += 1
+        if meeting is None or best > max_hops:
+            return []
+        path = self._walk(parents[0], meeting)[::-1] + self._walk(parents[1], meeting)[1:]
+        return [self._describe(node) for node in path]
+
+    @staticmethod
+    def _walk(parents: Dict[int, Optional[int]], node: int) -> List[int]:
+        path = [node]
+        while parents[node] is not None:
+            node = parents[node]
+            path.append(node)
+        return path
+
+    def stats(self) -> Dict[str, int]:
+        unresolved = self._unresolved_names()
+        return {
+            "nodes": len(self),
+            "edges": self._edge_count,
+            "unresolved_names": sum(len(names) for names in unresolved.values()),
+        }
@@ -0,0 +1,182 @@
+"""
+Local entity recognizer for /api/analyze-text.
+
+An Aho-Corasick automaton over country names, aliases, demonyms, capitals and
+figure names finds every mention in a single pass over the text and maps it
+to the real database id, without asking the LLM.
+"""
+from collections import deque
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+# Extra names per ISO 3166-1 alpha-3 code. Country names, codes and capitals
+# come from the database itself.
+COUNTRY_ALIASES: Dict[str, List[str]] = {
+    "USA": ["United States", "U.S.", "US", "America"],
+    "GBR": ["UK", "U.K.", "Britain", "Great Britain", "England"],
+    "RUS": ["Russian Federation"],
+    "CHN": ["PRC", "People's Republic of China"],
+    "KOR": ["Republic of Korea"],
+    "PRK": ["North Korea", "DPRK"],
+    "DEU": ["Federal Republic of Germany"],
+    "IRN": ["Islamic Republic of Iran"],
+    "TUR": ["Türkiye", "Turkiye"],
+    "ARE": ["UAE", "Emirates"],
+    "COD": ["DRC", "Democratic Republic of the Congo"],
+    "NLD": ["Holland"],
+    "PSE": ["Palestine", "Palestinian Territories"],
+}
+
+COUNTRY_DEMONYMS: Dict[str, List[str]] = {
+    "USA": ["American", "Americans"],
+    "GBR": ["British", "Briton", "Britons"],
+    "RUS": ["Russian", "Russians"],
+    "CHN": ["Chinese"],
+    "DEU": ["German", "Germans"],
+    "FRA": ["French"],
+    "UKR": ["Ukrainian", "Ukrainians"],
+    "IND": ["Indian", "Indians"],
+    "JPN": ["Japanese"],
+    "BRA": ["Brazilian", "Brazilians"],
+    "ISR": ["Israeli", "Israelis"],
+    "IRN": ["Iranian", "Iranians"],
+    "TUR": ["Turkish"],
+    "KOR": ["South Korean", "South Koreans"],
+    "CAN": ["Canadian", "Canadians"],
+    "AUS": ["Australian", "Australians"],
+    "KAZ": ["Kazakh", "Kazakhstani", "Kazakhs"],
+    "ITA": ["Italian", "Italians"],
+    "ESP": ["Spanish"],
+    "MEX": ["Mexican", "Mexicans"],
+    "POL": ["Polish"],
+    "SAU": ["Saudi", "Saudis"],
+    "EGY": ["Egyptian", "Egyptians"],
+    "ZAF": ["South African", "South Africans"],
+    "PAK": ["Pakistani", "Pakistanis"],
+}
+
+# Patterns this short are only matched with their exact capitalization
+# ("US" but not "us"); longer ones match case-insensitively.
+CASE_SENSITIVE_MAX_LEN = 3
+
+
+class EntityMatch(NamedTuple):
+    text: str
+    type: str  # "country" or "figure"
+    id: str
+    start: int
+    end: int
+
+
+def _lower_same_length(text: str) -> str:
+    """Lowercase without changing string length, so offsets stay valid"""
+    lowered = text.lower()
+    if len(lowered) == len(text):
+        return lowered
+    return "".join(c.lower() if len(c.lower()) == 1 else c for c in text)
+
+
+class EntityMatcher:
+    def __init__(self, countries: Iterable = (), figures: Iterable = ()):
+        # pattern index -> (pattern as written, entity type, entity id, case sensitive)
+        self._patterns: List[Tuple[str, str, str, bool]] = []
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[List[int]] = [[]]
+
+        seen = set()
+
+        def add(pattern: Optional[str], entity_type: str, entity_id: str):
+            pattern = (pattern or "").strip()
+            if len(pattern) < 2:
+                return
+            case_sensitive = len(pattern) <= CASE_SENSITIVE_MAX_LEN
+            # The trie is always lowercase; case-sensitive hits are re-checked in find()
+            key = _lower_same_length(pattern)
+            if key in seen:
+                return
+            seen.add(key)
+            self._insert(key, len(self._patterns))
+            self._patterns.append((pattern, entity_type, entity_id, case_sensitive))
+
+        figures = list(figures)
+        for country in countries:
+            add(country.name, "country", country.id)
+            add(country.code, "country", country.id)
+            for capital in {country.capital, (country.capital or "").split(",")[0]}:
+                add(capital, "country", country.id)
+            for name in COUNTRY_ALIASES.get(country.code, []) + COUNTRY_DEMONYMS.get(country.code, []):
+                add(name, "country", country.id)
+
+        surnames: Dict[str, List[str]] = {}
+        for figure in figures:
+            add(figure.name, "figure", figure.id)
+            parts = figure.name.split()
+            if len(parts) > 1 and len(parts[-1]) > CASE_SENSITIVE_MAX_LEN:
+                surnames.setdefault(parts[-1], []).append(figure.id)
+        for surname, ids in surnames.items():
+            # Only unambiguous surnames ("Putin", "Merkel") resolve on their own
+            if len(set(ids)) == 1:
+                add(surname, "figure", ids[0])
+
+        self._build_failure_links()
+
+    def __len__(self) -> int:
+        return len(self._patterns)
+
+    def _insert(self, key: str, index: int):
+        node = 0
+        for char in key:
+            nxt = self._goto[node].get(char)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[node][char] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append([])
+            node = nxt
+        self._out[node].append(index)
+
+    def _build_failure_links(self):
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, child in self._goto[node].items():
+                queue.append(child)
+                fallback = self._fail[node]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                target = self._goto[fallback].get(char, 0)
+                self._fail[child] = target if target != child else 0
+                self._out[child] = self._out[child] + self._out[self._fail[child]]
+
+    def find(self, text: str) -> List[EntityMatch]:
+        """Return non-overlapping whole-word mentions, leftmost-longest first"""
+        lowered = _lower_same_length(text)
+        candidates = []
+        node = 0
+        goto, fail, out, patterns = self._goto, self._fail, self._out, self._patterns
+
+        for pos, char in enumerate(lowered):
+            while node and char not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(char, 0)
+            for index in out[node]:
+                pattern, entity_type, entity_id, case_sensitive = patterns[index]
+                end = pos + 1
+                start = end - len(pattern)
+                if case_sensitive and text[start:end] != pattern:
+                    continue
+                if start > 0 and text[start - 1].isalnum():
+                    continue
+                if end < len(text) and text[end].isalnum():
+                    continue
+                candidates.append((start, end, entity_type, entity_id))
+
+        candidates.sort(key=lambda m: (m[0], m[0] - m[1]))
+        matches = []
+        last_end = -1
+        for start, end, entity_type, entity_id in candidates:
+            if start >= last_end:
+                matches.append(EntityMatch(text[start:end], entity_type, entity_id, start, end))
+                last_end = end
+        return matches
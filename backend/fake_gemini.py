@@ -0,0 +1,140 @@
+"""
+Local stand-in for the Gemini REST API, used by the benchmark scripts.
+Latency can be given jitter, and a share of calls can fail with 429 or hang
+past the client's timeout. With structured=True the app's own prompts
+(batched entity analysis, quiz questions, country generation) get well-formed JSON
+answers, so every endpoint can be driven end to end.
+Usage: python fake_gemini.py [port] [delay_seconds]
+"""
+import asyncio
+import json
+import random
+import re
+import sys
+
+import uvicorn
+from fastapi import FastAPI
+from fastapi.responses import JSONResponse, StreamingResponse
+
+QUOTA_ERROR = {"error": {"code": 429, "message": "Resource has been exhausted (e.g. check quota).", "status": "RESOURCE_EXHAUSTED"}}
+
+
+def _candidate(text: str) -> dict:
+    return {"candidates": [{"content": {"parts": [{"text": text}], "role": "model"}}]}
+
+
+def _prompt_text(payload: dict) -> str:
+    return "".join(part.get("text", "") for content in payload.get("contents", []) for part in content.get("parts", []))
+
+
+def _slug(name: str) -> str:
+    return re.sub(r"\W+", "_", name.strip().lower()).strip("_")
+
+
+def structured_reply(prompt: str):
+    """A valid answer to one of the app's JSON prompts, or None for free text"""
+    texts = re.findall(r"<<<TEXT (\d+)>>>\n(.*?)\n<<<END \1>>>", prompt, re.DOTALL)
+    if texts:
+        return json.dumps([
+            {"index": int(index), "entities": [
+                {"text": m.group(0), "type": "country", "id": _slug(m.group(0))}
+                for m in list(re.finditer(r"\b[A-Z][a-z]{3,}\b", text))[:3]
+            ]}
+            for index, text in texts
+        ])
+    match = re.search(r"generate exactly (\d+) different multiple-choice questions", prompt)
+    if match:
+        return json.dumps([
+            {"question": f"Which option is number {i + 1}?", "options": ["One", "Two", "Three", "Four"], "correctIndex": i % 4}
+            for i in range(int(match.group(1)))
+        ])
+    match = re.search(r"political information for (.+?) in the 21st century", prompt)
+    if match:
+        name, slug = match.group(1), _slug(match.group(1))
+        return json.dumps({
+            "id": slug, "name": name, "code": slug[:3].upper(), "capital": f"{name} City", "population": 1_000_000,
+            "gdp": 10.0, "government_type": "Republic",
+            "current_events": [{
+                "id": f"{slug}_election", "title": f"{name} General Election", "date": "2024-05-01",
+                "category": "domestic_policy", "description": f"{name} held a general election.", "severity": "medium",
+            }],
+            "historical_figures": [{
+                "id": f"{slug}_leader", "name": f"Leader of {name}", "role": "President", "birth_year": 1960,
+                "death_year": None, "biography": f"First president of {name}.", "achievements": ["Independence"],
+                "related_countries": [name],
+            }],
+        })
+    return None
+
+
+def create_app(
+    delay: float = 0.0,
+    reply: str = "OK from fake Gemini",
+    chunk_delay: float = 0.05,
+    prompt_delay: float = 0.0,
+    jitter: float = 0.0,
+    error_rate: float = 0.0,
+    timeout_rate: float = 0.0,
+    hang: float = 300.0,
+    structured: bool = False,
+    seed: int = 0,
+) -> FastAPI:
+    """delay is the full-answer latency; streamed answers send one word per chunk_delay.
+    prompt_delay adds seconds per 1000 prompt tokens (4 characters each), like a real model reading its input.
+    Every call waits up to jitter seconds more; error_rate of the calls get a 429 and timeout_rate
+    of them hang for hang seconds, which should be longer than the client's timeout."""
+    app = FastAPI(title="Fake Gemini")
+    app.state.delay = delay
+    app.state.reply = reply
+    app.state.chunk_delay = chunk_delay
+    app.state.prompt_delay = prompt_delay
+    app.state.jitter = jitter
+    app.state.error_rate = error_rate
+    app.state.timeout_rate = timeout_rate
+    app.state.hang = hang
+    app.state.structured = structured
+    app.state.prompt_chars = []
+    app.state.calls = 0
+    app.state.cancelled_streams = 0
+    app.state.injected_errors = 0
+    app.state.injected_timeouts = 0
+    rng = random.Random(seed)
+
+    @app.post("/models/{model_method}")
+    async def generate(model_method: str, payload: dict):
+        app.state.calls += 1
+        prompt = _prompt_text(payload)
+        app.state.prompt_chars.append(len(prompt))
+        roll = rng.random()
+        if roll < app.state.error_rate:
+            app.state.injected_errors += 1
+            return JSONResponse(QUOTA_ERROR, status_code=429)
+        if roll < app.state.error_rate + app.state.timeout_rate:
+            app.state.injected_timeouts += 1
+            await asyncio.sleep(app.state.hang)
+        await asyncio.sleep(app.state.prompt_delay * len(prompt) / 4000 + rng.uniform(0, app.state.jitter))
+        reply = (structured_reply(prompt) if app.state.structured else None) or app.state.reply
+        if model_method.endswith(":streamGenerateContent"):
+            return StreamingResponse(stream(reply), media_type="text/event-stream")
+        await asyncio.sleep(app.state.delay)
+        return _candidate(reply)
+
+    async def stream(reply: str):
+        words = reply.split(" ")
+        try:
+            for i, word in enumerate(words):
+                await asyncio.sleep(app.state.chunk_delay)
+                text = word if i == 0 else " " + word
+                yield f"data: {json.dumps(_candidate(text))}\r\n\r\n"
+        except asyncio.CancelledError:
+            app.state.cancelled_streams += 1
+            raise
+
+    return app
+
+
+if __name__ == "__main__":
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else 8765
+    delay = float(sys.argv[2]) if len(sys.argv) > 2 else 2.0
+    print(f"Fake Gemini on http://127.0.0.1:{port} (delay {delay}s)")
+    uvicorn.run(create_app(delay), host="127.0.0.1", port=port, log_level="warning")
@@ -0,0 +1,77 @@
+"""
+Polling file watcher.
+
+Checks a file's (mtime, size) every few seconds and calls an async callback
+once a change has settled, i.e. the file looked the same on two polls in a
+row, so a reader never picks up a file that is still being written.
+"""
+import asyncio
+import logging
+import os
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+log = logging.getLogger(__name__)
+
+FileStat = Tuple[int, int]
+
+
+def _stat(path: str) -> Optional[FileStat]:
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+class FileWatcher:
+    def __init__(self, path: str, on_change: Callable[[], Awaitable[Any]], interval: float = 2.0):
+        self.path = path
+        self._on_change = on_change
+        self.interval = interval
+        self._applied: Optional[FileStat] = None
+        self._task: Optional[asyncio.Task] = None
+        self.reloads = 0
+        self.reload_errors = 0
+
+    async def _run(self):
+        previous = self._applied
+        while True:
+            await asyncio.sleep(self.interval)
+            current = _stat(self.path)
+            settled = current == previous
+            previous = current
+            if current is None or current == self._applied or not settled:
+                continue
+            # Marked as applied even on failure: a broken file is retried once it changes again
+            self._applied = current
+            try:
+                await self._on_change()
+                self.reloads += 1
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.reload_errors += 1
+                log.error("❌ Reloading %s failed: %s", os.path.basename(self.path), e)
+
+    def start(self):
+        if self.interval > 0 and self._task is None:
+            self._applied = _stat(self.path)
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "path": self.path,
+            "interval_seconds": self.interval,
+            "running": self._task is not None and not self._task.done(),
+            "reloads": self.reloads,
+            "reload_errors": self.reload_errors,
+        }
@@ -0,0 +1,116 @@
+"""
+Async Gemini client shared by all AI endpoints.
+
+One pooled keep-alive connection is reused for every call and the number of
+in-flight requests is capped, so a slow generation never blocks the event loop
+and never starves the cheap read endpoints.
+"""
+import asyncio
+import json
+from typing import Any, AsyncIterator, Dict, Optional
+
+import httpx
+
+DEFAULT_BASE_URL = "https://generativelanguage.googleapis.com/v1beta"
+
+
+class GeminiClient:
+    def __init__(
+        self,
+        api_key: Optional[str],
+        model: str,
+        base_url: str = DEFAULT_BASE_URL,
+        max_concurrency: int = 4,
+        timeout: float = 120.0,
+    ):
+        self.api_key = api_key
+        self.model = model
+        self.base_url = base_url.rstrip("/")
+        self.max_concurrency = max(1, max_concurrency)
+        self.timeout = timeout
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        self._client: Optional[httpx.AsyncClient] = None
+        self.in_flight = 0
+
+    def url(self, method: str = "generateContent") -> str:
+        return f"{self.base_url}/models/{self.model}:{method}"
+
+    def _get_client(self) -> httpx.AsyncClient:
+        # Created lazily so the pool is bound to the running event loop
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                headers={"Content-Type": "application/json"},
+                limits=httpx.Limits(
+                    max_connections=self.max_concurrency,
+                    max_keepalive_connections=self.max_concurrency,
+                ),
+                timeout=self.timeout,
+            )
+        return self._client
+
+    async def post(
+        self,
+        payload: Dict[str, Any],
+        method: str = "generateContent",
+        timeout: Optional[float] = None,
+    ) -> httpx.Response:
+        """POST a payload to Gemini, waiting for a free slot first"""
+        client = self._get_client()
+        async with self._semaphore:
+            self.in_flight += 1
+            try:
+                return await client.post(
+                    self.url(method),
+                    params={"key": self.api_key},
+                    json=payload,
+                    timeout=timeout if timeout is not None else self.timeout,
+                )
+            finally:
+                self.in_flight -= 1
+
+    async def stream(
+        self,
+        payload: Dict[str, Any],
+        timeout: Optional[float] = None,
+    ) -> AsyncIterator[str]:
+        """Yield text fragments from streamGenerateContent as they arrive.
+
+        Raises GeminiStreamError for a non-200 answer. Closing the generator
+        (e.g. when the client disconnects) aborts the upstream request.
+        """
+        client = self._get_client()
+        async with self._semaphore:
+            self.in_flight += 1
+            try:
+                async with client.stream(
+                    "POST",
+                    self.url("streamGenerateContent"),
+                    params={"key": self.api_key, "alt": "sse"},
+                    json=payload,
+                    timeout=timeout if timeout is not None else self.timeout,
+                ) as resp:
+                    if resp.status_code != 200:
+                        body = (await resp.aread()).decode("utf-8", errors="replace")
+                        raise GeminiStreamError(resp.status_code, body)
+                    async for line in resp.aiter_lines():
+                        if not line.startswith("data:"):
+                            continue
+                        chunk = json.loads(line[5:].strip())
+                        for candidate in chunk.get("candidates", []):
+                            for part in candidate.get("content", {}).get("parts", []):
+                                if part.get("text"):
+                                    yield part["text"]
+            finally:
+                self.in_flight -= 1
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+class GeminiStreamError(Exception):
+    def __init__(self, status_code: int, text: str):
+        super().__init__(f"Gemini returned {status_code}")
+        self.status_code = status_code
+        self.text = text
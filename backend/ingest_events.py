@@ -0,0 +1,161 @@
+"""
+Bulk event ingestion for political_data.json.
+
+Reads events from JSONL/NDJSON feeds (one JSON object per line with a
+"country_id" plus the CountryEvent fields), validates them and skips ids
+the country already has (ids are unique per country). Each batch becomes
+one sorted run per country; at the end every country's runs are merged
+into its newest-first event list in a single pass. Feeds are streamed
+batch by batch, so besides the store and the accepted events only one
+batch of raw lines is held at a time. The store is replaced atomically; a
+running server picks the change up through its file watcher.
+
+Usage: python ingest_events.py feeds/additional_events.jsonl feeds/more_events.jsonl
+       cat events.ndjson | python ingest_events.py -
+"""
+import argparse
+import heapq
+import json
+import os
+import sys
+import tempfile
+from itertools import islice
+from typing import Dict, Iterable, Iterator, List, Set, Tuple
+
+from dotenv import load_dotenv
+from pydantic import ValidationError
+
+from models import CountryEvent, political_data_file
+
+
+def _event_date(event: dict) -> str:
+    return event.get("date", "")
+
+
+class IngestStats:
+    def __init__(self):
+        self.read = 0
+        self.added = 0
+        self.duplicates = 0
+        self.invalid = 0
+        self.unknown_country = 0
+
+
+def read_batches(lines: Iterable[str], batch_size: int) -> Iterator[List[Tuple[int, str]]]:
+    """Yield (line number, line) batches without holding more than one batch"""
+    numbered = ((number, line) for number, line in enumerate(lines, 1) if line.strip())
+    while True:
+        batch = list(islice(numbered, batch_size))
+        if not batch:
+            return
+        yield batch
+
+
+def merge_events(existing: List[dict], runs: List[List[dict]]) -> List[dict]:
+    """k-way merge of newest-first runs into an already newest-first list, without re-sorting it"""
+    return list(heapq.merge(existing, *runs, key=_event_date, reverse=True))
+
+
+def ingest_batch(
+    batch: List[Tuple[int, str]],
+    source: str,
+    countries: Dict[str, dict],
+    known_ids: Set[Tuple[str, str]],
+    runs: Dict[str, List[List[dict]]],
+    stats: IngestStats,
+):
+    """Validate and dedupe one batch, adding one sorted run per country it touches"""
+    by_country: Dict[str, List[dict]] = {}
+    for number, line in batch:
+        stats.read += 1
+        try:
+            record = json.loads(line)
+            country_id = record.pop("country_id")
+            event = CountryEvent(**record)
+        except (ValueError, KeyError, TypeError, AttributeError) as e:
+            # ValidationError is a ValueError
+            stats.invalid += 1
+            reason = f"{e.error_count()} validation errors" if isinstance(e, ValidationError) else e
+            print(f"[SKIP] {source}:{number}: {reason}")
+            continue
+        if country_id not in countries:
+            stats.unknown_country += 1
+            print(f"[SKIP] {source}:{number}: unknown country '{country_id}'")
+            continue
+        # Event ids are only unique within their country
+        if (country_id, event.id) in known_ids:
+            stats.duplicates += 1
+            continue
+        known_ids.add((country_id, event.id))
+        by_country.setdefault(country_id, []).append(event.model_dump(exclude_unset=True))
+
+    for country_id, new_events in by_country.items():
+        new_events.sort(key=_event_date, reverse=True)
+        runs.setdefault(country_id, []).append(new_events)
+        stats.added += len(new_events)
+
+
+def write_atomically(path: str, data: dict):
+    """Write JSON next to path and rename it over path, so readers never see a partial file"""
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        if os.path.exists(path):
+            os.chmod(tmp_path, os.stat(path).st_mode & 0o777)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def ingest(feeds: List[str], data_file: str, batch_size: int = 5000, dry_run: bool = False) -> IngestStats:
+    with open(data_file, "r", encoding="utf-8") as f:
+        data = json.load(f)
+
+    countries = {country["id"]: country for country in data.get("countries", [])}
+    known_ids = set()
+    for country in countries.values():
+        events = country.setdefault("current_events", [])
+        known_ids.update((country["id"], event.get("id")) for event in events)
+        # One-time sort of hand-edited lists; after that every merge keeps them sorted
+        if any(_event_date(a) < _event_date(b) for a, b in zip(events, events[1:])):
+            events.sort(key=_event_date, reverse=True)
+
+    stats = IngestStats()
+    runs: Dict[str, List[List[dict]]] = {}
+    for feed in feeds:
+        source = "stdin" if feed == "-" else feed
+        stream = sys.stdin if feed == "-" else open(feed, "r", encoding="utf-8")
+        try:
+            for batch in read_batches(stream, batch_size):
+                ingest_batch(batch, source, countries, known_ids, runs, stats)
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+
+    for country_id, country_runs in runs.items():
+        country = countries[country_id]
+        country["current_events"] = merge_events(country["current_events"], country_runs)
+
+    if stats.added and not dry_run:
+        write_atomically(data_file, data)
+    return stats
+
+
+if __name__ == "__main__":
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="Merge JSONL event feeds into political_data.json")
+    parser.add_argument("feeds", nargs="+", help="JSONL/NDJSON files, or - for stdin")
+    parser.add_argument("--data-file", default=political_data_file())
+    parser.add_argument("--batch-size", type=int, default=5000)
+    parser.add_argument("--dry-run", action="store_true", help="validate and count without writing")
+    args = parser.parse_args()
+
+    stats = ingest(args.feeds, args.data_file, args.batch_size, args.dry_run)
+    print(f"\n[OK] Read {stats.read} events: {stats.added} added, {stats.duplicates} duplicates, "
+          f"{stats.invalid} invalid, {stats.unknown_country} for unknown countries")
+    if stats.added and args.dry_run:
+        print("[OK] Dry run - nothing written")
@@ -0,0 +1,176 @@
+"""
+Incremental extraction of the JSON value in an LLM answer.
+
+The model wraps its JSON in markdown fences and sometimes adds remarks
+before or after it. JsonStreamParser finds the first object or array and
+follows it to its closing bracket in one pass over the text; whatever comes
+after is ignored. The text can arrive in chunks, as a streamed answer does,
+and each chunk is scanned once: a regex jumps from one structural
+character to the next, so string contents are skipped in C. extract_json()
+handles a complete answer with the C decoder instead.
+
+Elements of watched arrays are returned by feed() as soon as their closing
+bracket arrives, e.g. every event of a generated country while the rest of
+the answer is still being written. Scalar members of the top-level object
+(such as "id") are collected in `fields` as they complete.
+"""
+import json
+import re
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+Path = Tuple[str, ...]
+
+# Path of an array nested in another array, e.g. ("rows", "*")
+ANY_INDEX = "*"
+
+_START_RE = re.compile(r"[{\[]")
+_STRUCTURE_RE = re.compile(r'[{}\[\]",:]')
+_STRING_RE = re.compile(r'["\\]')
+
+
+class _Frame:
+    __slots__ = ("kind", "start", "path", "key", "expect_key", "value_start")
+
+    def __init__(self, kind: str, start: int, path: Path):
+        self.kind = kind
+        self.start = start
+        # Keys from the top-level value down to this container
+        self.path = path
+        # Objects: the member being read, and where its value began
+        self.key: Optional[str] = None
+        self.expect_key = kind == "{"
+        self.value_start: Optional[int] = None
+
+
+class JsonStreamParser:
+    def __init__(self, watch: Iterable[Path] = ()):
+        """watch: paths of the arrays whose elements feed() returns; () is a top-level array"""
+        self.watch = frozenset(tuple(path) for path in watch)
+        self.fields: Dict[str, Any] = {}
+        self._buf = ""
+        self._pos = 0
+        self._stack: List[_Frame] = []
+        self._string_start: Optional[int] = None
+        self._started = False
+        self._end: Optional[int] = None
+
+    @property
+    def done(self) -> bool:
+        return self._end is not None
+
+    @property
+    def text(self) -> Optional[str]:
+        """The complete JSON value, once its closing bracket has arrived"""
+        return self._buf[:self._end] if self._end is not None else None
+
+    def feed(self, chunk: str) -> List[Tuple[Path, Any]]:
+        """Scan chunk; returns (array path, decoded element) for every watched element it completed"""
+        if self.done:
+            return []
+        if not self._started:
+            match = _START_RE.search(chunk)
+            if match is None:
+                return []
+            chunk = chunk[match.start():]
+            self._started = True
+        self._buf += chunk
+        return self._scan()
+
+    def finish(self) -> Any:
+        """The decoded value; raises ValueError when the text held no complete JSON value"""
+        if not self.done:
+            raise ValueError("no complete JSON object or array in the text")
+        return json.loads(self.text)
+
+    def _scan(self) -> List[Tuple[Path, Any]]:
+        buf, pos, stack = self._buf, self._pos, self._stack
+        completed = []
+        while True:
+            if self._string_start is not None:
+                match = _STRING_RE.search(buf, pos)
+                if match is None:
+                    pos = len(buf)
+                    break
+                i = match.start()
+                if buf[i] == "\\":
+                    if i + 1 == len(buf):
+                        # The escaped character is in the next chunk
+                        pos = i
+                        break
+                    pos = i + 2
+                    continue
+                pos = i + 1
+                top = stack[-1]
+                if top.expect_key:
+                    top.key = json.loads(buf[self._string_start:pos])
+                    top.expect_key = False
+                self._string_start = None
+                continue
+
+            match = _STRUCTURE_RE.search(buf, pos)
+            if match is None:
+                pos = len(buf)
+                break
+            i, char = match.start(), match.group()
+            pos = i + 1
+            if char == '"':
+                self._string_start = i
+            elif char in "{[":
+                parent = stack[-1] if stack else None
+                path = () if parent is None else parent.path + ((parent.key if parent.kind == "{" else ANY_INDEX),)
+                if parent is not None and parent.kind == "{":
+                    parent.value_start = None
+                stack.append(_Frame(char, i, path))
+            elif char in "}]":
+                if len(stack) == 1 and char == "}":
+                    self._collect_field(stack[0], i)
+                frame = stack.pop()
+                if not stack:
+                    self._end = pos
+                    break
+                parent = stack[-1]
+                if parent.kind == "[" and parent.path in self.watch:
+                    try:
+                        completed.append((parent.path, json.loads(buf[frame.start:pos])))
+                    except ValueError:
+                        pass  # Left to finish() to report
+            elif char == ":":
+                stack[-1].value_start = pos
+            else:  # ","
+                top = stack[-1]
+                if top.kind == "{":
+                    if len(stack) == 1:
+                        self._collect_field(top, i)
+                    top.expect_key = True
+        self._pos = pos
+        return completed
+
+    def _collect_field(self, frame: _Frame, end: int):
+        """A scalar member of the top-level object ended at end"""
+        if frame.value_start is None or frame.key is None:
+            return
+        try:
+            self.fields[frame.key] = json.loads(self._buf[frame.value_start:end])
+        except ValueError:
+            pass  # Left to finish() to report
+        frame.value_start = None
+
+
+_decoder = json.JSONDecoder()
+
+
+def extract_json(text: str) -> Optional[str]:
+    """The first complete JSON object or array in text, without what surrounds it"""
+    match = _START_RE.search(text)
+    if match is None:
+        return None
+    # Whole answers: the C decoder stops where the value ends. The scanner is only
+    # needed when the value is not valid JSON, to cut out the span anyway
+    try:
+        _, end = _decoder.raw_decode(text, match.start())
+        return text[match.start():end]
+    except ValueError:
+        pass
+    parser = JsonStreamParser()
+    parser.feed(text[match.start():])
+    return parser.text
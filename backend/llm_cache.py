@@ -0,0 +1,165 @@
+"""
+Two-tier cache for Gemini responses.
+
+Entries are keyed on model + prompt + generation config. A small in-process
+LRU answers hot prompts instantly and a SQLite file keeps answers across
+restarts. Both tiers expire entries after a TTL and evict the least recently
+used entries once they are full.
+"""
+import asyncio
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+
+class LLMCache:
+    def __init__(
+        self,
+        path: Optional[str],
+        ttl: float = 86400.0,
+        memory_entries: int = 256,
+        disk_entries: int = 5000,
+    ):
+        self.path = path or None
+        self.ttl = ttl
+        self.memory_entries = memory_entries
+        self.disk_entries = disk_entries
+        self._memory: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self._db: Optional[sqlite3.Connection] = None
+        self._db_lock = threading.Lock()
+        self.hits_memory = 0
+        self.hits_disk = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+
+    @staticmethod
+    def make_key(model: str, prompt: str, generation_config: Dict[str, Any]) -> str:
+        raw = json.dumps([model, prompt, generation_config], sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    # --- disk tier (runs in a worker thread) ---
+
+    def _connect(self) -> Optional[sqlite3.Connection]:
+        if self.path is None:
+            return None
+        if self._db is None:
+            self._db = sqlite3.connect(self.path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS llm_cache ("
+                " key TEXT PRIMARY KEY, value TEXT NOT NULL,"
+                " expires_at REAL NOT NULL, last_access REAL NOT NULL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS llm_cache_access ON llm_cache(last_access)")
+            self._db.commit()
+        return self._db
+
+    def _disk_get(self, key: str) -> Optional[Tuple[str, float]]:
+        """(value, expires_at) of a live entry"""
+        with self._db_lock:
+            db = self._connect()
+            if db is None:
+                return None
+            now = time.time()
+            row = db.execute(
+                "SELECT value, expires_at FROM llm_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            if row[1] <= now:
+                db.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                db.commit()
+                return None
+            db.execute("UPDATE llm_cache SET last_access = ? WHERE key = ?", (now, key))
+            db.commit()
+            return row[0], row[1]
+
+    def _disk_set(self, key: str, value: str, expires_at: float):
+        with self._db_lock:
+            db = self._connect()
+            if db is None:
+                return
+            now = time.time()
+            db.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, value, expires_at, last_access) VALUES (?, ?, ?, ?)",
+                (key, value, expires_at, now),
+            )
+            db.execute("DELETE FROM llm_cache WHERE expires_at <= ?", (now,))
+            overflow = db.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0] - self.disk_entries
+            if overflow > 0:
+                db.execute(
+                    "DELETE FROM llm_cache WHERE key IN "
+                    "(SELECT key FROM llm_cache ORDER BY last_access LIMIT ?)",
+                    (overflow,),
+                )
+                self.evictions += overflow
+            db.commit()
+
+    def _disk_count(self) -> int:
+        with self._db_lock:
+            db = self._connect()
+            if db is None:
+                return 0
+            return db.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0]
+
+    # --- memory tier ---
+
+    def _memory_set(self, key: str, value: str, expires_at: float):
+        self._memory[key] = (expires_at, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+            self.evictions += 1
+
+    async def get(self, key: str) -> Optional[str]:
+        entry = self._memory.get(key)
+        if entry is not None:
+            if entry[0] > time.time():
+                self._memory.move_to_end(key)
+                self.hits_memory += 1
+                return entry[1]
+            del self._memory[key]
+
+        entry = await asyncio.to_thread(self._disk_get, key)
+        if entry is not None:
+            value, expires_at = entry
+            self.hits_disk += 1
+            # Keeps the expiry it was stored with, so reads never extend its life
+            self._memory_set(key, value, expires_at)
+            return value
+
+        self.misses += 1
+        return None
+
+    async def set(self, key: str, value: str):
+        expires_at = time.time() + self.ttl
+        self._memory_set(key, value, expires_at)
+        self.stores += 1
+        await asyncio.to_thread(self._disk_set, key, value, expires_at)
+
+    async def stats(self) -> Dict[str, Any]:
+        lookups = self.hits_memory + self.hits_disk + self.misses
+        return {
+            "hits_memory": self.hits_memory,
+            "hits_disk": self.hits_disk,
+            "misses": self.misses,
+            "hit_ratio": round((self.hits_memory + self.hits_disk) / lookups, 4) if lookups else 0.0,
+            "stores": self.stores,
+            "evictions": self.evictions,
+            "memory_entries": len(self._memory),
+            "memory_capacity": self.memory_entries,
+            "disk_entries": await asyncio.to_thread(self._disk_count),
+            "disk_capacity": self.disk_entries if self.path else 0,
+            "ttl_seconds": self.ttl,
+        }
+
+    def close(self):
+        with self._db_lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
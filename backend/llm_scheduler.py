@@ -0,0 +1,234 @@
+"""
+Quota-aware priority scheduler for Gemini calls.
+
+Every LLM call takes a slot here first. Slots are granted in priority order
+(chat > analyze > generate > prefetch) when a concurrency slot is free and
+both token buckets (requests per minute and per day) have a token. Lower
+classes must leave a share of the daily budget to the classes above them,
+so background prefetching can never spend the quota interactive users need.
+
+Before queueing, a request's wait is estimated from the queue ahead of it,
+the buckets and the average call time. If that exceeds the latency budget
+of its class it is refused at once with a Retry-After hint instead of
+waiting in line.
+"""
+import asyncio
+import heapq
+import itertools
+import math
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Tuple
+
+# Highest priority first
+PRIORITIES = ("chat", "analyze", "generate", "prefetch")
+
+# Share of the daily budget a class must leave untouched for the classes above it
+DAILY_RESERVE = {"chat": 0.0, "analyze": 0.1, "generate": 0.25, "prefetch": 0.5}
+
+# Longest expected queueing delay (seconds) a class accepts before it is shed
+LATENCY_BUDGET = {"chat": 10.0, "analyze": 15.0, "generate": 30.0, "prefetch": 120.0}
+
+# Weight of the latest call in the running average of call durations
+DURATION_ALPHA = 0.2
+
+
+class TokenBucket:
+    """capacity tokens, refilled continuously over period seconds; capacity 0 means unlimited"""
+
+    def __init__(self, capacity: int, period: float, clock: Callable[[], float] = time.monotonic):
+        self.capacity = max(0, capacity)
+        self.period = period
+        self.rate = self.capacity / period if self.capacity else 0.0
+        self._clock = clock
+        self._tokens = float(self.capacity)
+        self._updated = clock()
+
+    @property
+    def unlimited(self) -> bool:
+        return self.capacity == 0
+
+    @property
+    def tokens(self) -> float:
+        if self.unlimited:
+            return math.inf
+        now = self._clock()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+        return self._tokens
+
+    def wait_time(self, needed: float) -> float:
+        """Seconds until needed tokens have been available, counting those refilled meanwhile"""
+        if self.unlimited:
+            return 0.0
+        return max(0.0, (needed - self.tokens) / self.rate)
+
+    def take(self):
+        if not self.unlimited:
+            self._tokens = self.tokens - 1
+
+    def drain(self):
+        """Empty the bucket, e.g. after the upstream API reported the quota as used up"""
+        if not self.unlimited:
+            self._tokens = 0.0
+            self._updated = self._clock()
+
+
+class LLMOverloaded(Exception):
+    """Raised instead of queueing a call that would wait longer than its latency budget"""
+
+    def __init__(self, priority: str, retry_after: float, quota: bool):
+        reason = "daily quota reserved or used up" if quota else "LLM queue is full"
+        super().__init__(f"{priority}: {reason}, retry in {retry_after:.0f}s")
+        self.priority = priority
+        self.retry_after = retry_after
+        self.quota = quota
+
+
+class LLMScheduler:
+    def __init__(
+        self,
+        requests_per_minute: int = 0,
+        requests_per_day: int = 0,
+        max_concurrency: int = 4,
+        latency_budget: Optional[Dict[str, float]] = None,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.minute = TokenBucket(requests_per_minute, 60.0, clock)
+        self.day = TokenBucket(requests_per_day, 86400.0, clock)
+        self.max_concurrency = max(1, max_concurrency)
+        self.latency_budget = {**LATENCY_BUDGET, **(latency_budget or {})}
+        self._clock = clock
+        # (priority rank, arrival order, future, priority)
+        self._waiting: List[Tuple[int, int, asyncio.Future, str]] = []
+        self._order = itertools.count()
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self.running = 0
+        self.avg_call_seconds = 2.0
+        self.admitted = dict.fromkeys(PRIORITIES, 0)
+        self.shed = dict.fromkeys(PRIORITIES, 0)
+        self.quota_shed = dict.fromkeys(PRIORITIES, 0)
+        self.avg_wait_seconds = dict.fromkeys(PRIORITIES, 0.0)
+
+    def _rank(self, priority: str) -> int:
+        try:
+            return PRIORITIES.index(priority)
+        except ValueError:
+            raise ValueError(f"priority must be one of {PRIORITIES}, got {priority!r}") from None
+
+    def _day_wait(self, priority: str, needed: float) -> float:
+        return self.day.wait_time(needed + DAILY_RESERVE[priority] * self.day.capacity)
+
+    def _waiting_ahead(self, rank: int) -> int:
+        return sum(1 for r, _, future, _ in self._waiting if r <= rank and not future.done())
+
+    def estimate_wait(self, priority: str) -> Tuple[float, bool]:
+        """Expected queueing delay for a new call of this class, and whether the daily quota is what limits it"""
+        rank = self._rank(priority)
+        needed = self._waiting_ahead(rank) + 1
+        day_wait = self._day_wait(priority, needed)
+        wait = max(self.minute.wait_time(needed), day_wait)
+        # Calls that cannot start at once wait for whole rounds of running calls
+        queued = self.running + needed - self.max_concurrency
+        if queued > 0:
+            wait += math.ceil(queued / self.max_concurrency) * self.avg_call_seconds
+        return wait, day_wait > self.latency_budget[priority]
+
+    def check(self, priority: str):
+        """Raise LLMOverloaded if a call of this class would be shed right now"""
+        wait, quota = self.estimate_wait(priority)
+        if wait > self.latency_budget[priority]:
+            if quota:
+                self.quota_shed[priority] += 1
+            else:
+                self.shed[priority] += 1
+            raise LLMOverloaded(priority, wait, quota)
+
+    def _dispatch(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        while self._waiting and self.running < self.max_concurrency:
+            rank, _, future, priority = self._waiting[0]
+            if future.done():  # cancelled while waiting
+                heapq.heappop(self._waiting)
+                continue
+            # Lower classes have larger reserves, so if the head must wait everyone behind it must too
+            delay = max(self.minute.wait_time(1), self._day_wait(priority, 1))
+            if delay > 0:
+                self._timer = asyncio.get_running_loop().call_later(delay, self._dispatch)
+                return
+            heapq.heappop(self._waiting)
+            self.minute.take()
+            self.day.take()
+            self.running += 1
+            future.set_result(None)
+
+    async def acquire(self, priority: str):
+        """Wait for a slot in priority order; raises LLMOverloaded instead of waiting past the budget"""
+        self.check(priority)
+        start = self._clock()
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiting, (self._rank(priority), next(self._order), future, priority))
+        self._dispatch()
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # Granted just as the caller gave up: hand the slot on
+                self.release()
+            raise
+        self.admitted[priority] += 1
+        waited = self._clock() - start
+        self.avg_wait_seconds[priority] += DURATION_ALPHA * (waited - self.avg_wait_seconds[priority])
+
+    def release(self, duration: Optional[float] = None):
+        self.running -= 1
+        if duration is not None:
+            self.avg_call_seconds += DURATION_ALPHA * (duration - self.avg_call_seconds)
+        self._dispatch()
+
+    @asynccontextmanager
+    async def slot(self, priority: str) -> AsyncIterator[None]:
+        await self.acquire(priority)
+        start = self._clock()
+        try:
+            yield
+        finally:
+            self.release(self._clock() - start)
+
+    def quota_exhausted(self, daily: bool):
+        """Gemini answered 429: trust it over our own count"""
+        (self.day if daily else self.minute).drain()
+
+    def stats(self) -> Dict[str, Any]:
+        waiting = dict.fromkeys(PRIORITIES, 0)
+        for _, _, future, priority in self._waiting:
+            if not future.done():
+                waiting[priority] += 1
+
+        def bucket(b: TokenBucket) -> Dict[str, Any]:
+            if b.unlimited:
+                return {"limit": None, "available": None}
+            return {"limit": b.capacity, "available": round(b.tokens, 2), "full_in_seconds": round(b.wait_time(b.capacity), 1)}
+
+        return {
+            "requests_per_minute": bucket(self.minute),
+            "requests_per_day": bucket(self.day),
+            "running": self.running,
+            "max_concurrency": self.max_concurrency,
+            "avg_call_seconds": round(self.avg_call_seconds, 3),
+            "classes": {
+                priority: {
+                    "waiting": waiting[priority],
+                    "admitted": self.admitted[priority],
+                    "shed": self.shed[priority],
+                    "shed_quota": self.quota_shed[priority],
+                    "avg_wait_seconds": round(self.avg_wait_seconds[priority], 3),
+                    "latency_budget_seconds": self.latency_budget[priority],
+                    "daily_reserve": DAILY_RESERVE[priority],
+                    "expected_wait_seconds": round(self.estimate_wait(priority)[0], 2),
+                }
+                for priority in PRIORITIES
+            },
+        }
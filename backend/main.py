@@ -1,19 +1,65 @@
+import asyncio
+import functools
+import hashlib
 import json
+import logging
+import math
 import os
-import re
-from typing import List, Optional, Dict, Any
+import random
+import time
+from typing import AsyncIterator, Iterable, List, Optional, Dict, Any, Sequence, Set, Tuple
 from datetime import datetime
+from types import SimpleNamespace
 
-import requests
-from fastapi import FastAPI, HTTPException, WebSocket, WebSocketDisconnect
+import httpx
+from fastapi import FastAPI, HTTPException, Request, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel, Field
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from pydantic import BaseModel, Field, ValidationError
 from dotenv import load_dotenv
 
+from models import Country, CountryEvent, HistoricalFigure, political_data_file
+from gemini_client import GeminiClient, GeminiStreamError, DEFAULT_BASE_URL
+from llm_cache import LLMCache
+from llm_scheduler import LLMOverloaded, LLMScheduler
+from chat_context import build_context, estimate_tokens, truncate
+from json_stream import JsonStreamParser, extract_json
+from semantic_cache import SemanticCache
+from micro_batcher import MicroBatcher
+from entity_graph import NODE_TYPES, EntityGraph
+from entity_matcher import EntityMatcher
+from response_cache import CachedPayload, ResponseCache, encode_payload
+from search_index import SearchIndex
+from timeline_index import TimelineIndex
+from quiz_pool import QuizPool
+from singleflight import SingleFlight, RecentFailure
+from country_store import CountryStore
+from data_snapshot import load_snapshot, write_snapshot
+from file_watcher import FileWatcher
+from ws_broadcast import Broadcaster
+from shared_snapshot import (
+    SHARED_MODE_AVAILABLE, SharedInbox, SharedSnapshot, SnapshotMap, SnapshotPublisher, WriterLock, read_version,
+)
+from app_logging import setup_logging
+from metrics import REGISTRY, MetricsMiddleware, record_stage, stage
+from slow_requests import SlowRequestProfiler
+
 load_dotenv()
+setup_logging()
+log = logging.getLogger(__name__)
 
 app = FastAPI(title="AI Political Navigator API")
 
+# Requests slower than SLOW_REQUEST_MS are logged with their stage timings; with
+# SLOW_REQUEST_PROFILING=1 their stacks are also sampled (see /api/debug/slow-requests)
+SLOW_REQUEST_SECONDS = float(os.getenv("SLOW_REQUEST_MS", "2000")) / 1000
+slow_profiler = SlowRequestProfiler(
+    threshold=SLOW_REQUEST_SECONDS,
+    interval=float(os.getenv("SLOW_REQUEST_SAMPLE_MS", "10")) / 1000,
+) if os.getenv("SLOW_REQUEST_PROFILING", "0") == "1" else None
+
+app.add_middleware(MetricsMiddleware, slow_seconds=SLOW_REQUEST_SECONDS, profiler=slow_profiler)
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -24,7 +70,55 @@ app.add_middleware(
 
 GEMINI_API_KEY = os.getenv("GOOGLE_API_KEY") or os.getenv("GEMINI_API_KEY")
 GEMINI_MODEL = os.getenv("GEMINI_MODEL", "gemini-2.5-flash")
-GEMINI_URL = f"https://generativelanguage.googleapis.com/v1beta/models/{GEMINI_MODEL}:generateContent?key={GEMINI_API_KEY}"
+GEMINI_BASE_URL = os.getenv("GEMINI_BASE_URL", DEFAULT_BASE_URL)
+GEMINI_MAX_CONCURRENCY = int(os.getenv("GEMINI_MAX_CONCURRENCY", "4"))
+GEMINI_TIMEOUT = float(os.getenv("GEMINI_TIMEOUT", "120"))
+
+gemini = GeminiClient(
+    api_key=GEMINI_API_KEY,
+    model=GEMINI_MODEL,
+    base_url=GEMINI_BASE_URL,
+    max_concurrency=GEMINI_MAX_CONCURRENCY,
+    timeout=GEMINI_TIMEOUT,
+)
+
+# Response cache for deterministic prompts; set LLM_CACHE_PATH= to keep it in memory only
+llm_cache = LLMCache(
+    path=os.getenv("LLM_CACHE_PATH", os.path.join(os.path.dirname(__file__), "llm_cache.sqlite3")),
+    ttl=float(os.getenv("LLM_CACHE_TTL", "86400")),
+    memory_entries=int(os.getenv("LLM_CACHE_MEMORY_ENTRIES", "256")),
+    disk_entries=int(os.getenv("LLM_CACHE_DISK_ENTRIES", "5000")),
+)
+
+# Every Gemini call queues here by priority (chat > analyze > generate > prefetch) within the
+# per-minute and per-day request quotas (0 = no limit); calls that would wait past their
+# class's latency budget are refused with 503 + Retry-After. The buckets live in this
+# process, so with several workers each one enforces its own share
+llm_scheduler = LLMScheduler(
+    requests_per_minute=int(os.getenv("LLM_REQUESTS_PER_MINUTE", "0")),
+    requests_per_day=int(os.getenv("LLM_REQUESTS_PER_DAY", "0")),
+    max_concurrency=GEMINI_MAX_CONCURRENCY,
+)
+
+def question_entities(question: str) -> List[str]:
+    """Countries and figures a question names, as "type:id" in order of mention"""
+    return [f"{m.type}:{m.id}" for m in entity_matcher.find(question)]
+
+# Answers reused for paraphrased chat questions asked in the same context
+# about the same entities
+semantic_cache = SemanticCache(
+    capacity=int(os.getenv("SEMANTIC_CACHE_ENTRIES", "1024")),
+    threshold=float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.75")),
+    ttl=float(os.getenv("SEMANTIC_CACHE_TTL", "86400")),
+    entities=question_entities,
+)
+
+# Gemini traffic for /metrics; status is 200 or the error status returned to the client
+LLM_REQUESTS = REGISTRY.counter("llm_requests", "Gemini calls by priority class and status", ("priority", "status"))
+LLM_CHARACTERS = REGISTRY.counter("llm_characters", "Prompt and answer characters sent to and received from Gemini", ("direction",))
+# From Gemini's usageMetadata when it is sent, else estimated from the characters
+LLM_TOKENS = REGISTRY.counter("llm_tokens", "Prompt and answer tokens of Gemini calls", ("direction",))
+LLM_CACHE_LOOKUPS = REGISTRY.counter("llm_cache_lookups", "LLM response cache lookups by result", ("result",))
 
 class ChatMessage(BaseModel):
     role: str  # "user" or "assistant"
@@ -39,49 +133,10 @@ class ChatResponse(BaseModel):
     response: str
     timestamp: str
 
-class EventDevelopment(BaseModel):
-    date: str
-    title: str
-    description: str
-
-class CountryEvent(BaseModel):
-    id: str
-    title: str
-    date: str
-    category: str  # "foreign_policy", "domestic_policy", "economy", etc.
-    description: str
-    severity: str  # "low", "medium", "high"
-    related_countries: List[str] = []
-    related_figures: List[str] = []
-    impact: Optional[str] = None
-    background: Optional[str] = None
-    full_history: Optional[str] = None  # Detailed narrative / full story
-    developments: Optional[List[EventDevelopment]] = None
-
-class HistoricalFigure(BaseModel):
-    id: str
-    name: str
-    role: str
-    birth_year: Optional[int]
-    death_year: Optional[int]
-    biography: str
-    achievements: List[str]
-    related_countries: List[str]
-
-class Country(BaseModel):
-    id: str
-    name: str
-    code: str  # ISO 3166-1 alpha-3
-    capital: str
-    population: int
-    gdp: Optional[float]
-    government_type: str
-    current_events: List[CountryEvent]
-    historical_figures: List[HistoricalFigure]
-
 class AnalyzeTextRequest(BaseModel):
     text: str
     country_context: Optional[str] = None
+    llm_fallback: bool = False  # Also ask Gemini for mentions the local matcher missed
 
 class HighlightedEntity(BaseModel):
     text: str
@@ -93,102 +148,676 @@ class HighlightedEntity(BaseModel):
 class AnalyzeTextResponse(BaseModel):
     entities: List[HighlightedEntity]
     enhanced_text: str
+    # The Gemini fallback was asked for but failed; entities are the local matches only
+    llm_fallback_skipped: bool = False
+
+class AnalyzeTextBatchRequest(BaseModel):
+    texts: List[str] = Field(..., min_length=1, max_length=100)
+    llm_fallback: bool = False
+
+class AnalyzeTextBatchResponse(BaseModel):
+    results: List[AnalyzeTextResponse]
 
 class GeneratedQuizQuestion(BaseModel):
     question: str
     options: List[str] = Field(..., min_length=4, max_length=4)
     correctIndex: int = Field(..., ge=0, le=3)
 
+# Copy-on-write: writers build new dicts and rebind these names, so a reader
+# holding a reference always sees one consistent version
 COUNTRIES_DB: Dict[str, Country] = {}
 FIGURES_DB: Dict[str, HistoricalFigure] = {}
 
+# Bumped on every write to COUNTRIES_DB/FIGURES_DB; derived data is keyed on it
+DB_VERSION = 0
+
+# Pre-serialized JSON for the read endpoints
+response_cache = ResponseCache()
+
+# Full-text index behind /api/search, updated by _store_countries
+search_index = SearchIndex()
+
+# Date-sorted cross-country event index behind /api/timeline
+timeline_index = TimelineIndex()
+
+# Countries, events and figures linked by resolved related_* names, behind /api/graph
+entity_graph = EntityGraph()
+
+def _next_db(countries: List[Country], removed: Sequence[str]) -> Tuple[Dict[str, Country], Dict[str, HistoricalFigure], List[str]]:
+    """Copies of COUNTRIES_DB/FIGURES_DB with countries written (and their figures) and removed ids
+    dropped, plus the ids of the figures that went away"""
+    countries_db = COUNTRIES_DB.copy()
+    for country_id in removed:
+        countries_db.pop(country_id, None)
+    for country in countries:
+        countries_db[country.id] = country
+    
+    removed_figures = []
+    if removed:
+        # Figures are keyed globally; rebuild so only figures of remaining countries survive
+        figures_db = {figure.id: figure for country in countries_db.values() for figure in country.historical_figures}
+        removed_figures = [figure_id for figure_id in FIGURES_DB if figure_id not in figures_db]
+    else:
+        figures_db = FIGURES_DB.copy()
+        for country in countries:
+            for figure in country.historical_figures:
+                figures_db[figure.id] = figure
+    return countries_db, figures_db, removed_figures
+
+def _store_countries(countries: List[Country], removed: Sequence[str] = ()):
+    """Publish a new DB version with countries written (and their figures) and removed ids dropped"""
+    countries_db, figures_db, removed_figures = _next_db(countries, removed)
+    _swap_db(countries_db, figures_db, countries, removed, removed_figures)
+
+def _build_indexes(countries: Iterable[Country]) -> Tuple[SearchIndex, TimelineIndex, EntityGraph]:
+    """Fresh search, timeline and graph indexes over countries"""
+    indexes = SearchIndex(), TimelineIndex(), EntityGraph()
+    for country in countries:
+        for index in indexes:
+            index.index_country(country)
+    return indexes
+
+def _swap_db(
+    countries_db, figures_db, countries: Iterable[Country], removed: Sequence[str], removed_figures: Sequence[str],
+    indexes: Optional[Tuple[SearchIndex, TimelineIndex, EntityGraph]] = None,
+):
+    """Re-index the changed countries (or switch to indexes already built over countries_db),
+    rebind the DBs and announce the new version"""
+    global COUNTRIES_DB, FIGURES_DB, DB_VERSION, search_index, timeline_index, entity_graph
+    stale_keys = [f"figure:{figure_id}" for figure_id in removed_figures]
+    # Reader workers search the writer's published indexes, which pick these changes up with its next snapshot
+    reindex = SHARED_ROLE != "reader" and indexes is None
+    if indexes is not None:
+        search_index, timeline_index, entity_graph = indexes
+    for country_id in removed:
+        stale_keys.append(f"country:{country_id}")
+        _quiz_fragment_cache.pop(country_id, None)
+        if reindex:
+            search_index.remove_country(country_id)
+            timeline_index.remove_country(country_id)
+            entity_graph.remove_country(country_id)
+    # countries may be a generator, so it is walked once and only countries
+    # someone is subscribed to are kept for the deltas
+    published, stale_names = [], []
+    for country in countries:
+        stale_keys.append(f"country:{country.id}")
+        stale_names.append(country.name)
+        stale_keys.extend(f"figure:{figure.id}" for figure in country.historical_figures)
+        if reindex:
+            search_index.index_country(country)
+            timeline_index.index_country(country)
+            entity_graph.index_country(country)
+        if manager.has_subscribers(f"country:{country.id}") or any(
+            manager.has_subscribers(f"figure:{figure.id}") for figure in country.historical_figures
+        ):
+            published.append(country)
+    
+    previous_countries, previous_figures = COUNTRIES_DB, FIGURES_DB
+    COUNTRIES_DB, FIGURES_DB = countries_db, figures_db
+    DB_VERSION += 1
+    response_cache.invalidate(*stale_keys)
+    # Chat answers given on a changed country's page may quote the old data
+    stale_names += [previous_countries[country_id].name for country_id in removed if country_id in previous_countries]
+    semantic_cache.invalidate_countries(stale_names)
+    _publish_changes(previous_countries, previous_figures, published, removed, removed_figures)
+    if SHARED_ROLE == "writer":
+        shared_publisher.mark_dirty()
+
+def _changed_fields(previous: Optional[BaseModel], current: BaseModel) -> Dict[str, Any]:
+    """JSON of the fields that differ from previous (all of them for a new entity)"""
+    if previous is None:
+        return current.model_dump(mode="json")
+    changed = {name for name in type(current).model_fields if getattr(previous, name) != getattr(current, name)}
+    return current.model_dump(mode="json", include=changed) if changed else {}
+
+def _publish_changes(previous_countries, previous_figures, countries, removed, removed_figures):
+    """Push compact deltas to /ws subscribers of the changed countries and figures"""
+    for country in countries:
+        topic = f"country:{country.id}"
+        if manager.has_subscribers(topic):
+            fields = _changed_fields(previous_countries.get(country.id), country)
+            if fields:
+                manager.publish(topic, {"type": "country.update", "id": country.id, "version": DB_VERSION, "fields": fields})
+        for figure in country.historical_figures:
+            topic = f"figure:{figure.id}"
+            if manager.has_subscribers(topic):
+                fields = _changed_fields(previous_figures.get(figure.id), figure)
+                if fields:
+                    manager.publish(topic, {"type": "figure.update", "id": figure.id, "version": DB_VERSION, "fields": fields})
+    for country_id in removed:
+        manager.publish(f"country:{country_id}", {"type": "country.remove", "id": country_id, "version": DB_VERSION})
+    for figure_id in removed_figures:
+        manager.publish(f"figure:{figure_id}", {"type": "figure.remove", "id": figure_id, "version": DB_VERSION})
+
+def _store_country(country: Country):
+    """Write a country and its figures to the DB and drop stale cached responses"""
+    _store_countries([country])
+
+# Local recognizer for /api/analyze-text, rebuilt whenever the DBs change
+entity_matcher = EntityMatcher()
+
+def _entity_matcher_sources() -> Tuple[List[Any], List[Any]]:
+    """Countries and figures of the current DB version, for an EntityMatcher"""
+    if isinstance(COUNTRIES_DB, SnapshotMap):
+        # Reader worker: names published with the snapshot plus local writes, without decoding every country
+        entities = json.loads(bytes(COUNTRIES_DB.snapshot.sections("entities/")["names"]))
+        countries = [SimpleNamespace(**c) for c in entities["countries"] if c["id"] not in COUNTRIES_DB.overlay]
+        figures = [SimpleNamespace(**f) for f in entities["figures"] if f["id"] not in FIGURES_DB.overlay]
+        countries.extend(COUNTRIES_DB.overlay.values())
+        figures.extend(FIGURES_DB.overlay.values())
+        return countries, figures
+    return list(COUNTRIES_DB.values()), list(FIGURES_DB.values())
+
+def _rebuild_entity_matcher():
+    global entity_matcher
+    entity_matcher = EntityMatcher(*_entity_matcher_sources())
+
+async def _rebuild_entity_matcher_off_loop():
+    """_rebuild_entity_matcher with the automaton built in a thread. If the DB changed
+    meanwhile, the write that changed it has rebuilt the matcher already"""
+    global entity_matcher
+    version = DB_VERSION
+    matcher = await asyncio.to_thread(EntityMatcher, *_entity_matcher_sources())
+    if DB_VERSION == version:
+        entity_matcher = matcher
+
+# Durable log + snapshot of AI-generated countries
+country_store = CountryStore(
+    os.getenv("COUNTRY_STORE_PATH", os.path.join(os.path.dirname(__file__), "generated_countries")),
+    compact_every=int(os.getenv("COUNTRY_STORE_COMPACT_EVERY", "1000")),
+)
+
+POLITICAL_DATA_FILE = political_data_file()
+
+# Pre-validated binary copy of political_data.json; empty disables it
+DATA_SNAPSHOT_PATH = os.getenv(
+    "DATA_SNAPSHOT_PATH", os.path.join(os.path.dirname(__file__), "political_data.snapshot")
+)
+
+# political_data.json as last applied: country id -> (content hash, validated country)
+POLITICAL_DATA: Dict[str, Tuple[str, Country]] = {}
+
+# AI-generated countries overlay political_data.json and survive its reloads
+GENERATED_COUNTRY_IDS: set = set()
+
+def _schema_key() -> str:
+    """Fingerprint of the Country model, so a snapshot goes stale when the models change"""
+    schema = json.dumps(Country.model_json_schema(), sort_keys=True)
+    return hashlib.sha256(schema.encode("utf-8")).hexdigest()
+
+def _read_political_data(data_file: str, known: Optional[Dict[str, Tuple[str, Country]]] = None) -> Dict[str, Tuple[str, Country]]:
+    """Parse, sort and validate political_data.json, reusing known countries whose content hash is unchanged"""
+    known = known or {}
+    with open(data_file, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    
+    countries = {}
+    for country_data in data.get('countries', []):
+        # Sort events from newest to oldest
+        events = country_data.get('current_events', [])
+        events.sort(key=lambda e: e.get('date', ''), reverse=True)
+        country_data['current_events'] = events
+        
+        content_hash = hashlib.sha1(json.dumps(country_data, sort_keys=True).encode("utf-8")).hexdigest()
+        previous = known.get(country_data.get('id'))
+        if previous is not None and previous[0] == content_hash:
+            countries[previous[1].id] = previous
+        else:
+            country = Country(**country_data)
+            countries[country.id] = (content_hash, country)
+    return countries
+
+def _load_political_data(data_file: str, known: Optional[Dict[str, Tuple[str, Country]]] = None) -> Dict[str, Tuple[str, Country]]:
+    """Validated countries from the snapshot when it is fresh, else from the JSON (refreshing the snapshot)"""
+    schema_key = _schema_key()
+    countries = load_snapshot(DATA_SNAPSHOT_PATH, data_file, schema_key)
+    if countries is not None:
+        log.info("⚡ Loaded political data from snapshot")
+        return countries
+    
+    countries = _read_political_data(data_file, known)
+    if DATA_SNAPSHOT_PATH:
+        try:
+            write_snapshot(DATA_SNAPSHOT_PATH, data_file, schema_key, countries)
+        except OSError as e:
+            log.warning("⚠️ Could not write data snapshot: %s", e)
+    return countries
+
+def _political_data_changes(countries: Dict[str, Tuple[str, Country]]) -> Tuple[List[Country], List[str]]:
+    """Make countries the applied political data; returns the countries whose content changed and the removed ids"""
+    global POLITICAL_DATA
+    changed = [
+        country for country_id, (content_hash, country) in countries.items()
+        if POLITICAL_DATA.get(country_id, (None,))[0] != content_hash and country_id not in GENERATED_COUNTRY_IDS
+    ]
+    removed = [
+        country_id for country_id in POLITICAL_DATA
+        if country_id not in countries and country_id not in GENERATED_COUNTRY_IDS
+    ]
+    POLITICAL_DATA = countries
+    return changed, removed
+
+def _apply_political_data(countries: Dict[str, Tuple[str, Country]]) -> Tuple[int, int]:
+    """Publish the countries whose content changed and drop removed ones; returns (changed, removed)"""
+    changed, removed = _political_data_changes(countries)
+    if changed or removed:
+        _store_countries(changed, removed)
+    return len(changed), len(removed)
+
 def load_initial_data():
-    """Load pre-filled political data from JSON file"""
-    data_file = os.path.join(os.path.dirname(__file__), 'political_data.json')
+    """Load pre-filled political data from JSON file, then AI-generated countries from earlier runs"""
+    data_file = POLITICAL_DATA_FILE
     
     if not os.path.exists(data_file):
-        print("⚠️ No political_data.json found - database will be empty")
+        log.warning("⚠️ No political_data.json found - database will be empty")
+        _load_generated_countries()
         return
     
     try:
-        with open(data_file, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-        
-        for country_data in data.get('countries', []):
-            # Sort events from newest to oldest
-            events = country_data.get('current_events', [])
-            events.sort(key=lambda e: e.get('date', ''), reverse=True)
-            country_data['current_events'] = events
-            
-            country = Country(**country_data)
-            COUNTRIES_DB[country.id] = country
-            
-            # Also store figures separately
-            for figure in country.historical_figures:
-                FIGURES_DB[figure.id] = figure
+        with stage("data_load"):
+            # Also stores figures separately
+            _apply_political_data(_load_political_data(data_file))
         
-        print(f"✅ Loaded {len(COUNTRIES_DB)} countries from database")
-        print(f"✅ Loaded {len(FIGURES_DB)} historical figures")
+        log.info("✅ Loaded political data", extra={"countries": len(COUNTRIES_DB), "figures": len(FIGURES_DB)})
     except Exception as e:
-        print(f"❌ Error loading political data: {e}")
+        log.exception("❌ Error loading political data: %s", e)
+    
+    _load_generated_countries()
+
+async def _store_countries_off_loop(countries: List[Country], removed: Sequence[str]):
+    """_store_countries for large batches: the indexes and the entity matcher are built from
+    scratch in a thread and swapped in at once, so the event loop keeps serving meanwhile.
+    Writes made on the loop while the thread ran are carried over before the swap."""
+    global entity_matcher
+    base = COUNTRIES_DB
+    countries_db, figures_db, removed_figures = _next_db(countries, removed)
+
+    def build():
+        return _build_indexes(countries_db.values()), EntityMatcher(countries_db.values(), figures_db.values())
+
+    indexes, matcher = await asyncio.to_thread(build)
+    # COUNTRIES_DB is copy-on-write: a country written since is a different object
+    written = [country for country_id, country in COUNTRIES_DB.items() if base.get(country_id) is not country]
+    dropped = [country_id for country_id in base if country_id not in COUNTRIES_DB]
+    for country in written:
+        countries_db[country.id] = country
+        for index in indexes:
+            index.index_country(country)
+    for country_id in dropped:
+        countries_db.pop(country_id, None)
+        for index in indexes:
+            index.remove_country(country_id)
+    if written or dropped:
+        figures_db = {figure.id: figure for country in countries_db.values() for figure in country.historical_figures}
+        removed_figures = [figure_id for figure_id in FIGURES_DB if figure_id not in figures_db]
+    _swap_db(countries_db, figures_db, countries, removed, removed_figures, indexes=indexes)
+    if written or dropped:
+        await _rebuild_entity_matcher_off_loop()
+    else:
+        entity_matcher = matcher
+
+async def _reload_political_data():
+    """Re-read political_data.json off the event loop, then swap in the changed countries.
+    Past RELOAD_REBUILD_THRESHOLD changes the indexes are rebuilt in a thread instead of
+    re-indexing each country on the loop, so a large edit does not hold up requests"""
+    countries = await asyncio.to_thread(_load_political_data, POLITICAL_DATA_FILE, POLITICAL_DATA)
+    changed, removed = _political_data_changes(countries)
+    if len(changed) + len(removed) > RELOAD_REBUILD_THRESHOLD:
+        await _store_countries_off_loop(changed, removed)
+    elif changed or removed:
+        _store_countries(changed, removed)
+        await _rebuild_entity_matcher_off_loop()
+    log.info("🔄 Reloaded political_data.json", extra={"changed": len(changed), "removed": len(removed)})
+
+# Reloads changing more countries than this rebuild the indexes in a thread
+RELOAD_REBUILD_THRESHOLD = int(os.getenv("DATA_RELOAD_REBUILD_THRESHOLD", "32"))
+
+# Picks up edits to political_data.json (e.g. from ingest_events.py) without a restart
+data_watcher = FileWatcher(
+    POLITICAL_DATA_FILE,
+    _reload_political_data,
+    interval=float(os.getenv("DATA_RELOAD_INTERVAL", "2")),
+)
+
+# --- Multi-worker mode ---
+# With SHARED_SNAPSHOT_PATH set (e.g. under /dev/shm), the worker holding <path>.lock
+# is the writer and publishes the data there; the other workers serve from it read-only
+SHARED_SNAPSHOT_PATH = os.getenv("SHARED_SNAPSHOT_PATH", "")
+SHARED_POLL_INTERVAL = float(os.getenv("SHARED_POLL_INTERVAL", "0.5"))
+# "single" (no sharing), "writer" or "reader"; decided at startup
+SHARED_ROLE = "single"
+
+shared_lock = WriterLock(SHARED_SNAPSHOT_PATH + ".lock")
+shared_inbox = SharedInbox(SHARED_SNAPSHOT_PATH + ".inbox")
+
+# Attempts at exporting in a thread before the export runs on the event loop instead
+SHARED_EXPORT_ATTEMPTS = 3
+
+# Payloads of the last export by key, with what each was encoded from. Models and the DB
+# dicts are replaced on write, never changed, so one still in place is not encoded again
+_exported_payloads: Dict[str, Tuple[Any, CachedPayload]] = {}
+
+def _exported_payload(exported: Dict[str, Tuple[Any, CachedPayload]], key: str, source: Any, build) -> CachedPayload:
+    entry = _exported_payloads.get(key)
+    if entry is None or entry[0] is not source:
+        entry = source, encode_payload(build())
+    exported[key] = entry
+    return entry[1]
+
+def _export_shared(countries_db, figures_db, indexes) -> Tuple[Dict[str, CachedPayload], Dict[str, bytes]]:
+    """Every read payload of one DB version plus its indexes, as published for reader workers.
+    Touches neither the response cache nor the DBs, so it can run off the event loop"""
+    global _exported_payloads
+    exported: Dict[str, Tuple[Any, CachedPayload]] = {}
+    payloads = {
+        f"country:{country_id}": _exported_payload(
+            exported, f"country:{country_id}", country, lambda: country.model_dump_json().encode("utf-8")
+        ) for country_id, country in countries_db.items()
+    }
+    payloads.update({
+        f"figure:{figure_id}": _exported_payload(
+            exported, f"figure:{figure_id}", figure, lambda: figure.model_dump_json().encode("utf-8")
+        ) for figure_id, figure in figures_db.items()
+    })
+    # Same bytes as _countries_list_payload/_figures_list_payload
+    payloads["countries"] = _exported_payload(
+        exported, "countries", countries_db,
+        lambda: b'{"countries":[' + b",".join(payloads[f"country:{cid}"].body for cid in countries_db) + b"]}",
+    )
+    payloads["figures"] = _exported_payload(
+        exported, "figures", figures_db,
+        lambda: json.dumps(
+            {"figures": [{"id": f.id, "name": f.name} for f in figures_db.values()]},
+            ensure_ascii=False,
+            separators=(",", ":"),
+        ).encode("utf-8"),
+    )
+    # Entries of removed countries and figures go with the previous export
+    _exported_payloads = exported
+
+    sections = {}
+    for prefix, index in zip(("search", "timeline", "graph"), indexes):
+        sections.update({f"{prefix}/{name}": data for name, data in index.export().items()})
+    entities = {
+        "countries": [{"id": c.id, "name": c.name, "code": c.code, "capital": c.capital} for c in countries_db.values()],
+        "figures": [{"id": f.id, "name": f.name} for f in figures_db.values()],
+    }
+    sections["entities/names"] = json.dumps(entities, ensure_ascii=False).encode("utf-8")
+    return payloads, sections
+
+async def _shared_payloads() -> Tuple[Dict[str, CachedPayload], Dict[str, bytes]]:
+    """Writer side: the current DB version exported in a thread, so requests keep being served.
+    The indexes are updated in place, so an export that a write overlapped is thrown away and
+    tried again; if writes keep landing, the last attempt runs on the loop, where none can"""
+    for _ in range(SHARED_EXPORT_ATTEMPTS):
+        version = DB_VERSION
+        state = (COUNTRIES_DB, FIGURES_DB, (search_index, timeline_index, entity_graph))
+        try:
+            exported = await asyncio.to_thread(_export_shared, *state)
+        except Exception:
+            # The indexes changed under the thread; the version check below says so
+            exported = None
+        if exported is not None and DB_VERSION == version:
+            return exported
+    return _export_shared(COUNTRIES_DB, FIGURES_DB, (search_index, timeline_index, entity_graph))
+
+shared_publisher = SnapshotPublisher(SHARED_SNAPSHOT_PATH, _shared_payloads, interval=SHARED_POLL_INTERVAL)
+
+def _apply_shared_snapshot(snapshot: SharedSnapshot):
+    """Reader side: switch to a newer snapshot and the indexes published with it"""
+    global search_index, timeline_index, entity_graph
+    previous = COUNTRIES_DB.snapshot if isinstance(COUNTRIES_DB, SnapshotMap) else None
+    if previous is not None and previous.version == snapshot.version:
+        return
+    if isinstance(COUNTRIES_DB, SnapshotMap):
+        countries_db, figures_db = COUNTRIES_DB.rebased(snapshot), FIGURES_DB.rebased(snapshot)
+    else:
+        countries_db = SnapshotMap(snapshot, "country:", Country.model_validate_json)
+        figures_db = SnapshotMap(snapshot, "figure:", HistoricalFigure.model_validate_json)
+    
+    # Changed countries are only decoded for cache invalidation and /ws deltas, one at a time;
+    # before the first snapshot nothing was cached or subscribed
+    changed = (
+        countries_db.decode(country_id) for country_id in snapshot.keys("country:")
+        if previous is not None and previous.etag(f"country:{country_id}") != snapshot.etag(f"country:{country_id}")
+    )
+    removed = [country_id for country_id in COUNTRIES_DB if country_id not in countries_db]
+    removed_figures = [figure_id for figure_id in FIGURES_DB if figure_id not in figures_db]
+    search_index = SearchIndex.load(snapshot.sections("search/"))
+    timeline_index = TimelineIndex.load(snapshot.sections("timeline/"), CountryEvent.model_validate_json)
+    entity_graph = EntityGraph.load(snapshot.sections("graph/"))
+    _swap_db(countries_db, figures_db, changed, removed, removed_figures)
+    _rebuild_entity_matcher()
+
+async def _follow_shared_snapshot():
+    snapshot = await asyncio.to_thread(SharedSnapshot, SHARED_SNAPSHOT_PATH)
+    _apply_shared_snapshot(snapshot)
+
+async def _drain_shared_inbox():
+    """Writer side: store and persist countries generated by reader workers"""
+    countries = []
+    for line in await asyncio.to_thread(shared_inbox.drain):
+        try:
+            countries.append(Country.model_validate_json(line))
+        except ValidationError as e:
+            log.error("❌ Skipping country from a worker", extra={"errors": e.error_count()})
+    if countries:
+        GENERATED_COUNTRY_IDS.update(country.id for country in countries)
+        _store_countries(countries)
+        for country in countries:
+            country_store.put(country.id, country.model_dump_json())
+        _rebuild_entity_matcher()
+
+shared_follower = FileWatcher(SHARED_SNAPSHOT_PATH, _follow_shared_snapshot, interval=SHARED_POLL_INTERVAL)
+inbox_watcher = FileWatcher(shared_inbox.path, _drain_shared_inbox, interval=SHARED_POLL_INTERVAL)
+
+async def _start_shared_reader():
+    # Started first so a snapshot published while we load below is not missed
+    shared_follower.start()
+    # Give the writer a moment to publish, so this worker does not start out empty
+    for _ in range(int(10 / SHARED_POLL_INTERVAL)):
+        if read_version(SHARED_SNAPSHOT_PATH) is not None:
+            break
+        await asyncio.sleep(SHARED_POLL_INTERVAL)
+    if read_version(SHARED_SNAPSHOT_PATH) is not None:
+        await _follow_shared_snapshot()
+    log.info("✅ Reader worker serving from the shared snapshot", extra={"countries": len(COUNTRIES_DB)})
+
+def _load_generated_countries():
+    """Replay the snapshot + log of AI-generated countries on top of the JSON data"""
+    restored = 0
+    try:
+        countries = []
+        for country_data in country_store.load():
+            try:
+                countries.append(Country(**country_data))
+            except ValidationError as e:
+                log.error("❌ Skipping stored country %s", country_data.get('id'), extra={"errors": e.error_count()})
+        GENERATED_COUNTRY_IDS.update(country.id for country in countries)
+        _store_countries(countries)
+        restored = len(countries)
+    except OSError as e:
+        log.error("❌ Error reading generated countries: %s", e)
+    
+    _rebuild_entity_matcher()
+    if restored:
+        log.info("✅ Restored AI-generated countries", extra={"countries": restored})
 
 def clean_json_string(text: str) -> str:
-    """Clean AI response from markdown and comments"""
-    text = re.sub(r'```json\s*', '', text)
-    text = re.sub(r'```', '', text)
-    match = re.search(r'(\{.*\}|\[.*\])', text, re.DOTALL)
-    if match:
-        return match.group(1)
-    return text
+    """The first complete JSON object or array in an AI response, without markdown
+    fences or remarks around it; the text itself when there is none"""
+    return extract_json(text) or text
 
-def call_gemini(prompt: str, temperature: float = 0.7) -> str:
-    """Call Gemini API with given prompt"""
+def _gemini_request(prompt: str, temperature: float):
+    """Build the Gemini payload and the cache key material for a prompt"""
+    generation_config = {
+        "temperature": temperature,
+        "topP": 0.8,
+        "topK": 40
+    }
     payload = {
         "contents": [{"parts": [{"text": prompt}]}],
-        "generationConfig": {
-            "temperature": temperature,
-            "topP": 0.8,
-            "topK": 40
-        }
+        "generationConfig": generation_config
     }
+    return payload, generation_config
+
+def _gemini_error(status_code: int, text: str) -> HTTPException:
+    """Map a non-200 Gemini answer to the HTTP error we return to clients"""
+    log.error("❌ API Error: %s", text[:300], extra={"upstream_status": status_code})
     
-    try:
-        print(f"🤖 Calling Gemini API...")
-        print(f"   Model: {GEMINI_MODEL}")
-        print(f"   Prompt length: {len(prompt)} chars")
-        
-        resp = requests.post(
-            GEMINI_URL, 
-            json=payload, 
-            headers={"Content-Type": "application/json"}, 
-            timeout=120  # Increased to 120 seconds (2 minutes)
+    if status_code == 429:
+        # Trust Gemini over our own count until the bucket refills
+        llm_scheduler.quota_exhausted(daily="day" in text.lower())
+    
+    # Handle quota exceeded error
+    if status_code == 429 and 'quota' in text.lower():
+        return HTTPException(
+            status_code=429, 
+            detail="Daily API quota exceeded. The free tier allows 20 requests per day. Please try again tomorrow or upgrade your API plan."
         )
-        
-        print(f"   Status: {resp.status_code}")
+    
+    return HTTPException(status_code=500, detail=f"AI Error: {text}")
+
+def _overloaded_error(e: LLMOverloaded) -> HTTPException:
+    """503 (or 429 when the daily quota is the limit) with a Retry-After hint"""
+    headers = {"Retry-After": str(max(1, math.ceil(e.retry_after)))}
+    if e.quota:
+        return HTTPException(
+            status_code=429,
+            detail="The daily AI quota is used up or reserved for interactive chat. Please try again later.",
+            headers=headers,
+        )
+    return HTTPException(status_code=503, detail="The AI service is busy. Please try again shortly.", headers=headers)
+
+def _llm_failed(priority: str, error: HTTPException) -> HTTPException:
+    LLM_REQUESTS.inc(priority=priority, status=error.status_code)
+    return error
+
+def _llm_succeeded(priority: str, prompt: str, answer: str, usage: Optional[Dict[str, Any]] = None):
+    usage = usage or {}
+    LLM_REQUESTS.inc(priority=priority, status=200)
+    LLM_CHARACTERS.inc(len(prompt), direction="in")
+    LLM_CHARACTERS.inc(len(answer), direction="out")
+    LLM_TOKENS.inc(usage.get("promptTokenCount") or estimate_tokens(prompt), direction="in")
+    LLM_TOKENS.inc(usage.get("candidatesTokenCount") or estimate_tokens(answer), direction="out")
+
+async def _cached_answer(cache_key: str) -> Optional[str]:
+    cached = await llm_cache.get(cache_key)
+    LLM_CACHE_LOOKUPS.inc(result="miss" if cached is None else "hit")
+    if cached is not None:
+        log.info("⚡ LLM cache hit", extra={"chars": len(cached)})
+    return cached
+
+def _llm_cache_key(prompt: str, temperature: float) -> str:
+    return LLMCache.make_key(GEMINI_MODEL, prompt, _gemini_request(prompt, temperature)[1])
+
+async def _replay(text: str) -> AsyncIterator[str]:
+    """A cached answer as a stream of one fragment"""
+    yield text
+
+async def call_gemini(
+    prompt: str,
+    temperature: float = 0.7,
+    timeout: Optional[float] = None,
+    cache: bool = False,
+    priority: str = "chat",
+) -> str:
+    """Call Gemini API with given prompt without blocking the event loop.
+    With cache=True identical prompts are answered from the LLM response cache;
+    that is for free-text answers only. Callers that parse the answer cache it
+    themselves once it has parsed, so a malformed answer is not replayed.
+    The call waits for a slot of its priority class in llm_scheduler."""
+    payload, generation_config = _gemini_request(prompt, temperature)
+    
+    cache_key = None
+    if cache:
+        cache_key = LLMCache.make_key(GEMINI_MODEL, prompt, generation_config)
+        cached = await _cached_answer(cache_key)
+        if cached is not None:
+            return cached
+    
+    try:
+        queued = time.perf_counter()
+        async with llm_scheduler.slot(priority):
+            record_stage("queue_wait", time.perf_counter() - queued)
+            with stage("gemini_network"):
+                resp = await gemini.post(payload, timeout=timeout)
         
         if resp.status_code != 200:
-            print(f"❌ API Error: {resp.text[:300]}")
-            
-            # Handle quota exceeded error
-            if resp.status_code == 429:
-                error_data = resp.json()
-                if 'quota' in resp.text.lower():
-                    raise HTTPException(
-                        status_code=429, 
-                        detail="Daily API quota exceeded. The free tier allows 20 requests per day. Please try again tomorrow or upgrade your API plan."
-                    )
-            
-            raise HTTPException(status_code=500, detail=f"AI Error: {resp.text}")
-            
-        raw_text = resp.json()["candidates"][0]["content"]["parts"][0]["text"]
-        print(f"✅ Got response: {len(raw_text)} chars")
+            raise _gemini_error(resp.status_code, resp.text)
+        
+        data = resp.json()
+        raw_text = data["candidates"][0]["content"]["parts"][0]["text"]
+        _llm_succeeded(priority, prompt, raw_text, data.get("usageMetadata"))
+        log.info(
+            "🤖 Gemini call", extra={"model": GEMINI_MODEL, "priority": priority, "prompt_chars": len(prompt), "response_chars": len(raw_text)}
+        )
+        if cache_key is not None:
+            await llm_cache.set(cache_key, raw_text)
         return raw_text
-    except requests.exceptions.Timeout:
-        print(f"❌ Gemini API Timeout after 30s!")
-        raise HTTPException(status_code=504, detail="AI service timeout")
+    except HTTPException as e:
+        raise _llm_failed(priority, e)
+    except LLMOverloaded as e:
+        log.warning("⏳ Gemini call shed: %s", e)
+        raise _llm_failed(priority, _overloaded_error(e))
+    except httpx.TimeoutException:
+        log.error("❌ Gemini API Timeout after %ss!", timeout or gemini.timeout)
+        raise _llm_failed(priority, HTTPException(status_code=504, detail="AI service timeout"))
     except Exception as e:
-        print(f"❌ Gemini API Error: {type(e).__name__}: {e}")
-        raise HTTPException(status_code=500, detail=f"AI service error: {str(e)}")
+        log.error("❌ Gemini API Error: %s: %s", type(e).__name__, e)
+        raise _llm_failed(priority, HTTPException(status_code=500, detail=f"AI service error: {str(e)}"))
+
+async def stream_gemini(
+    prompt: str,
+    temperature: float = 0.7,
+    timeout: Optional[float] = None,
+    cache: bool = False,
+    priority: str = "chat",
+) -> AsyncIterator[str]:
+    """Stream Gemini's answer as text fragments.
+    Errors and cache=True behave like call_gemini; a cached answer is yielded
+    as a single fragment. Closing the iterator aborts the upstream call."""
+    payload, generation_config = _gemini_request(prompt, temperature)
+    
+    cache_key = None
+    if cache:
+        cache_key = LLMCache.make_key(GEMINI_MODEL, prompt, generation_config)
+        cached = await _cached_answer(cache_key)
+        if cached is not None:
+            yield cached
+            return
+    
+    parts = []
+    try:
+        # The slot is held for the whole stream; gemini_network includes the time
+        # the client takes to receive each fragment
+        queued = time.perf_counter()
+        async with llm_scheduler.slot(priority):
+            record_stage("queue_wait", time.perf_counter() - queued)
+            with stage("gemini_network"):
+                async for text in gemini.stream(payload, timeout=timeout):
+                    parts.append(text)
+                    yield text
+    except GeminiStreamError as e:
+        raise _llm_failed(priority, _gemini_error(e.status_code, e.text))
+    except LLMOverloaded as e:
+        log.warning("⏳ Gemini stream shed: %s", e)
+        raise _llm_failed(priority, _overloaded_error(e))
+    except httpx.TimeoutException:
+        log.error("❌ Gemini API Timeout after %ss!", timeout or gemini.timeout)
+        raise _llm_failed(priority, HTTPException(status_code=504, detail="AI service timeout"))
+    except Exception as e:
+        log.error("❌ Gemini API Error: %s: %s", type(e).__name__, e)
+        raise _llm_failed(priority, HTTPException(status_code=500, detail=f"AI service error: {str(e)}"))
+    
+    raw_text = "".join(parts)
+    # The stream does not carry usageMetadata on every chunk; tokens are estimated
+    _llm_succeeded(priority, prompt, raw_text)
+    log.info(
+        "🤖 Gemini stream", extra={"model": GEMINI_MODEL, "priority": priority, "prompt_chars": len(prompt), "response_chars": len(raw_text)}
+    )
+    if cache_key is not None:
+        await llm_cache.set(cache_key, raw_text)
 
 # --- ENDPOINTS ---
 
@@ -200,6 +829,87 @@ async def root():
         "status": "running"
     }
 
+# Token budget of a whole chat prompt: instructions, question, trimmed history and retrieved facts
+CHAT_PROMPT_TOKENS = int(os.getenv("CHAT_PROMPT_TOKENS", "2000"))
+
+CHAT_PROMPT = """
+You are an expert AI Political Navigator assistant helping users understand 21st century politics.
+You provide clear, balanced, factual information about political events, policies, and figures.
+{context_info}
+Facts from the app's database (prefer these over your own recollection):
+{facts}
+
+Previous conversation:
+{history}
+
+User question: {question}
+
+Provide a clear, informative response. Be objective and cite relevant historical context when helpful.
+Keep your response concise (2-3 paragraphs maximum).
+"""
+
+@stage("prompt_build")
+def _build_chat_prompt(request: ChatRequest) -> str:
+    """Build the Gemini prompt for a chat question: the facts most relevant to it from the
+    local data plus the newest history, packed into CHAT_PROMPT_TOKENS"""
+    context_info = ""
+    focus = []
+    for key, label in (("country", "User is currently viewing"), ("event", "Related event"), ("figure", "Related figure")):
+        if request.context and request.context.get(key):
+            value = truncate(str(request.context[key]), 50)
+            context_info += f"\n{label}: {value}"
+            focus.append(value)
+    
+    fixed = estimate_tokens(CHAT_PROMPT.format(context_info=context_info, facts="", history="", question=""))
+    history = [(msg.role, msg.content) for msg in request.history or []]
+    context = build_context(
+        request.message, focus, history, CHAT_PROMPT_TOKENS, fixed, search_index, COUNTRIES_DB.get
+    )
+    tokens = context["tokens"]
+    log.info("📚 Chat context", extra={
+        "passages": len(context["passages"]), "context_tokens": tokens["context"],
+        "history_messages": len(context["history"]), "history_tokens": tokens["history"],
+    })
+    
+    return CHAT_PROMPT.format(
+        context_info=context_info,
+        facts="\n".join(f"- {passage.text}" for passage in context["passages"]) or "(none found)",
+        history="".join(f"\n{role.upper()}: {content}" for role, content in context["history"]),
+        question=context["question"],
+    )
+
+@app.get("/api/cache/responses")
+async def response_cache_stats():
+    """Counters of the pre-serialized read response cache"""
+    return {"db_version": DB_VERSION, **response_cache.stats()}
+
+@app.get("/api/shared/status")
+async def shared_status():
+    """Multi-worker mode: this worker's role and the snapshot it serves or publishes"""
+    status = {"role": SHARED_ROLE, "pid": os.getpid(), "db_version": DB_VERSION, "countries": len(COUNTRIES_DB)}
+    if SHARED_ROLE == "writer":
+        status["publisher"] = shared_publisher.stats()
+    elif isinstance(COUNTRIES_DB, SnapshotMap):
+        status["snapshot_version"] = COUNTRIES_DB.snapshot.version
+        status["snapshot_bytes"] = COUNTRIES_DB.snapshot.size
+        status["local_overlay"] = len(COUNTRIES_DB.overlay)
+    return status
+
+@app.get("/api/llm/cache")
+async def llm_cache_stats():
+    """Hit/miss counters and occupancy of the LLM response cache"""
+    return await llm_cache.stats()
+
+@app.get("/api/chat/cache")
+async def chat_cache_stats():
+    """Hit rate, occupancy and evictions of the semantic chat answer cache"""
+    return semantic_cache.stats()
+
+@app.get("/api/llm/quota")
+async def llm_quota():
+    """Request quotas left, queue depth per priority class and how much was shed"""
+    return llm_scheduler.stats()
+
 @app.post("/api/chat", response_model=ChatResponse)
 async def chat_with_ai(request: ChatRequest):
     """
@@ -232,171 +942,571 @@ async def chat_with_ai(request: ChatRequest):
             timestamp=datetime.now().isoformat()
         )
     
-    # Real Gemini API call
-    context_info = ""
-    if request.context:
-        if "country" in request.context:
-            context_info += f"\nUser is currently viewing: {request.context['country']}"
-        if "event" in request.context:
-            context_info += f"\nRelated event: {request.context['event']}"
-    
-    history_text = ""
-    if request.history:
-        for msg in request.history[-5:]:
-            history_text += f"\n{msg.role.upper()}: {msg.content}"
+    cached = _semantic_answer(request)
+    if cached is not None:
+        return ChatResponse(response=cached, timestamp=datetime.now().isoformat())
     
-    prompt = f"""
-You are an expert AI Political Navigator assistant helping users understand 21st century politics.
-You provide clear, balanced, factual information about political events, policies, and figures.
-
-{context_info}
-
-Previous conversation:
-{history_text}
-
-User question: {request.message}
-
-Provide a clear, informative response. Be objective and cite relevant historical context when helpful.
-Keep your response concise (2-3 paragraphs maximum).
-"""
+    # Real Gemini API call
+    prompt = _build_chat_prompt(request)
     
-    response_text = call_gemini(prompt, temperature=0.7)
+    response_text = await call_gemini(prompt, temperature=0.7, cache=True, priority="chat")
+    semantic_cache.store(request.message, request.context, response_text, has_history=bool(request.history))
     
     return ChatResponse(
         response=response_text,
         timestamp=datetime.now().isoformat()
     )
 
-@app.post("/api/analyze-text", response_model=AnalyzeTextResponse)
-async def analyze_text(request: AnalyzeTextRequest):
+def _semantic_answer(request: ChatRequest) -> Optional[str]:
+    """Cached answer to a paraphrase of this question asked in the same context, if any"""
+    hit = semantic_cache.lookup(request.message, request.context, has_history=bool(request.history))
+    if hit is None:
+        return None
+    answer, similarity = hit
+    log.info("🧠 Semantic cache hit", extra={"similarity": round(similarity, 2)})
+    return answer
+
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+@app.post("/api/chat/stream")
+async def chat_with_ai_stream(request: ChatRequest):
     """
-    Analyze text to identify countries and historical figures for highlighting.
-    Returns entity positions and types for frontend highlighting.
+    Streaming variant of /api/chat as Server-Sent Events.
+    Emits `delta` events with partial text, then `done` with the full answer
+    (or `error`). The upstream Gemini call is aborted if the client disconnects.
     """
+    cached = _semantic_answer(request)
+    if cached is not None:
+        async def replay():
+            yield _sse("delta", {"text": cached})
+            yield _sse("done", {"response": cached, "timestamp": datetime.now().isoformat()})
+        return StreamingResponse(replay(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
     
-    prompt = f"""
-Analyze this political text and identify ALL mentions of:
+    prompt = _build_chat_prompt(request)
+    # Shed before the stream starts, so an overloaded server answers with a real 503
+    try:
+        llm_scheduler.check("chat")
+    except LLMOverloaded as e:
+        raise _overloaded_error(e)
+    
+    async def events():
+        parts = []
+        try:
+            async for text in stream_gemini(prompt, temperature=0.7, cache=True, priority="chat"):
+                parts.append(text)
+                yield _sse("delta", {"text": text})
+            response = "".join(parts)
+            semantic_cache.store(request.message, request.context, response, has_history=bool(request.history))
+            yield _sse("done", {"response": response, "timestamp": datetime.now().isoformat()})
+        except HTTPException as e:
+            yield _sse("error", {"status": e.status_code, "detail": e.detail})
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+ANALYZE_BATCH_PROMPT = """
+Analyze the numbered political texts below and identify ALL mentions of:
 1. Countries (full names or common references)
 2. Historical/political figures (leaders, politicians, activists)
 
-TEXT: "{request.text}"
+{texts}
 
-Return a JSON array of entities with this structure:
+Return a JSON array with one object per text, in order:
 [
   {{
-    "text": "exact text from original",
-    "type": "country" or "figure",
-    "id": "suggested_id_snake_case",
-    "start": character_position_start,
-    "end": character_position_end
+    "index": text_number,
+    "entities": [
+      {{
+        "text": "exact text from that text",
+        "type": "country" or "figure",
+        "id": "suggested_id_snake_case"
+      }}
+    ]
   }}
 ]
 
-IMPORTANT: 
+IMPORTANT:
 - Return ONLY valid JSON array
-- Use exact character positions from the original text
-- Include all relevant entities
+- Copy each mention exactly; list a name once per time it is mentioned
+- Include every text, with an empty "entities" list when it mentions nothing
 - Use snake_case for IDs
 """
+
+def _analyze_batch_prompt(texts: Sequence[str]) -> str:
+    return ANALYZE_BATCH_PROMPT.format(
+        texts="\n\n".join(f"<<<TEXT {i}>>>\n{text}\n<<<END {i}>>>" for i, text in enumerate(texts, 1))
+    )
+
+async def _analyze_batch(texts: List[str]) -> List[Optional[list]]:
+    """One Gemini call for several texts; the raw entity list per text (None if unreadable)"""
+    unique = list(dict.fromkeys(texts))
+    raw_response = await call_gemini(_analyze_batch_prompt(unique), temperature=0.3, priority="analyze")
+    with stage("clean_json"):
+        json_str = clean_json_string(raw_response)
+    try:
+        with stage("json_parse"):
+            data = json.loads(json_str)
+        by_index = {
+            item["index"]: item["entities"] for item in data
+            if isinstance(item, dict) and isinstance(item.get("entities"), list)
+        }
+    except (ValueError, TypeError, KeyError) as e:
+        log.error("❌ Failed to parse entities: %s", e, extra={"texts": len(unique)})
+        return [None] * len(texts)
+    found = {text: by_index.get(i, by_index.get(str(i))) for i, text in enumerate(unique, 1)}
+    return [found[text] for text in texts]
+
+# Concurrent analyze-text requests that need Gemini share one call per window
+analyze_batcher = MicroBatcher(
+    _analyze_batch,
+    window=float(os.getenv("ANALYZE_BATCH_WINDOW_MS", "50")) / 1000,
+    max_items=int(os.getenv("ANALYZE_BATCH_SIZE", "16")),
+    max_weight=int(os.getenv("ANALYZE_BATCH_CHARS", "12000")),
+)
+
+def _anchor_entities(text: str, raw_entities: list) -> List[HighlightedEntity]:
+    """Place the model's mentions on the text: repeated mentions of a name take its
+    successive occurrences, and mentions not found in the text are dropped"""
+    entities = []
+    search_from: Dict[str, int] = {}
+    with stage("validate"):
+        for item in raw_entities:
+            mention = item.get("text") if isinstance(item, dict) else None
+            if not isinstance(mention, str) or not mention:
+                continue
+            start = text.find(mention, search_from.get(mention, 0))
+            if start < 0:
+                continue
+            search_from[mention] = start + len(mention)
+            try:
+                entity = HighlightedEntity(
+                    text=mention, type=item.get("type"), id=item.get("id"), start=start, end=start + len(mention)
+                )
+            except ValidationError:
+                continue
+            # Prefer real DB ids when the name is one we know
+            known = entity_matcher.find(entity.text)
+            if len(known) == 1 and known[0].text == entity.text:
+                entity.type, entity.id = known[0].type, known[0].id
+            entities.append(entity)
+    return entities
+
+async def _analyze_text_with_llm(text: str) -> List[HighlightedEntity]:
+    """Ask Gemini for entity mentions (batched with concurrent requests) and anchor them on the text.
+    Answers are cached per text, so batching does not change what can be reused."""
+    cache_key = LLMCache.make_key(GEMINI_MODEL, ANALYZE_BATCH_PROMPT + text, {"temperature": 0.3})
+    cached = await _cached_answer(cache_key)
+    if cached is not None:
+        raw_entities = json.loads(cached)
+    else:
+        raw_entities = await analyze_batcher.submit(text)
+        if raw_entities is None:
+            return []
+        await llm_cache.set(cache_key, json.dumps(raw_entities))
+    return _anchor_entities(text, raw_entities)
+
+async def _analyze(text: str, llm_fallback: bool) -> AnalyzeTextResponse:
+    entities = [HighlightedEntity(**m._asdict()) for m in entity_matcher.find(text)]
+    skipped = False
     
-    raw_response = call_gemini(prompt, temperature=0.3)
-    json_str = clean_json_string(raw_response)
+    if llm_fallback:
+        try:
+            found = await _analyze_text_with_llm(text)
+        except Exception as e:
+            # The local matches still stand; only what Gemini would have added is missing
+            log.warning("⚠️ Analyze-text fallback skipped: %s", e.detail if isinstance(e, HTTPException) else e,
+                        extra={"status": getattr(e, "status_code", None)})
+            found, skipped = [], True
+        taken = [(e.start, e.end) for e in entities]
+        for entity in found:
+            if all(entity.end <= start or entity.start >= end for start, end in taken):
+                entities.append(entity)
+                taken.append((entity.start, entity.end))
+        entities.sort(key=lambda e: e.start)
     
-    try:
-        entities_data = json.loads(json_str)
-        entities = [HighlightedEntity(**entity) for entity in entities_data]
-        
-        return AnalyzeTextResponse(
-            entities=entities,
-            enhanced_text=request.text
-        )
-    except Exception as e:
-        print(f"❌ Failed to parse entities: {e}")
-        return AnalyzeTextResponse(entities=[], enhanced_text=request.text)
+    return AnalyzeTextResponse(
+        entities=entities,
+        enhanced_text=text,
+        llm_fallback_skipped=skipped,
+    )
 
-def _build_quiz_context() -> str:
-    """Build a compact summary of political data for Gemini to generate quiz questions."""
-    parts = []
-    for c in list(COUNTRIES_DB.values())[:40]: 
-        country_line = f"- {c.name} (capital: {c.capital}, government: {c.government_type})"
-        events_line = "  Events: " + "; ".join(
-            f"{e.title} ({e.date})" for e in (c.current_events or [])[:5]
-        ) if c.current_events else "  Events: (none)"
-        figures_line = "  Figures: " + "; ".join(
-            f"{f.name} ({f.role})" for f in (c.historical_figures or [])[:5]
-        ) if c.historical_figures else "  Figures: (none)"
-        parts.append(country_line + "\n" + events_line + "\n" + figures_line)
-    return "\n".join(parts) if parts else "No country data available."
+@app.post("/api/analyze-text", response_model=AnalyzeTextResponse)
+async def analyze_text(request: AnalyzeTextRequest):
+    """
+    Analyze text to identify countries and historical figures for highlighting.
+    Returns entity positions and types for frontend highlighting.
+    Mentions are found locally from the database; with llm_fallback=true
+    Gemini is asked as well and contributes the spans the local matcher missed.
+    If that call fails, the local mentions are returned with llm_fallback_skipped=true.
+    """
+    return await _analyze(request.text, request.llm_fallback)
 
-@app.post("/api/quiz/generate-question", response_model=GeneratedQuizQuestion)
-async def generate_quiz_question():
+@app.post("/api/analyze-text/batch", response_model=AnalyzeTextBatchResponse)
+async def analyze_text_batch(request: AnalyzeTextBatchRequest):
     """
-    Generate one multiple-choice quiz question using Gemini, based on app political data.
-    Returns question, 4 options, and correctIndex (0-3).
+    /api/analyze-text for many texts (e.g. every paragraph of a page) in one request.
+    Results are in the order of the texts; with llm_fallback=true the texts share
+    as few Gemini calls as ANALYZE_BATCH_SIZE and ANALYZE_BATCH_CHARS allow.
     """
-    if not GEMINI_API_KEY:
-        raise HTTPException(status_code=503, detail="Gemini API key not configured")
+    results = await asyncio.gather(*(_analyze(text, request.llm_fallback) for text in request.texts))
+    return AnalyzeTextBatchResponse(results=list(results))
+
+@app.get("/api/llm/batches")
+async def analyze_batch_stats():
+    """How many analyze-text Gemini calls were shared, and by how many texts"""
+    return analyze_batcher.stats()
+
+QUIZ_CONTEXT_COUNTRIES = int(os.getenv("QUIZ_CONTEXT_COUNTRIES", "40"))
+QUIZ_CONTEXT_MODE = os.getenv("QUIZ_CONTEXT_MODE", "rotate")  # "first", "rotate" or "sample"
+
+def _memoize_on_db_version(func):
+    """Cache func's results per arguments until the next write bumps DB_VERSION"""
+    cache: Dict[Any, Any] = {}
+    cached_version = [None]
+    
+    @functools.wraps(func)
+    def wrapper(*args):
+        if cached_version[0] != DB_VERSION:
+            cache.clear()
+            cached_version[0] = DB_VERSION
+        if args not in cache:
+            cache[args] = func(*args)
+        return cache[args]
+    
+    return wrapper
+
+# country id -> (Country object the text was built from, text); removed countries are
+# dropped by _swap_db
+_quiz_fragment_cache: Dict[str, Any] = {}
+
+def _quiz_fragment(c: Country) -> str:
+    """Summary of one country for the quiz prompt, rebuilt only when that country changes"""
+    cached = _quiz_fragment_cache.get(c.id)
+    if cached is not None and cached[0] is c:
+        return cached[1]
+    country_line = f"- {c.name} (capital: {c.capital}, government: {c.government_type})"
+    events_line = "  Events: " + "; ".join(
+        f"{e.title} ({e.date})" for e in (c.current_events or [])[:5]
+    ) if c.current_events else "  Events: (none)"
+    figures_line = "  Figures: " + "; ".join(
+        f"{f.name} ({f.role})" for f in (c.historical_figures or [])[:5]
+    ) if c.historical_figures else "  Figures: (none)"
+    text = country_line + "\n" + events_line + "\n" + figures_line
+    _quiz_fragment_cache[c.id] = (c, text)
+    return text
+
+@_memoize_on_db_version
+def _quiz_fragments() -> List[str]:
+    return [_quiz_fragment(c) for c in COUNTRIES_DB.values()]
+
+@_memoize_on_db_version
+def _quiz_context_window(start: int, count: int) -> str:
+    fragments = _quiz_fragments()
+    window = (fragments + fragments)[start:start + count] if count < len(fragments) else fragments
+    return "\n".join(window)
+
+_quiz_context_rotation = 0
+
+@stage("prompt_build")
+def _build_quiz_context() -> str:
+    """Build a compact summary of political data for Gemini to generate quiz questions.
+    Covers QUIZ_CONTEXT_COUNTRIES countries: the first ones, a window that rotates
+    on every call, or a random sample, depending on QUIZ_CONTEXT_MODE."""
+    global _quiz_context_rotation
+    fragments = _quiz_fragments()
+    if not fragments:
+        return "No country data available."
+    count = min(QUIZ_CONTEXT_COUNTRIES, len(fragments))
+    
+    if QUIZ_CONTEXT_MODE == "sample":
+        return "\n".join(random.sample(fragments, count))
+    if QUIZ_CONTEXT_MODE == "rotate":
+        start = _quiz_context_rotation % len(fragments)
+        _quiz_context_rotation = start + count
+        return _quiz_context_window(start, count)
+    return _quiz_context_window(0, count)
+
+async def _generate_quiz_questions(count: int, priority: str = "prefetch") -> List[GeneratedQuizQuestion]:
+    """Ask Gemini for several quiz questions in one call; invalid ones are dropped"""
     context = _build_quiz_context()
-    prompt = f"""You are a quiz generator for a political education app. Using ONLY the facts below, generate exactly ONE multiple-choice question (in English) that can be answered from this data.
+    prompt = f"""You are a quiz generator for a political education app. Using ONLY the facts below, generate exactly {count} different multiple-choice questions (in English) that can be answered from this data.
 
 POLITICAL DATA (use only this information):
 {context}
 
 Rules:
-- Question must be answerable from the data above only.
-- Return exactly 4 options; one must be correct.
+- Each question must be answerable from the data above only.
+- Questions must be about different facts.
+- Return exactly 4 options per question; one must be correct.
 - correctIndex is 0-based (0, 1, 2, or 3).
-- Output ONLY valid JSON, no markdown or extra text:
-{{"question": "Your question here?", "options": ["Option A", "Option B", "Option C", "Option D"], "correctIndex": 0}}
+- Output ONLY a valid JSON array, no markdown or extra text:
+[{{"question": "Your question here?", "options": ["Option A", "Option B", "Option C", "Option D"], "correctIndex": 0}}]
 """
-    raw = call_gemini(prompt, temperature=0.8)
-    json_str = clean_json_string(raw)
+    raw = await call_gemini(prompt, temperature=0.8, priority=priority)
+    with stage("clean_json"):
+        json_str = clean_json_string(raw)
     try:
-        data = json.loads(json_str)
+        with stage("json_parse"):
+            data = json.loads(json_str)
+    except json.JSONDecodeError as e:
+        log.error("❌ Failed to parse generated questions: %s", e, extra={"raw": raw[:500]})
+        return []
+    
+    questions = []
+    validate_start = time.perf_counter()
+    for item in data if isinstance(data, list) else [data]:
+        if not isinstance(item, dict):
+            continue
         # Normalize key if model returns correct_index
-        if "correct_index" in data and "correctIndex" not in data:
-            data["correctIndex"] = data["correct_index"]
-        return GeneratedQuizQuestion(**data)
-    except (json.JSONDecodeError, Exception) as e:
-        print(f"❌ Failed to parse generated question: {e}\nRaw: {raw[:500]}")
+        if "correct_index" in item and "correctIndex" not in item:
+            item["correctIndex"] = item["correct_index"]
+        try:
+            questions.append(GeneratedQuizQuestion(**item))
+        except ValidationError as e:
+            log.warning(
+                "❌ Dropping invalid generated question: %s", str(item.get('question'))[:80], extra={"errors": e.error_count()}
+            )
+    record_stage("validate", time.perf_counter() - validate_start)
+    return questions
+
+quiz_pool = QuizPool(
+    _generate_quiz_questions,
+    size=int(os.getenv("QUIZ_POOL_SIZE", "10")),
+    batch_size=int(os.getenv("QUIZ_POOL_BATCH", "5")),
+    refill_interval=float(os.getenv("QUIZ_POOL_REFILL_INTERVAL", "120")),
+)
+
+@app.post("/api/quiz/generate-question", response_model=GeneratedQuizQuestion)
+async def generate_quiz_question():
+    """
+    Generate one multiple-choice quiz question using Gemini, based on app political data.
+    Returns question, 4 options, and correctIndex (0-3).
+    Served from the pre-generated pool; a live Gemini call is made only when it is empty.
+    """
+    if not GEMINI_API_KEY:
+        raise HTTPException(status_code=503, detail="Gemini API key not configured")
+    
+    question = quiz_pool.take()
+    if question is not None:
+        return question
+    
+    # Someone is waiting for this one, unlike the pool's background refills
+    questions = await _generate_quiz_questions(1, priority="generate")
+    if not questions:
         raise HTTPException(status_code=500, detail="Failed to parse AI-generated question")
+    # Extra questions the model volunteered are not wasted, unless they repeat this one
+    quiz_pool.mark_served(questions[0])
+    quiz_pool.add(questions[1:])
+    return questions[0]
+
+@app.get("/api/quiz/pool")
+async def quiz_pool_stats():
+    """Depth, refill settings and hit ratio of the quiz question pool"""
+    return quiz_pool.stats()
+
+def _country_payload(country_id: str):
+    if isinstance(COUNTRIES_DB, SnapshotMap):
+        # Reader worker: straight from the shared mapping unless written locally since
+        payload = COUNTRIES_DB.local_payload(country_id)
+        if payload is not None:
+            return payload
+    return response_cache.get(
+        f"country:{country_id}", lambda: COUNTRIES_DB[country_id].model_dump_json().encode("utf-8")
+    )
+
+def _figure_payload(figure_id: str):
+    if isinstance(FIGURES_DB, SnapshotMap):
+        payload = FIGURES_DB.local_payload(figure_id)
+        if payload is not None:
+            return payload
+    return response_cache.get(
+        f"figure:{figure_id}", lambda: FIGURES_DB[figure_id].model_dump_json().encode("utf-8")
+    )
+
+def _countries_list_payload():
+    if isinstance(COUNTRIES_DB, SnapshotMap) and COUNTRIES_DB.pristine:
+        return COUNTRIES_DB.snapshot.payload("countries")
+    # Assembled from the per-country payloads, so a write only re-encodes one country
+    return response_cache.get(
+        "countries",
+        lambda: b'{"countries":[' + b",".join(_country_payload(cid).body for cid in list(COUNTRIES_DB)) + b"]}",
+        version=DB_VERSION,
+    )
+
+def _figures_list_payload():
+    if isinstance(FIGURES_DB, SnapshotMap) and FIGURES_DB.pristine:
+        return FIGURES_DB.snapshot.payload("figures")
+    return response_cache.get(
+        "figures",
+        lambda: json.dumps(
+            {"figures": [{"id": f.id, "name": f.name} for f in FIGURES_DB.values()]},
+            ensure_ascii=False,
+            separators=(",", ":"),
+        ).encode("utf-8"),
+        version=DB_VERSION,
+    )
 
 @app.get("/api/countries")
-async def list_countries():
+async def list_countries(request: Request):
     """Get list of all countries with basic info"""
-    return {"countries": list(COUNTRIES_DB.values())}
+    return response_cache.respond(request, _countries_list_payload())
 
 @app.get("/api/countries/{country_id}", response_model=Country)
-async def get_country(country_id: str):
+async def get_country(country_id: str, request: Request):
     """Get detailed information about a specific country"""
     if country_id not in COUNTRIES_DB:
         raise HTTPException(status_code=404, detail="Country not found")
-    return COUNTRIES_DB[country_id]
+    return response_cache.respond(request, _country_payload(country_id))
 
 @app.get("/api/figures")
-async def list_figures():
+async def list_figures(request: Request):
     """Get list of all figures with id and name (for linking)"""
-    return {
-        "figures": [{"id": f.id, "name": f.name} for f in FIGURES_DB.values()]
-    }
+    return response_cache.respond(request, _figures_list_payload())
 
 @app.get("/api/figures/{figure_id}", response_model=HistoricalFigure)
-async def get_figure(figure_id: str):
+async def get_figure(figure_id: str, request: Request):
     """Get information about a historical/political figure"""
     if figure_id not in FIGURES_DB:
         raise HTTPException(status_code=404, detail="Figure not found")
-    return FIGURES_DB[figure_id]
+    return response_cache.respond(request, _figure_payload(figure_id))
 
-@app.post("/api/generate-country-info/{country_name}")
-async def generate_country_info(country_name: str):
+@app.get("/api/search")
+async def search(
+    q: str,
+    type: Optional[str] = None,
+    category: Optional[str] = None,
+    severity: Optional[str] = None,
+    country: Optional[str] = None,
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    page: int = 1,
+    page_size: int = 20,
+):
     """
-    Generate comprehensive political information for a country using AI.
-    This populates the database with AI-generated content.
+    Full-text search over events, countries and figures, ranked by BM25.
+    type is "event", "country" or "figure"; category, severity and the
+    date range (YYYY-MM-DD, inclusive) apply to events.
     """
-    
-    # Safety check - don't crash if generation fails
+    page = max(page, 1)
+    page_size = min(max(page_size, 1), 100)
+    total, results = search_index.search(
+        q,
+        doc_type=type,
+        category=category,
+        severity=severity,
+        country=country,
+        date_from=date_from,
+        date_to=date_to,
+        offset=(page - 1) * page_size,
+        limit=page_size,
+    )
+    return {"query": q, "total": total, "page": page, "page_size": page_size, "results": results}
+
+@app.get("/api/timeline")
+async def timeline(
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+    category: Optional[str] = None,
+    severity: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: int = 50,
+    order: str = "desc",
+):
+    """
+    Events from all countries in date order, cursor-paginated.
+    start/end are inclusive date prefixes (e.g. "2020" or "2022-06-30").
+    Pass next_cursor from the previous page to continue.
+    """
+    if order not in ("asc", "desc"):
+        raise HTTPException(status_code=400, detail="order must be 'asc' or 'desc'")
     try:
-        prompt = f"""
+        page, next_cursor = timeline_index.query(
+            start=start,
+            end=end,
+            category=category,
+            severity=severity,
+            cursor=cursor,
+            limit=min(max(limit, 1), 200),
+            newest_first=order == "desc",
+        )
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    
+    events = []
+    for (_, country_id, _), event in page:
+        events.append({
+            "id": event.id,
+            "title": event.title,
+            "date": event.date,
+            "category": event.category,
+            "severity": event.severity,
+            "description": event.description,
+            "country_id": country_id,
+            "country_name": timeline_index.country_name(country_id),
+        })
+    return {"events": events, "next_cursor": next_cursor}
+
+def _graph_types(type: Optional[str]) -> Optional[Set[str]]:
+    """Comma-separated node types of a graph query"""
+    if not type:
+        return None
+    types = {t.strip() for t in type.split(",") if t.strip()}
+    if not types <= set(NODE_TYPES):
+        raise HTTPException(status_code=400, detail=f"type must be among {', '.join(NODE_TYPES)}")
+    return types
+
+@app.get("/api/graph/neighbors")
+async def graph_neighbors(node: str, type: Optional[str] = None, limit: int = 100):
+    """
+    Countries, events and figures directly linked to a node, e.g.
+    node=event:<country_id>/<event_id>, country:<id> or figure:<id>.
+    unresolved lists the related names of the node that match nothing in the DB.
+    """
+    result = entity_graph.neighbors(node, types=_graph_types(type), limit=min(max(limit, 1), 500))
+    if result is None:
+        raise HTTPException(status_code=404, detail="Node not found")
+    return result
+
+@app.get("/api/graph/expand")
+async def graph_expand(node: str, hops: int = 2, type: Optional[str] = None, limit: int = 200):
+    """Nodes within hops (1-4) links of a node, nearest first, each with its distance"""
+    if not 1 <= hops <= 4:
+        raise HTTPException(status_code=400, detail="hops must be between 1 and 4")
+    result = entity_graph.expand(node, hops, types=_graph_types(type), limit=min(max(limit, 1), 1000))
+    if result is None:
+        raise HTTPException(status_code=404, detail="Node not found")
+    return result
+
+@app.get("/api/graph/path")
+async def graph_path(source: str, target: str, max_hops: int = 6):
+    """Shortest chain of links between two nodes; 404 when they are not connected within max_hops"""
+    max_hops = min(max(max_hops, 1), 12)
+    path = entity_graph.shortest_path(source, target, max_hops=max_hops)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Node not found")
+    if not path:
+        raise HTTPException(status_code=404, detail=f"No connection within {max_hops} hops")
+    return {"source": source, "target": target, "hops": len(path) - 1, "path": path}
+
+# Arrays of a generated country whose elements are validated (and pushed) while the answer streams in
+_COUNTRY_SECTIONS = {("current_events",): ("event", CountryEvent), ("historical_figures",): ("figure", HistoricalFigure)}
+
+def _publish_generation_progress(country_id: str, items: List[Tuple[str, BaseModel]]):
+    """Push events and figures of a country still being generated to its /ws subscribers"""
+    topic = f"country:{country_id}"
+    if manager.has_subscribers(topic):
+        for kind, item in items:
+            manager.publish(topic, {"type": "country.progress", "id": country_id, kind: item.model_dump(mode="json")})
+
+async def _generate_country(country_name: str) -> Country:
+    """Generate a country with Gemini and store it in the database.
+    The answer is parsed as it streams in: each event and figure is validated as soon as
+    it is complete (invalid ones are dropped) and pushed as a country.progress frame."""
+    prompt = f"""
 Generate comprehensive political information for {country_name} in the 21st century.
 
 Return ONLY valid JSON with this exact structure:
@@ -437,65 +1547,295 @@ Return ONLY valid JSON with this exact structure:
 Include 8-12 major events from 2000-2026 covering different categories.
 Include 5-8 key political figures from the 21st century.
 """
-        
-        raw_response = call_gemini(prompt, temperature=0.5)
-        json_str = clean_json_string(raw_response)
-        
-        country_data = json.loads(json_str)
-        country = Country(**country_data)
-        
-        # Store in database
-        COUNTRIES_DB[country.id] = country
-        
-        # Store figures separately
-        for figure in country.historical_figures:
-            FIGURES_DB[figure.id] = figure
-        
+    
+    parser = JsonStreamParser(watch=_COUNTRY_SECTIONS)
+    sections: Dict[str, List[BaseModel]] = {"current_events": [], "historical_figures": []}
+    unpublished: List[Tuple[str, BaseModel]] = []
+    parse_seconds = validate_seconds = 0.0
+    # Cached below only once the answer has parsed into a valid country
+    cache_key = _llm_cache_key(prompt, 0.5)
+    cached = await _cached_answer(cache_key)
+    fragments = stream_gemini(prompt, temperature=0.5, priority="generate") if cached is None else _replay(cached)
+    answer = []
+    async for text in fragments:
+        answer.append(text)
+        start = time.perf_counter()
+        completed = parser.feed(text)
+        parse_seconds += time.perf_counter() - start
+        for path, item in completed:
+            kind, model = _COUNTRY_SECTIONS[path]
+            start = time.perf_counter()
+            try:
+                validated = model.model_validate(item)
+            except ValidationError as e:
+                log.warning("❌ Dropping invalid generated %s", kind, extra={"country": country_name, "errors": e.error_count()})
+                continue
+            finally:
+                validate_seconds += time.perf_counter() - start
+            sections[path[0]].append(validated)
+            unpublished.append((kind, validated))
+        # The id comes first in the answer; until then progress is held back
+        if unpublished and isinstance(parser.fields.get("id"), str):
+            _publish_generation_progress(parser.fields["id"], unpublished)
+            unpublished = []
+    
+    start = time.perf_counter()
+    country_data = parser.finish()
+    record_stage("json_parse", parse_seconds + time.perf_counter() - start)
+    start = time.perf_counter()
+    # Events and figures are already validated models
+    country = Country.model_validate({**country_data, **sections})
+    record_stage("validate", validate_seconds + time.perf_counter() - start)
+    if cached is None:
+        await llm_cache.set(cache_key, "".join(answer))
+    
+    # Store in database (figures are stored separately too) and persist it
+    GENERATED_COUNTRY_IDS.add(country.id)
+    _store_country(country)
+    if SHARED_ROLE == "reader":
+        # Only the writer persists; it takes the country from the inbox and republishes
+        shared_inbox.append(country.model_dump_json())
+    else:
+        country_store.put(country.id, country.model_dump_json())
+    
+    _rebuild_entity_matcher()
+    
+    return country
+
+def _lasting_failure(error: BaseException) -> bool:
+    """Quota and load shedding answers clear on their own; they are not remembered as failures"""
+    return not (isinstance(error, HTTPException) and error.status_code in (429, 503))
+
+# Concurrent generations of the same country share one Gemini call
+country_generation = SingleFlight(
+    failure_ttl=float(os.getenv("COUNTRY_GENERATION_FAILURE_TTL", "30")), remember=_lasting_failure,
+)
+
+@app.post("/api/generate-country-info/{country_name}")
+async def generate_country_info(country_name: str):
+    """
+    Generate comprehensive political information for a country using AI.
+    This populates the database with AI-generated content.
+    Concurrent requests for the same country await a single generation.
+    """
+    key = " ".join(country_name.split()).casefold()
+    
+    # Safety check - don't crash if generation fails
+    try:
+        country = await country_generation.do(key, lambda: _generate_country(country_name))
         return {"status": "success", "country": country}
+    except RecentFailure as e:
+        raise HTTPException(
+            status_code=503,
+            detail=f"Generating data for {country_name} failed moments ago. Please try again later.",
+            headers={"Retry-After": str(int(e.retry_after) + 1)},
+        )
     except Exception as e:
-        print(f"❌ Failed to generate country info for {country_name}: {e}")
+        if isinstance(e, HTTPException) and e.status_code in (429, 503):
+            # Quota and load shedding answers keep their status and Retry-After
+            raise
+        log.error("❌ Failed to generate country info for %s: %s", country_name, e)
         # Don't crash - just return error without affecting existing data
         raise HTTPException(
             status_code=500, 
             detail=f"Could not generate data for {country_name}. Please try again later or check API key."
         )
 
-class ConnectionManager:
-    def __init__(self):
-        self.active_connections: List[WebSocket] = []
-
-    async def connect(self, websocket: WebSocket):
-        await websocket.accept()
-        self.active_connections.append(websocket)
-
-    def disconnect(self, websocket: WebSocket):
-        if websocket in self.active_connections:
-            self.active_connections.remove(websocket)
+# Per-connection send queues; slow clients are dropped from or disconnected per WS_SLOW_CONSUMER_POLICY
+manager = Broadcaster(
+    queue_size=int(os.getenv("WS_SEND_QUEUE_SIZE", "256")),
+    slow_policy=os.getenv("WS_SLOW_CONSUMER_POLICY", "drop"),
+)
 
-    async def broadcast(self, message: dict):
-        for connection in self.active_connections:
-            try:
-                await connection.send_json(message)
-            except Exception:
-                pass
+@app.get("/api/ws/stats")
+async def ws_stats():
+    """WebSocket fan-out counters: connections, queued frames, drops"""
+    return manager.stats()
 
-manager = ConnectionManager()
+async def _ws_chat(send, stream_id: str, request: ChatRequest):
+    """Stream one chat answer over the socket as chat.delta frames"""
+    parts = []
+    try:
+        cached = _semantic_answer(request)
+        if cached is not None:
+            parts.append(cached)
+            await send({"type": "chat.delta", "id": stream_id, "text": cached})
+        else:
+            async for text in stream_gemini(_build_chat_prompt(request), temperature=0.7, cache=True):
+                parts.append(text)
+                if not await send({"type": "chat.delta", "id": stream_id, "text": text}):
+                    # The connection closed: stop reading the upstream answer
+                    return
+            semantic_cache.store(request.message, request.context, "".join(parts), has_history=bool(request.history))
+        await send({
+            "type": "chat.done",
+            "id": stream_id,
+            "response": "".join(parts),
+            "timestamp": datetime.now().isoformat(),
+        })
+    except HTTPException as e:
+        await send({"type": "chat.error", "id": stream_id, "status": e.status_code, "detail": e.detail})
 
 @app.websocket("/ws")
 async def websocket_endpoint(websocket: WebSocket):
-    await manager.connect(websocket)
+    """
+    Keepalive socket that also streams chat answers and live data changes.
+    Send {"type": "chat", "id": ..., "message": ..., "context": ..., "history": [...]}
+    to receive chat.delta / chat.done / chat.error frames for that id, and
+    {"type": "chat.cancel", "id": ...} to abort.
+    Send {"type": "subscribe", "topics": ["country:<id>", "figure:<id>", "all"]} to
+    receive country.update / figure.update frames carrying only the changed fields
+    (and country.remove / figure.remove); {"type": "unsubscribe", "topics": [...]} stops them.
+    While a country is being generated its subscribers get a country.progress frame per
+    validated event or figure.
+    Anything else is answered with a pong.
+    """
+    connection = await manager.connect(websocket)
+    chat_tasks: Dict[str, asyncio.Task] = {}
+    # Frames go through the connection's queue; its writer task is the only sender
+    send = connection.send
+
     try:
         while True:
             data = await websocket.receive_text()
-            # Echo for keepalive
-            await websocket.send_json({"type": "pong"})
+            try:
+                message = json.loads(data)
+            except ValueError:
+                message = None
+            msg_type = message.get("type") if isinstance(message, dict) else None
+
+            if msg_type == "chat":
+                stream_id = str(message.get("id", len(chat_tasks)))
+                try:
+                    chat_request = ChatRequest(**{k: v for k, v in message.items() if k not in ("type", "id")})
+                except ValidationError as e:
+                    await send({"type": "chat.error", "id": stream_id, "status": 422, "detail": str(e)})
+                    continue
+                task = asyncio.create_task(_ws_chat(send, stream_id, chat_request))
+                chat_tasks[stream_id] = task
+                task.add_done_callback(lambda t, sid=stream_id: chat_tasks.pop(sid, None) if chat_tasks.get(sid) is t else None)
+            elif msg_type == "chat.cancel":
+                task = chat_tasks.pop(str(message.get("id")), None)
+                if task:
+                    task.cancel()
+            elif msg_type in ("subscribe", "unsubscribe"):
+                topics = message.get("topics")
+                topics = [topic for topic in topics if isinstance(topic, str)] if isinstance(topics, list) else []
+                if msg_type == "subscribe":
+                    topics = manager.subscribe(connection, topics)
+                else:
+                    for topic in topics:
+                        manager.unsubscribe(connection, topic)
+                await send({"type": f"{msg_type}d", "topics": topics})
+            else:
+                # Echo for keepalive
+                await send({"type": "pong"})
     except WebSocketDisconnect:
-        manager.disconnect(websocket)
+        pass
+    finally:
+        manager.disconnect(connection)
+        # Abort upstream Gemini calls nobody is listening to anymore
+        for task in chat_tasks.values():
+            task.cancel()
+
+# --- METRICS ---
+# Components that already count for their own stats endpoints are read at scrape time
+
+def _scheduler_samples():
+    stats = llm_scheduler.stats()
+    yield {"state": "running"}, stats["running"]
+    for priority, counters in stats["classes"].items():
+        yield {"state": "waiting", "priority": priority}, counters["waiting"]
+
+REGISTRY.collector(
+    "response_cache_requests", "counter", "Read responses served from the pre-serialized cache, built, or answered 304",
+    lambda: [({"result": key}, value) for key, value in response_cache.stats().items() if key in ("hits", "builds", "not_modified")],
+)
+REGISTRY.collector(
+    "semantic_cache_lookups", "counter", "Chat questions looked up in the semantic cache by result",
+    lambda: [({"result": "hit"}, semantic_cache.hits), ({"result": "miss"}, semantic_cache.lookups - semantic_cache.hits)],
+)
+REGISTRY.collector("semantic_cache_entries", "gauge", "Answers held by the semantic cache", lambda: [({}, len(semantic_cache))])
+REGISTRY.collector(
+    "analyze_batcher", "counter", "Texts submitted to the analyze-text micro-batcher, and Gemini calls made for them",
+    lambda: [({"kind": "texts"}, analyze_batcher.submitted), ({"kind": "batches"}, analyze_batcher.batches)],
+)
+REGISTRY.collector(
+    "entity_graph_size", "gauge", "Nodes, edges and unresolved related names of the entity graph",
+    lambda: [({"kind": kind}, value) for kind, value in entity_graph.stats().items()],
+)
+REGISTRY.collector("llm_scheduler_calls", "gauge", "Gemini calls holding or waiting for a scheduler slot", _scheduler_samples)
+REGISTRY.collector("quiz_pool_questions", "gauge", "Pre-generated quiz questions ready to serve", lambda: [({}, quiz_pool.stats()["depth"])])
+REGISTRY.collector(
+    "country_generations", "counter", "Country generations started, joined by a concurrent request, or refused after a recent failure",
+    lambda: [({"result": key}, value) for key, value in country_generation.stats().items()
+             if key in ("started", "coalesced", "rejected_recent_failure")],
+)
+REGISTRY.collector(
+    "country_generation_keys", "gauge", "Countries being generated, and countries remembered as recently failed",
+    lambda: [({"state": key}, value) for key, value in country_generation.stats().items() if key in ("in_flight", "recent_failures")],
+)
+REGISTRY.collector(
+    "country_store_writes", "counter", "Generated countries appended to the country log, log compactions and failed writes",
+    lambda: [({"kind": key}, value) for key, value in country_store.stats().items() if key in ("writes", "compactions", "write_errors")],
+)
+REGISTRY.collector(
+    "country_store_size", "gauge", "Generated countries stored, entries in the log since its last compaction, and writes queued",
+    lambda: [({"kind": key}, value) for key, value in country_store.stats().items() if key in ("countries", "log_entries", "pending")],
+)
+REGISTRY.collector("ws_connections", "gauge", "Open WebSocket connections", lambda: [({}, len(manager.connections))])
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Prometheus text exposition of request, stage, LLM and cache metrics"""
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+@app.get("/api/debug/slow-requests")
+async def slow_requests():
+    """Stack samples of the latest requests slower than SLOW_REQUEST_MS (needs SLOW_REQUEST_PROFILING=1)"""
+    if slow_profiler is None:
+        raise HTTPException(status_code=404, detail="Slow request profiling is disabled")
+    return slow_profiler.stats()
 
 # Load initial data when app starts
 @app.on_event("startup")
 async def startup_event():
-    load_initial_data()
+    global SHARED_ROLE
+    if SHARED_SNAPSHOT_PATH and not SHARED_MODE_AVAILABLE:
+        log.warning("⚠️ SHARED_SNAPSHOT_PATH is set but file locks are not available here; "
+                    "this worker loads and indexes its own data")
+    elif SHARED_SNAPSHOT_PATH:
+        SHARED_ROLE = "writer" if shared_lock.try_acquire() else "reader"
+        log.info("👥 Shared snapshot mode: this worker is the %s", SHARED_ROLE)
+    
+    if SHARED_ROLE == "reader":
+        await _start_shared_reader()
+    else:
+        load_initial_data()
+        country_store.start()
+        data_watcher.start()
+        if SHARED_ROLE == "writer":
+            await shared_publisher.publish()
+            shared_publisher.start()
+            inbox_watcher.start()
+            await _drain_shared_inbox()
+    if GEMINI_API_KEY:
+        quiz_pool.start()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    await quiz_pool.stop()
+    await data_watcher.stop()
+    await shared_follower.stop()
+    await inbox_watcher.stop()
+    await shared_publisher.stop()
+    await gemini.close()
+    llm_cache.close()
+    if slow_profiler is not None:
+        slow_profiler.stop()
+    # Waits for queued generated countries to reach the disk
+    await asyncio.to_thread(country_store.close)
+    shared_lock.release()
 
 if __name__ == "__main__":
     import uvicorn
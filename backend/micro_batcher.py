@@ -0,0 +1,95 @@
+"""
+Micro-batching of concurrent calls.
+
+Items submitted within a short window are handed to one run_batch call,
+which returns one result per item, in order. A batch is sent early when it
+reaches max_items, or when the next item would push its total weight (e.g.
+characters of prompt text) past max_weight. If run_batch fails, every
+caller in that batch gets the exception.
+"""
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+
+class MicroBatcher:
+    def __init__(
+        self,
+        run_batch: Callable[[List[Any]], Awaitable[List[Any]]],
+        window: float = 0.01,
+        max_items: int = 16,
+        max_weight: Optional[float] = None,
+        weight: Callable[[Any], float] = len,
+    ):
+        self._run_batch = run_batch
+        self.window = window
+        self.max_items = max(1, max_items)
+        self.max_weight = max_weight
+        self._weight_of = weight
+        self._pending: List[Tuple[Any, asyncio.Future]] = []
+        self._pending_weight = 0.0
+        self._timer: Optional[asyncio.TimerHandle] = None
+        # Running batches, referenced so they are not garbage collected
+        self._running: Set[asyncio.Task] = set()
+        self.submitted = 0
+        self.batches = 0
+        self.largest_batch = 0
+        self.failed_batches = 0
+
+    async def submit(self, item: Any) -> Any:
+        """Queue item for the next batch and wait for its result"""
+        weight = self._weight_of(item)
+        if self._pending and self.max_weight is not None and self._pending_weight + weight > self.max_weight:
+            self._flush()
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((item, future))
+        self._pending_weight += weight
+        self.submitted += 1
+        if len(self._pending) >= self.max_items:
+            self._flush()
+        elif self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(self.window, self._flush)
+        return await future
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending, self._pending_weight = self._pending, [], 0.0
+        if not batch:
+            return
+        self.batches += 1
+        self.largest_batch = max(self.largest_batch, len(batch))
+        task = asyncio.create_task(self._run(batch))
+        self._running.add(task)
+        task.add_done_callback(self._running.discard)
+
+    async def _run(self, batch: List[Tuple[Any, asyncio.Future]]):
+        try:
+            results = await self._run_batch([item for item, _ in batch])
+            if len(results) != len(batch):
+                raise RuntimeError(f"batch of {len(batch)} items returned {len(results)} results")
+            for (_, future), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
+        except Exception as e:
+            self.failed_batches += 1
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+        finally:
+            # Cancelled along with the server: nobody is left to answer
+            for _, future in batch:
+                if not future.done():
+                    future.cancel()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "submitted": self.submitted,
+            "batches": self.batches,
+            "avg_batch_size": round(self.submitted / self.batches, 2) if self.batches else 0.0,
+            "largest_batch": self.largest_batch,
+            "failed_batches": self.failed_batches,
+            "pending": len(self._pending),
+            "window_ms": self.window * 1000,
+            "max_items": self.max_items,
+        }
@@ -0,0 +1,60 @@
+"""
+Models of the political data: countries with their current events and
+historical figures, as stored in political_data.json.
+
+Kept out of main so tools such as ingest_events.py can validate data
+without setting up the app (logging, Gemini client, caches, scheduler).
+"""
+import os
+from typing import List, Optional
+
+from pydantic import BaseModel
+
+
+def political_data_file() -> str:
+    """Path of political_data.json; POLITICAL_DATA_PATH is read on each call, so a .env loaded first applies"""
+    return os.getenv("POLITICAL_DATA_PATH", os.path.join(os.path.dirname(__file__), "political_data.json"))
+
+
+class EventDevelopment(BaseModel):
+    date: str
+    title: str
+    description: str
+
+
+class CountryEvent(BaseModel):
+    id: str
+    title: str
+    date: str
+    category: str  # "foreign_policy", "domestic_policy", "economy", etc.
+    description: str
+    severity: str  # "low", "medium", "high"
+    related_countries: List[str] = []
+    related_figures: List[str] = []
+    impact: Optional[str] = None
+    background: Optional[str] = None
+    full_history: Optional[str] = None  # Detailed narrative / full story
+    developments: Optional[List[EventDevelopment]] = None
+
+
+class HistoricalFigure(BaseModel):
+    id: str
+    name: str
+    role: str
+    birth_year: Optional[int]
+    death_year: Optional[int]
+    biography: str
+    achievements: List[str]
+    related_countries: List[str]
+
+
+class Country(BaseModel):
+    id: str
+    name: str
+    code: str  # ISO 3166-1 alpha-3
+    capital: str
+    population: int
+    gdp: Optional[float]
+    government_type: str
+    current_events: List[CountryEvent]
+    historical_figures: List[HistoricalFigure]
@@ -0,0 +1,139 @@
+"""
+Pool of pre-generated quiz questions.
+
+A background task asks Gemini for several questions per call and keeps a
+bounded pool topped up, dropping near-duplicates by hashing a normalized
+form of the question text. The quiz endpoint pops from the pool in O(1) and
+only falls back to a live Gemini call when the pool is empty.
+"""
+import asyncio
+import hashlib
+import logging
+import re
+from collections import OrderedDict, deque
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional
+
+log = logging.getLogger(__name__)
+
+_WORD_RE = re.compile(r"[a-z0-9]+")
+_FILLER = frozenset("a an the of in on to for which what who is was did does by and or".split())
+
+# Fingerprints of this many recent questions are remembered for dedupe
+SEEN_HISTORY = 1000
+
+
+def question_fingerprint(question: str) -> str:
+    """Hash of the question's significant words, ignoring case, punctuation and order"""
+    words = sorted(set(_WORD_RE.findall(question.lower())) - _FILLER)
+    return hashlib.sha1(" ".join(words).encode("utf-8")).hexdigest()
+
+
+class QuizPool:
+    def __init__(
+        self,
+        generate: Callable[[int], Awaitable[List[Any]]],
+        size: int = 10,
+        batch_size: int = 5,
+        refill_interval: float = 120.0,
+    ):
+        self._generate = generate
+        self.size = size
+        self.batch_size = batch_size
+        self.refill_interval = refill_interval
+        self._questions: Deque[Any] = deque()
+        self._seen: "OrderedDict[str, None]" = OrderedDict()
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self.hits = 0
+        self.misses = 0
+        self.generated = 0
+        self.duplicates = 0
+        self.refills = 0
+        self.refill_errors = 0
+
+    def __len__(self) -> int:
+        return len(self._questions)
+
+    def add(self, questions: List[Any]) -> int:
+        """Add validated questions, skipping near-duplicates; returns how many were kept"""
+        added = 0
+        for question in questions:
+            self.generated += 1
+            if len(self._questions) >= self.size:
+                continue
+            fingerprint = question_fingerprint(question.question)
+            if fingerprint in self._seen:
+                self.duplicates += 1
+                continue
+            self._remember(fingerprint)
+            self._questions.append(question)
+            added += 1
+        return added
+
+    def mark_served(self, question: Any):
+        """Remember a question served without going through the pool (a live Gemini call),
+        so the pool does not serve a near-duplicate of it later"""
+        self._remember(question_fingerprint(question.question))
+
+    def _remember(self, fingerprint: str):
+        self._seen[fingerprint] = None
+        self._seen.move_to_end(fingerprint)
+        if len(self._seen) > SEEN_HISTORY:
+            self._seen.popitem(last=False)
+
+    def take(self) -> Optional[Any]:
+        """Pop a ready question, or None when the pool is empty"""
+        self._wakeup.set()
+        if self._questions:
+            self.hits += 1
+            return self._questions.popleft()
+        self.misses += 1
+        return None
+
+    async def _run(self):
+        while True:
+            if len(self._questions) >= self.size:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+            try:
+                count = min(self.batch_size, self.size - len(self._questions))
+                self.add(await self._generate(count))
+                self.refills += 1
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.refill_errors += 1
+                log.error("❌ Quiz pool refill failed: %s", e)
+            # Bounds the refill rate, and thus the quota the pool can use
+            await asyncio.sleep(self.refill_interval)
+
+    def start(self):
+        if self.size > 0 and self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> Dict[str, Any]:
+        served = self.hits + self.misses
+        return {
+            "depth": len(self._questions),
+            "capacity": self.size,
+            "batch_size": self.batch_size,
+            "refill_interval_seconds": self.refill_interval,
+            "running": self._task is not None and not self._task.done(),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / served, 4) if served else 0.0,
+            "generated": self.generated,
+            "duplicates_dropped": self.duplicates,
+            "refills": self.refills,
+            "refill_errors": self.refill_errors,
+        }
@@ -0,0 +1,114 @@
+"""
+Pre-serialized responses for the read endpoints.
+
+Each payload is stored as ready-made JSON bytes together with gzip (and,
+when the optional brotli package is installed, br) variants and an ETag, so
+a hit is a memory copy instead of pydantic validation plus JSON encoding.
+"""
+import gzip
+import hashlib
+from typing import Callable, Dict, NamedTuple, Optional
+
+from fastapi import Request, Response
+
+try:
+    import brotli
+except ImportError:  # br responses are simply not offered
+    brotli = None
+
+# Small bodies are not worth compressing
+MIN_COMPRESS_SIZE = 512
+
+
+class CachedPayload(NamedTuple):
+    body: bytes
+    gzip: Optional[bytes]
+    br: Optional[bytes]
+    etag: str
+    version: Optional[int]
+
+
+def encode_payload(body: bytes, version: Optional[int] = None) -> CachedPayload:
+    """body with its compressed variants and ETag"""
+    compress = len(body) >= MIN_COMPRESS_SIZE
+    return CachedPayload(
+        body=body,
+        gzip=gzip.compress(body, compresslevel=6) if compress else None,
+        br=brotli.compress(body) if compress and brotli is not None else None,
+        etag='W/"%s"' % hashlib.blake2b(body, digest_size=12).hexdigest(),
+        version=version,
+    )
+
+
+def _accepted_encodings(header: str) -> set:
+    accepted = set()
+    for item in header.split(","):
+        name, _, params = item.strip().partition(";")
+        if params.strip().replace(" ", "") in ("q=0", "q=0.0", "q=0.00", "q=0.000"):
+            continue
+        if name:
+            accepted.add(name.strip().lower())
+    return accepted
+
+
+class ResponseCache:
+    def __init__(self):
+        self._entries: Dict[str, CachedPayload] = {}
+        self.hits = 0
+        self.builds = 0
+        self.not_modified = 0
+
+    def get(self, key: str, build: Callable[[], bytes], version: Optional[int] = None) -> CachedPayload:
+        """Return the cached payload for key, building it if missing.
+        Entries stored with a version are rebuilt once the version moves on;
+        entries without one live until invalidate() drops them."""
+        entry = self._entries.get(key)
+        if entry is not None and entry.version == version:
+            self.hits += 1
+            return entry
+
+        entry = encode_payload(build(), version)
+        self._entries[key] = entry
+        self.builds += 1
+        return entry
+
+    def peek(self, key: str) -> Optional[CachedPayload]:
+        return self._entries.get(key)
+
+    def invalidate(self, *keys: str):
+        for key in keys:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        self._entries.clear()
+
+    def respond(self, request: Request, payload: CachedPayload) -> Response:
+        """Answer with 304, or with the best encoding the client accepts"""
+        headers = {"ETag": payload.etag, "Vary": "Accept-Encoding", "Cache-Control": "no-cache"}
+
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match:
+            tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+            if "*" in tags or payload.etag.removeprefix("W/") in tags:
+                self.not_modified += 1
+                return Response(status_code=304, headers=headers)
+
+        accepted = _accepted_encodings(request.headers.get("accept-encoding", ""))
+        body = payload.body
+        if payload.br is not None and "br" in accepted:
+            body = payload.br
+            headers["Content-Encoding"] = "br"
+        elif payload.gzip is not None and "gzip" in accepted:
+            body = payload.gzip
+            headers["Content-Encoding"] = "gzip"
+
+        return Response(content=body, media_type="application/json", headers=headers)
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "builds": self.builds,
+            "not_modified": self.not_modified,
+            "brotli": brotli is not None,
+        }
@@ -0,0 +1,364 @@
+"""
+In-memory full-text search over events, countries and figures.
+
+An inverted index with BM25 ranking. Documents are added and removed one
+country at a time, so the index follows COUNTRIES_DB/FIGURES_DB writes
+without ever being rebuilt from scratch. Scoring and filtering are
+vectorized with NumPy so long posting lists stay cheap.
+"""
+import json
+import re
+from itertools import chain
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from shared_snapshot import PackedRows, pack_rows
+
+TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+STOPWORDS = frozenset(
+    "a an and are as at be by for from has have in is it its of on or that the "
+    "this to was were will with".split()
+)
+
+# Field weights: a hit in a title counts as much as three hits in a body
+EVENT_FIELDS = (("title", 3), ("description", 2), ("impact", 1), ("background", 1), ("full_history", 1))
+FIGURE_FIELDS = (("name", 3), ("role", 2), ("biography", 1))
+COUNTRY_FIELDS = (("name", 3), ("capital", 2), ("government_type", 1))
+
+DOC_TYPES = ("country", "event", "figure")
+SNIPPET_CHARS = 200
+
+# Deleted documents stay in the posting lists until they make up this share
+COMPACT_RATIO = 0.25
+
+# Per-document arrays, exported as they are
+DOC_ARRAYS = ("_alive", "_length", "_type", "_category", "_severity", "_country", "_date")
+
+
+def tokenize(text: str) -> List[str]:
+    return [t for t in TOKEN_RE.findall(text.lower()) if t not in STOPWORDS]
+
+
+def _date_number(date: Optional[str]) -> int:
+    """'2021-05-10' -> 20210510, 0 when unknown"""
+    digits = (date or "").replace("-", "")[:8]
+    return int(digits.ljust(8, "0")) if digits.isdigit() else 0
+
+
+class SearchIndex:
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        # term -> (doc ids, term frequencies); appended on add, cached as arrays for queries
+        self._postings: Dict[str, Tuple[List[int], List[float]]] = {}
+        self._arrays: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+        self._doc_ids: Dict[str, int] = {}  # "event:<country>:<id>" -> internal id
+        self._doc_meta: List[Optional[Dict[str, Any]]] = []
+        self._country_docs: Dict[str, List[str]] = {}
+        # Figure key -> {country id: (fields, meta)} of every country listing the figure;
+        # the doc stays while one of them is indexed
+        self._figure_owners: Dict[str, Dict[str, Tuple[List[Tuple[Optional[str], float]], Dict[str, Any]]]] = {}
+        self._codes: Dict[str, Dict[str, int]] = {"category": {}, "severity": {}, "country": {}}
+        # Doc -> (meta, its JSON) from the last export; metas are replaced, never changed
+        self._exported_meta: Dict[int, Tuple[Dict[str, Any], bytes]] = {}
+        self._capacity = 0
+        self._alive = np.zeros(0, dtype=bool)
+        self._length = np.zeros(0, dtype=np.float32)
+        self._type = np.zeros(0, dtype=np.int8)
+        self._category = np.zeros(0, dtype=np.int32)
+        self._severity = np.zeros(0, dtype=np.int32)
+        self._country = np.zeros(0, dtype=np.int32)
+        self._date = np.zeros(0, dtype=np.int32)
+        self._live = 0
+        self._total_len = 0.0
+        self.read_only = False
+
+    def __len__(self) -> int:
+        return self._live
+
+    def _code(self, kind: str, value: Optional[str], create: bool = True) -> int:
+        if value is None:
+            return -1
+        codes = self._codes[kind]
+        if value not in codes:
+            if not create:
+                return -2  # matches nothing
+            codes[value] = len(codes)
+        return codes[value]
+
+    def _grow(self, size: int):
+        if size <= self._capacity:
+            return
+        capacity = max(1024, self._capacity * 2, size)
+        for name in DOC_ARRAYS:
+            old = getattr(self, name)
+            new = np.zeros(capacity, dtype=old.dtype)
+            new[: len(old)] = old
+            setattr(self, name, new)
+        self._capacity = capacity
+
+    # --- writes ---
+
+    def add(self, key: str, fields: Iterable[Tuple[Optional[str], float]], meta: Dict[str, Any]):
+        """Index one document; fields are (text, weight) pairs"""
+        self.remove(key)
+        terms: Dict[str, float] = {}
+        for text, weight in fields:
+            for token in tokenize(text or ""):
+                terms[token] = terms.get(token, 0.0) + weight
+
+        doc = len(self._doc_meta)
+        self._grow(doc + 1)
+        self._doc_ids[key] = doc
+        self._doc_meta.append(meta)
+        length = sum(terms.values())
+        self._alive[doc] = True
+        self._length[doc] = length
+        self._type[doc] = DOC_TYPES.index(meta["type"])
+        self._category[doc] = self._code("category", meta.get("category"))
+        self._severity[doc] = self._code("severity", meta.get("severity"))
+        self._country[doc] = self._code("country", meta.get("country_id"))
+        self._date[doc] = _date_number(meta.get("date"))
+        self._live += 1
+        self._total_len += length
+
+        for term, tf in terms.items():
+            docs, tfs = self._postings.setdefault(term, ([], []))
+            docs.append(doc)
+            tfs.append(tf)
+            self._arrays.pop(term, None)
+
+    def remove(self, key: str):
+        doc = self._doc_ids.pop(key, None)
+        if doc is None:
+            return
+        self._alive[doc] = False
+        self._doc_meta[doc] = None
+        self._live -= 1
+        self._total_len -= float(self._length[doc])
+        if len(self._doc_meta) - self._live > COMPACT_RATIO * len(self._doc_meta) + 1024:
+            self._compact()
+
+    def _compact(self):
+        """Drop deleted documents and renumber the survivors densely"""
+        n = len(self._doc_meta)
+        survivors = np.flatnonzero(self._alive[:n])
+        remap = np.full(n, -1, dtype=np.int64)
+        remap[survivors] = np.arange(len(survivors))
+
+        for name in DOC_ARRAYS:
+            setattr(self, name, getattr(self, name)[survivors].copy())
+        self._capacity = len(survivors)
+        self._doc_meta = [self._doc_meta[doc] for doc in survivors]
+        self._doc_ids = {key: int(remap[doc]) for key, doc in self._doc_ids.items()}
+
+        for term in list(self._postings):
+            docs = np.array(self._postings[term][0], dtype=np.int64)
+            keep = remap[docs] >= 0
+            if keep.any():
+                tfs = np.array(self._postings[term][1], dtype=np.float32)
+                self._postings[term] = (remap[docs[keep]].tolist(), tfs[keep].tolist())
+            else:
+                del self._postings[term]
+        self._arrays.clear()
+
+    def _check_writable(self):
+        if self.read_only:
+            raise RuntimeError("this search index was loaded from a shared snapshot and is read-only")
+
+    def index_country(self, country):
+        """(Re)index a country, its events and its figures"""
+        self._check_writable()
+        self.remove_country(country.id)
+        keys = []
+
+        key = f"country:{country.id}"
+        self.add(
+            key,
+            [(getattr(country, name), weight) for name, weight in COUNTRY_FIELDS],
+            {"type": "country", "id": country.id, "country_id": country.id, "title": country.name,
+             "snippet": f"{country.government_type}, capital {country.capital}"},
+        )
+        keys.append(key)
+
+        for event in country.current_events:
+            key = f"event:{country.id}:{event.id}"
+            self.add(
+                key,
+                [(getattr(event, name), weight) for name, weight in EVENT_FIELDS],
+                {"type": "event", "id": event.id, "country_id": country.id, "title": event.title,
+                 "snippet": event.description[:SNIPPET_CHARS], "date": event.date,
+                 "category": event.category, "severity": event.severity},
+            )
+            keys.append(key)
+
+        for figure in country.historical_figures:
+            # Figures are keyed globally: the same person may appear under several countries,
+            # and the country indexed last provides the doc
+            key = f"figure:{figure.id}"
+            fields = [(getattr(figure, name), weight) for name, weight in FIGURE_FIELDS]
+            fields += [(achievement, 1) for achievement in figure.achievements]
+            meta = {"type": "figure", "id": figure.id, "country_id": country.id, "title": figure.name,
+                    "snippet": figure.biography[:SNIPPET_CHARS]}
+            self._figure_owners.setdefault(key, {})[country.id] = (fields, meta)
+            self.add(key, fields, meta)
+            keys.append(key)
+
+        self._country_docs[country.id] = keys
+
+    def remove_country(self, country_id: str):
+        """Drop a country, its events and its figures"""
+        self._check_writable()
+        for key in self._country_docs.pop(country_id, []):
+            owners = self._figure_owners.get(key)
+            if owners is not None:
+                owners.pop(country_id, None)
+                if owners:
+                    # Still listed by another country: fall back to its version if this one was indexed
+                    doc = self._doc_ids.get(key)
+                    if doc is None or self._doc_meta[doc]["country_id"] == country_id:
+                        self.add(key, *next(reversed(owners.values())))
+                    continue
+                del self._figure_owners[key]
+            self.remove(key)
+
+    # --- sharing between processes ---
+
+    def export(self) -> Dict[str, bytes]:
+        """The whole index as flat sections for a shared snapshot; see load()"""
+        n = len(self._doc_meta)
+        terms = list(self._postings)
+        lengths = [len(self._postings[term][0]) for term in terms]
+        offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+        total = int(offsets[-1])
+        docs = np.fromiter(chain.from_iterable(self._postings[t][0] for t in terms), dtype=np.int32, count=total)
+        tfs = np.fromiter(chain.from_iterable(self._postings[t][1] for t in terms), dtype=np.float32, count=total)
+        previous, exported = self._exported_meta, {}
+
+        def meta_row(doc: int, meta: Optional[Dict[str, Any]]) -> bytes:
+            if meta is None:
+                return b"null"
+            entry = previous.get(doc)
+            if entry is None or entry[0] is not meta:
+                entry = meta, json.dumps(meta, ensure_ascii=False).encode("utf-8")
+            exported[doc] = entry
+            return entry[1]
+
+        rows, row_offsets = pack_rows(meta_row(doc, meta) for doc, meta in enumerate(self._doc_meta[:n]))
+        self._exported_meta = exported
+        header = {"k1": self.k1, "b": self.b, "live": self._live, "total_len": self._total_len,
+                  "codes": self._codes, "terms": terms}
+        sections = {name[1:]: getattr(self, name)[:n].tobytes() for name in DOC_ARRAYS}
+        sections.update({
+            "header": json.dumps(header, ensure_ascii=False).encode("utf-8"),
+            "posting_offsets": offsets.tobytes(),
+            "posting_docs": docs.tobytes(),
+            "posting_tfs": tfs.tobytes(),
+            "rows": rows,
+            "row_offsets": row_offsets,
+        })
+        return sections
+
+    @classmethod
+    def load(cls, sections: Dict[str, memoryview]) -> "SearchIndex":
+        """Read-only index over sections from export(), searching them in place without copying"""
+        header = json.loads(bytes(sections["header"]))
+        index = cls(header["k1"], header["b"])
+        for name in DOC_ARRAYS:
+            setattr(index, name, np.frombuffer(sections[name[1:]], dtype=getattr(index, name).dtype))
+        offsets = np.frombuffer(sections["posting_offsets"], dtype=np.int64)
+        docs = np.frombuffer(sections["posting_docs"], dtype=np.int32)
+        tfs = np.frombuffer(sections["posting_tfs"], dtype=np.float32)
+        index._arrays = {
+            term: (docs[offsets[i]:offsets[i + 1]], tfs[offsets[i]:offsets[i + 1]])
+            for i, term in enumerate(header["terms"])
+        }
+        index._doc_meta = PackedRows(sections["rows"], sections["row_offsets"], json.loads)
+        index._codes = header["codes"]
+        index._capacity = len(index._doc_meta)
+        index._live = header["live"]
+        index._total_len = header["total_len"]
+        index.read_only = True
+        return index
+
+    # --- reads ---
+
+    def _posting_arrays(self, term: str) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+        arrays = self._arrays.get(term)
+        if arrays is None:
+            posting = self._postings.get(term)
+            if posting is None:
+                return None
+            arrays = (np.array(posting[0], dtype=np.int64), np.array(posting[1], dtype=np.float32))
+            self._arrays[term] = arrays
+        return arrays
+
+    def _filter_mask(self, n: int, doc_type, category, severity, country, date_from, date_to) -> np.ndarray:
+        mask = self._alive[:n].copy()
+        if doc_type:
+            mask &= self._type[:n] == (DOC_TYPES.index(doc_type) if doc_type in DOC_TYPES else -1)
+        if category:
+            mask &= self._category[:n] == self._code("category", category, create=False)
+        if severity:
+            mask &= self._severity[:n] == self._code("severity", severity, create=False)
+        if country:
+            mask &= self._country[:n] == self._code("country", country, create=False)
+        if date_from:
+            mask &= self._date[:n] >= _date_number(date_from)
+        if date_to:
+            mask &= (self._date[:n] > 0) & (self._date[:n] <= _date_number(date_to))
+        return mask
+
+    def search(
+        self,
+        query: str,
+        doc_type: Optional[str] = None,
+        category: Optional[str] = None,
+        severity: Optional[str] = None,
+        country: Optional[str] = None,
+        date_from: Optional[str] = None,
+        date_to: Optional[str] = None,
+        offset: int = 0,
+        limit: int = 20,
+    ) -> Tuple[int, List[Dict[str, Any]]]:
+        """Return (total matches, one page of results ranked by BM25)"""
+        terms = set(tokenize(query))
+        n = len(self._doc_meta)
+        if not terms or not self._live:
+            return 0, []
+
+        # Event-only filters imply event results
+        if doc_type is None and (category or severity or date_from or date_to):
+            doc_type = "event"
+
+        mask = self._filter_mask(n, doc_type, category, severity, country, date_from, date_to)
+        k1, b = self.k1, self.b
+        avg_len = self._total_len / self._live
+        scores = np.zeros(n, dtype=np.float32)
+
+        for term in terms:
+            arrays = self._posting_arrays(term)
+            if arrays is None:
+                continue
+            docs, tfs = arrays
+            df = int(np.count_nonzero(self._alive[docs]))
+            if not df:
+                continue
+            idf = np.log1p((self._live - df + 0.5) / (df + 0.5))
+            norm = k1 * (1 - b + b * self._length[docs] / avg_len)
+            scores[docs] += idf * tfs * (k1 + 1) / (tfs + norm)
+
+        scores[~mask] = 0
+        matched = np.flatnonzero(scores)
+        total = len(matched)
+        if total == 0 or offset >= total:
+            return total, []
+
+        wanted = min(offset + limit, total)
+        if wanted < total:
+            matched = matched[np.argpartition(-scores[matched], wanted - 1)[:wanted]]
+        ranked = matched[np.argsort(-scores[matched], kind="stable")][offset:wanted]
+        return total, [{**self._doc_meta[doc], "score": round(float(scores[doc]), 4)} for doc in ranked]
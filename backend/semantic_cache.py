@@ -0,0 +1,292 @@
+"""
+Semantic answer cache for chat.
+
+Questions are embedded on the CPU as hashed feature vectors: word unigrams,
+word bigrams and character 4-grams of each word, with a signed hash, so
+"protest" still meets "protests" and word order matters a little. Filler
+("tell me about", "explain") is dropped and common acronyms are spelled out
+first, so "explain JCPOA" lands next to "what happened with the Iran nuclear
+deal". Vectors are L2-normalised rows of one preallocated NumPy matrix, and
+a lookup is a single matrix product against every cached question.
+
+A cached answer is only reused for the same context (country/event/figure
+being viewed), the same numbers and the same named entities in the same
+order, and only for questions that stand on their own: a follow-up such as
+"what did he do next?" depends on the conversation, not just on its words.
+Swapping one name for another ("Putin" for "Biden", or "Russia invade
+Ukraine" for the reverse) changes few n-grams but the whole answer. Capacity is bounded; the least recently used entry is evicted.
+"""
+import re
+import time
+import zlib
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from search_index import tokenize
+
+DIMENSIONS = 2048
+
+# Weights of the feature families; each family is spread over its features
+UNIGRAM_WEIGHT = 1.0
+BIGRAM_WEIGHT = 0.5
+CHARGRAM_WEIGHT = 0.5
+CHARGRAM = 4
+
+# Words that carry no meaning in a question to a political encyclopaedia
+FILLER = frozenset(
+    "what whats about tell me explain describe please can could you would give overview summary "
+    "know happened happen happening going on do does did going with there us".split()
+)
+
+# Words that point back into the conversation
+FOLLOW_UP = frozenset(
+    "he him his she her hers they them their theirs it its this that these those then "
+    "also else more again".split()
+)
+
+# Acronyms spelled out before embedding, so the long and short forms share features
+ALIASES = {
+    "jcpoa": "iran nuclear deal",
+    "un": "united nations",
+    "eu": "european union",
+    "nato": "north atlantic treaty organization",
+    "uk": "united kingdom",
+    "us": "united states",
+    "usa": "united states",
+    "ussr": "soviet union",
+    "prc": "china",
+    "dprk": "north korea",
+    "imf": "international monetary fund",
+    "wto": "world trade organization",
+    "brics": "brics brazil russia india china south africa",
+    "covid": "covid pandemic",
+    "ccp": "chinese communist party",
+    "idf": "israel defense forces",
+    "gop": "republican party",
+}
+
+_ALIAS_RE = re.compile(r"\b(" + "|".join(sorted(ALIASES, key=len, reverse=True)) + r")\b", re.IGNORECASE)
+
+
+# Acronyms that are also ordinary words; these are only expanded when written in capitals
+AMBIGUOUS = frozenset(("us", "un"))
+
+
+def _expand_aliases(text: str) -> str:
+    def expand(match) -> str:
+        word = match.group(1)
+        if word.lower() in AMBIGUOUS and not word.isupper():
+            return word
+        return ALIASES[word.lower()]
+    return _ALIAS_RE.sub(expand, text)
+
+
+def _stem(term: str) -> str:
+    """Plural and verb endings off, so "protests", "protested" and "protesting" meet"""
+    for suffix in ("ing", "ed", "es", "s"):
+        if term.endswith(suffix) and len(term) - len(suffix) >= 4 and not term.endswith("ss"):
+            return term[:-len(suffix)]
+    return term
+
+
+def question_terms(question: str) -> List[str]:
+    return [_stem(t) for t in tokenize(_expand_aliases(question)) if t not in FILLER]
+
+
+def _numbers(question: str) -> str:
+    """Years and other numbers must match exactly: the 2020 and 2024 elections are different questions"""
+    return ",".join(sorted(set(re.findall(r"\d+", question))))
+
+
+def _hash(feature: str) -> Tuple[int, float]:
+    h = zlib.crc32(feature.encode("utf-8"))
+    return h % DIMENSIONS, (1.0 if h & 0x80000000 else -1.0)
+
+
+def embed(question: str) -> np.ndarray:
+    """Unit-length hashed n-gram vector of a question (all zeros if it has no content words)"""
+    terms = question_terms(question)
+    vector = np.zeros(DIMENSIONS, dtype=np.float32)
+    families = (
+        (UNIGRAM_WEIGHT, terms),
+        (BIGRAM_WEIGHT, [f"{a} {b}" for a, b in zip(terms, terms[1:])]),
+        (CHARGRAM_WEIGHT, [f"#{g}" for t in terms for g in (
+            f"<{t}>"[i:i + CHARGRAM] for i in range(max(1, len(t) + 3 - CHARGRAM))
+        )]),
+    )
+    for weight, features in families:
+        if not features:
+            continue
+        share = weight / len(features) ** 0.5
+        for feature in features:
+            index, sign = _hash(feature)
+            vector[index] += sign * share
+    norm = float(np.linalg.norm(vector))
+    return vector / norm if norm else vector
+
+
+def context_key(context: Optional[Dict[str, Any]], question: str = "", entities: Sequence[str] = ()) -> str:
+    """The parts of a chat context that change an answer, normalised, plus the numbers in the
+    question and the entities it names (ids, in order of first mention)"""
+    parts = [
+        f"{key}={' '.join(str(context[key]).lower().split())}"
+        for key in ("country", "event", "figure") if context and context.get(key)
+    ]
+    numbers = _numbers(question)
+    if numbers:
+        parts.append(f"numbers={numbers}")
+    if entities:
+        parts.append(f"entities={','.join(dict.fromkeys(entities))}")
+    return "|".join(parts)
+
+
+def standalone(question: str, has_history: bool) -> bool:
+    """Whether the question means the same thing without the conversation before it"""
+    if not has_history:
+        return True
+    words = set(re.findall(r"\w+", question.lower()))
+    return not words & FOLLOW_UP and bool(question_terms(question))
+
+
+class SemanticCache:
+    def __init__(
+        self,
+        capacity: int = 1024,
+        threshold: float = 0.75,
+        ttl: float = 86400.0,
+        clock: Callable[[], float] = time.time,
+        entities: Optional[Callable[[str], Sequence[str]]] = None,
+    ):
+        self.capacity = max(1, capacity)
+        self.threshold = threshold
+        self.ttl = ttl
+        self._clock = clock
+        # Question -> ids of the entities it names, in order; without it only numbers are guarded
+        self._entities = entities
+        self._vectors = np.zeros((self.capacity, DIMENSIONS), dtype=np.float32)
+        # Per slot: hash of its context key (compared vectorized), expiry and LRU tick; -1 = free
+        self._context_hashes = np.zeros(self.capacity, dtype=np.int64)
+        self._expires = np.zeros(self.capacity, dtype=np.float64)
+        self._used = np.full(self.capacity, -1, dtype=np.int64)
+        self._entries: List[Optional[Tuple[str, str, str]]] = [None] * self.capacity  # (context, question, answer)
+        self._tick = 0
+        self.lookups = 0
+        self.hits = 0
+        self.stores = 0
+        self.evictions = 0
+        self.invalidated = 0
+        self.follow_ups = 0
+        self._hit_similarity = 0.0
+
+    def __len__(self) -> int:
+        return int(np.count_nonzero(self._used >= 0))
+
+    def _key(self, context: Optional[Dict[str, Any]], question: str) -> str:
+        return context_key(context, question, self._entities(question) if self._entities else ())
+
+    def _touch(self, slot: int):
+        self._tick += 1
+        self._used[slot] = self._tick
+
+    def _free(self, slots):
+        for slot in np.atleast_1d(slots):
+            self._entries[slot] = None
+        self._used[slots] = -1
+
+    def _expire(self):
+        expired = np.flatnonzero((self._used >= 0) & (self._expires <= self._clock()))
+        if expired.size:
+            self._free(expired)
+
+    def _best(self, vectors: np.ndarray, contexts: Sequence[str]) -> Tuple[np.ndarray, np.ndarray]:
+        """Most similar live slot with the same context for each row of vectors, and its similarity"""
+        hashes = np.array([hash(c) for c in contexts], dtype=np.int64)
+        similarity = vectors @ self._vectors.T  # (questions, capacity)
+        usable = (self._used >= 0)[None, :] & (self._context_hashes[None, :] == hashes[:, None])
+        similarity = np.where(usable, similarity, -np.inf)
+        slots = similarity.argmax(axis=1)
+        return slots, similarity[np.arange(len(slots)), slots]
+
+    def lookup_many(
+        self, questions: Sequence[str], contexts: Sequence[Optional[Dict[str, Any]]]
+    ) -> List[Optional[Tuple[str, float]]]:
+        """Cached (answer, similarity) for each question, or None, in one matrix product"""
+        self._expire()
+        keys = [self._key(c, q) for q, c in zip(questions, contexts)]
+        vectors = np.stack([embed(q) for q in questions]) if questions else np.zeros((0, DIMENSIONS), np.float32)
+        results: List[Optional[Tuple[str, float]]] = []
+        for key, slot, score in zip(keys, *self._best(vectors, keys)):
+            self.lookups += 1
+            entry = self._entries[slot]
+            if score < self.threshold or entry is None or entry[0] != key:
+                results.append(None)
+                continue
+            self.hits += 1
+            self._hit_similarity += float(score)
+            self._touch(slot)
+            results.append((entry[2], float(score)))
+        return results
+
+    def lookup(
+        self, question: str, context: Optional[Dict[str, Any]], has_history: bool = False
+    ) -> Optional[Tuple[str, float]]:
+        if not standalone(question, has_history):
+            self.follow_ups += 1
+            return None
+        return self.lookup_many([question], [context])[0]
+
+    def store(self, question: str, context: Optional[Dict[str, Any]], answer: str, has_history: bool = False):
+        if not answer or not standalone(question, has_history):
+            return
+        vector = embed(question)
+        if not vector.any():
+            return
+        key = self._key(context, question)
+        self._expire()
+        slots, scores = self._best(vector[None, :], [key])
+        if scores[0] >= self.threshold and self._entries[slots[0]] is not None:
+            slot = int(slots[0])  # a paraphrase is cached already: refresh it
+        else:
+            # Free slots have tick -1, so they are taken before anything is evicted
+            slot = int(self._used.argmin())
+            if self._used[slot] >= 0:
+                self.evictions += 1
+        self._vectors[slot] = vector
+        self._context_hashes[slot] = hash(key)
+        self._expires[slot] = self._clock() + self.ttl
+        self._entries[slot] = (key, question, answer)
+        self._touch(slot)
+        self.stores += 1
+
+    def invalidate_countries(self, names: Iterable[str]):
+        """Drop answers given while the user was viewing one of these countries, e.g. after their data changed"""
+        markers = {f"country={' '.join(name.lower().split())}" for name in names}
+        if not markers or not len(self):
+            return
+        stale = [
+            slot for slot, entry in enumerate(self._entries)
+            if entry is not None and not markers.isdisjoint(entry[0].split("|"))
+        ]
+        if stale:
+            self._free(np.array(stale))
+            self.invalidated += len(stale)
+
+    def clear(self):
+        self._free(np.arange(self.capacity))
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "entries": len(self),
+            "capacity": self.capacity,
+            "threshold": self.threshold,
+            "lookups": self.lookups,
+            "hits": self.hits,
+            "misses": self.lookups - self.hits,
+            "hit_rate": round(self.hits / self.lookups, 4) if self.lookups else 0.0,
+            "avg_hit_similarity": round(self._hit_similarity / self.hits, 4) if self.hits else None,
+            "stores": self.stores,
+            "evictions": self.evictions,
+            "invalidated": self.invalidated,
+            "follow_ups_skipped": self.follow_ups,
+        }
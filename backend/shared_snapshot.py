@@ -0,0 +1,404 @@
+"""
+Read-only data snapshot shared by several worker processes.
+
+With `uvicorn main:app --workers N` one worker wins an exclusive file lock
+and becomes the writer: it owns all writes and, after every change,
+publishes the ready-made response payloads (JSON, gzip, ETag per key) into
+a single snapshot file, replaced atomically. The other workers map that
+file read-only and serve the bytes straight from the mapping, so the data
+itself sits in the page cache once no matter how many workers there are.
+Models are decoded from the mapping on demand.
+
+The writer also publishes its search and timeline indexes as flat
+sections (NumPy arrays and packed rows) that readers wrap without copying,
+so no worker but the writer builds or holds indexes of its own.
+
+Readers send their own writes (AI-generated countries) to the writer
+through an append-only inbox file.
+
+File layout: header (magic, version, index length), JSON index of
+key -> [offset, length, gzip offset, gzip length, etag], then the blobs.
+Sections are stored as blobs without gzip or ETag, 8-byte aligned.
+"""
+import asyncio
+import json
+import logging
+import mmap
+import os
+import struct
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from response_cache import CachedPayload
+
+log = logging.getLogger(__name__)
+
+try:
+    import fcntl
+except ImportError:  # Windows: shared mode is not available
+    fcntl = None
+
+# Without file locks no worker can be elected writer; each one then runs on its own
+SHARED_MODE_AVAILABLE = fcntl is not None
+
+MAGIC = b"PNSNAP2\n"
+_HEADER = struct.Struct("<8sQQ")
+
+# Decoded models kept per process; everything else stays in the mapping
+DECODED_CACHE_SIZE = 32
+
+
+def read_version(path: str) -> Optional[int]:
+    """Version in the header of the snapshot at path, or None if there is none"""
+    try:
+        with open(path, "rb") as f:
+            magic, version, _ = _HEADER.unpack(f.read(_HEADER.size))
+    except (OSError, struct.error):
+        return None
+    return version if magic == MAGIC else None
+
+
+def _padding(offset: int) -> int:
+    return -offset % 8
+
+
+def write_snapshot_file(
+    path: str, version: int, payloads: Dict[str, CachedPayload], sections: Optional[Dict[str, bytes]] = None
+):
+    """Write all payloads and sections to a fresh file and atomically swap it in"""
+    sections = sections or {}
+    index = {}
+    offset = 0
+    for key, payload in payloads.items():
+        gzip_length = len(payload.gzip) if payload.gzip is not None else 0
+        index[key] = [offset, len(payload.body), offset + len(payload.body), gzip_length, payload.etag]
+        offset += len(payload.body) + gzip_length
+    for key, data in sections.items():
+        offset += _padding(offset)
+        index[key] = [offset, len(data), 0, 0, ""]
+        offset += len(data)
+    index_bytes = json.dumps(index, separators=(",", ":")).encode("utf-8")
+    # Trailing spaces are valid JSON and keep the blobs 8-byte aligned in the mapping
+    index_bytes += b" " * _padding(_HEADER.size + len(index_bytes))
+
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(_HEADER.pack(MAGIC, version, len(index_bytes)))
+        f.write(index_bytes)
+        offset = 0
+        for payload in payloads.values():
+            f.write(payload.body)
+            offset += len(payload.body)
+            if payload.gzip is not None:
+                f.write(payload.gzip)
+                offset += len(payload.gzip)
+        for data in sections.values():
+            f.write(b"\0" * _padding(offset))
+            offset += _padding(offset)
+            f.write(data)
+            offset += len(data)
+    os.replace(tmp_path, path)
+
+
+def pack_rows(rows: Iterable[bytes]) -> Tuple[bytes, bytes]:
+    """Concatenate rows into (data, int64 offsets) sections for PackedRows"""
+    rows = list(rows)
+    offsets = np.zeros(len(rows) + 1, dtype=np.int64)
+    np.cumsum([len(row) for row in rows], out=offsets[1:])
+    return b"".join(rows), offsets.tobytes()
+
+
+class PackedRows:
+    """Read-only sequence over pack_rows() sections, decoding a row only when it is accessed"""
+
+    def __init__(self, data: memoryview, offsets: memoryview, decode: Callable[[bytes], Any] = bytes):
+        self._data = data
+        self._offsets = np.frombuffer(offsets, dtype=np.int64)
+        self._decode = decode
+
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+
+    def __getitem__(self, i: int) -> Any:
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError(i)
+        return self._decode(bytes(self._data[self._offsets[i]:self._offsets[i + 1]]))
+
+
+class SharedSnapshot:
+    """One published snapshot, mapped read-only"""
+
+    def __init__(self, path: str):
+        with open(path, "rb") as f:
+            # The mapping keeps this version alive even after the writer replaces the file
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.version, index_length = _HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a data snapshot")
+        start = _HEADER.size + index_length
+        self._index = json.loads(self._map[_HEADER.size:start])
+        self._data = memoryview(self._map)[start:]
+        self.size = len(self._map)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._index
+
+    def keys(self, prefix: str) -> List[str]:
+        """Ids stored under prefix ("country:" / "figure:"), in publish order"""
+        return [key[len(prefix):] for key in self._index if key.startswith(prefix)]
+
+    def etag(self, key: str) -> Optional[str]:
+        entry = self._index.get(key)
+        return entry[4] if entry is not None else None
+
+    def sections(self, prefix: str) -> Dict[str, memoryview]:
+        """Zero-copy views of the sections stored under prefix, keyed without it"""
+        return {
+            key[len(prefix):]: self._data[entry[0]:entry[0] + entry[1]]
+            for key, entry in self._index.items() if key.startswith(prefix)
+        }
+
+    def payload(self, key: str) -> Optional[CachedPayload]:
+        """Zero-copy payload: body and gzip are views into the mapping"""
+        entry = self._index.get(key)
+        if entry is None:
+            return None
+        offset, length, gzip_offset, gzip_length, etag = entry
+        return CachedPayload(
+            body=self._data[offset:offset + length],
+            gzip=self._data[gzip_offset:gzip_offset + gzip_length] if gzip_length else None,
+            br=None,
+            etag=etag,
+            version=self.version,
+        )
+
+
+class SnapshotMap:
+    """
+    Dict-like id -> model view over one kind of entity in a SharedSnapshot.
+    Local writes land in an overlay until the writer's next snapshot has them.
+    """
+
+    def __init__(
+        self,
+        snapshot: SharedSnapshot,
+        prefix: str,
+        decode: Callable[[bytes], Any],
+        overlay: Optional[Dict[str, Any]] = None,
+        cache: Optional["OrderedDict[str, Any]"] = None,
+    ):
+        self.snapshot = snapshot
+        self.prefix = prefix
+        self._decode = decode
+        self.overlay: Dict[str, Any] = overlay or {}
+        self._hidden: set = set()
+        self._cache = cache if cache is not None else OrderedDict()
+
+    def __getitem__(self, key: str) -> Any:
+        if key in self.overlay:
+            return self.overlay[key]
+        if key in self._hidden:
+            raise KeyError(key)
+        value = self._cache.get(key)
+        if value is not None:
+            self._cache.move_to_end(key)
+            return value
+        value = self.decode(key)
+        self._cache[key] = value
+        if len(self._cache) > DECODED_CACHE_SIZE:
+            self._cache.popitem(last=False)
+        return value
+
+    def decode(self, key: str) -> Any:
+        """Decode key from the mapping without keeping it in the cache"""
+        if key in self.overlay:
+            return self.overlay[key]
+        payload = self.snapshot.payload(self.prefix + key)
+        if payload is None:
+            raise KeyError(key)
+        return self._decode(bytes(payload.body))
+
+    def get(self, key: str, default: Any = None) -> Any:
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def __contains__(self, key: object) -> bool:
+        return key in self.overlay or (key not in self._hidden and f"{self.prefix}{key}" in self.snapshot)
+
+    def __iter__(self) -> Iterator[str]:
+        for key in self.snapshot.keys(self.prefix):
+            if key not in self.overlay and key not in self._hidden:
+                yield key
+        yield from self.overlay
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
+
+    def keys(self) -> Iterable[str]:
+        return list(self)
+
+    def values(self) -> Iterator[Any]:
+        return (self[key] for key in self)
+
+    def items(self) -> Iterator:
+        return ((key, self[key]) for key in self)
+
+    def __setitem__(self, key: str, value: Any):
+        self._hidden.discard(key)
+        self.overlay[key] = value
+
+    def pop(self, key: str, default: Any = None) -> Any:
+        value = self.get(key, default)
+        self.overlay.pop(key, None)
+        self._hidden.add(key)
+        return value
+
+    def copy(self) -> "SnapshotMap":
+        """Copy-on-write: same mapping and decoded cache, own overlay"""
+        clone = SnapshotMap(self.snapshot, self.prefix, self._decode, dict(self.overlay), self._cache)
+        clone._hidden = set(self._hidden)
+        return clone
+
+    @property
+    def pristine(self) -> bool:
+        """True while the view is exactly the published snapshot"""
+        return not self.overlay and not self._hidden
+
+    def local_payload(self, key: str) -> Optional[CachedPayload]:
+        """Snapshot payload for key unless a local write has superseded it"""
+        if key in self.overlay or key in self._hidden:
+            return None
+        return self.snapshot.payload(self.prefix + key)
+
+    def rebased(self, snapshot: SharedSnapshot) -> "SnapshotMap":
+        """The same view on a newer snapshot; overlay entries it now contains are dropped"""
+        overlay = {key: value for key, value in self.overlay.items() if f"{self.prefix}{key}" not in snapshot}
+        return SnapshotMap(snapshot, self.prefix, self._decode, overlay)
+
+
+class SnapshotPublisher:
+    """Writer side: republishes the snapshot shortly after changes, at most once per interval"""
+
+    def __init__(
+        self,
+        path: str,
+        build: Callable[[], Awaitable[Tuple[Dict[str, CachedPayload], Dict[str, bytes]]]],
+        interval: float = 0.5,
+    ):
+        self.path = path
+        self._build = build
+        self.interval = interval
+        # Versions keep increasing across writer restarts
+        self.version = read_version(path) or 0
+        self._dirty = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self.publishes = 0
+        self.publish_errors = 0
+        self.last_size = 0
+
+    def mark_dirty(self):
+        self._dirty.set()
+
+    async def publish(self):
+        # build decides where the payloads are encoded; the file is written off the loop
+        payloads, sections = await self._build()
+        self.version += 1
+        await asyncio.to_thread(write_snapshot_file, self.path, self.version, payloads, sections)
+        self.publishes += 1
+        self.last_size = os.path.getsize(self.path)
+
+    async def _run(self):
+        while True:
+            await self._dirty.wait()
+            # Coalesce bursts of writes into one publish
+            await asyncio.sleep(self.interval)
+            self._dirty.clear()
+            try:
+                await self.publish()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.publish_errors += 1
+                log.error("❌ Publishing shared snapshot failed: %s", e)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "version": self.version,
+            "publishes": self.publishes,
+            "publish_errors": self.publish_errors,
+            "bytes": self.last_size,
+        }
+
+
+class WriterLock:
+    """Exclusive lock held by the writer process for its whole life"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = None
+
+    def try_acquire(self) -> bool:
+        if fcntl is None:
+            return False
+        f = open(self.path, "a+")
+        try:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            f.close()
+            return False
+        self._file = f
+        return True
+
+    @property
+    def held(self) -> bool:
+        return self._file is not None
+
+    def release(self):
+        if self._file is not None:
+            self._file.close()  # closing drops the flock
+            self._file = None
+
+
+class SharedInbox:
+    """Append-only file of JSON lines from readers, drained by the writer"""
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def append(self, line: str):
+        with open(self.path, "a", encoding="utf-8") as f:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            f.write(line + "\n")
+            f.flush()
+
+    def drain(self) -> List[str]:
+        """Take every line written so far and empty the inbox"""
+        if not os.path.exists(self.path):
+            return []
+        with open(self.path, "r+", encoding="utf-8") as f:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            lines = [line for line in f.read().splitlines() if line.strip()]
+            f.seek(0)
+            f.truncate()
+        return lines
@@ -0,0 +1,88 @@
+"""
+Per-key request coalescing.
+
+The first caller for a key starts the work; concurrent callers for the same
+key await that same result instead of starting their own. Failures are
+remembered for a short window so a burst of retries does not repeat an
+expensive call that has just failed; errors the caller marks as transient
+(e.g. load shedding) are not. Keys may come from clients, so remembered
+failures are pruned as they expire and capped in number.
+"""
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+
+class RecentFailure(Exception):
+    """Raised while a key is inside its negative-cache window"""
+
+    def __init__(self, retry_after: float, error: BaseException):
+        super().__init__(f"recent failure, retry in {retry_after:.0f}s: {error}")
+        self.retry_after = retry_after
+        self.error = error
+
+
+class SingleFlight:
+    def __init__(
+        self,
+        failure_ttl: float = 30.0,
+        max_failures: int = 1024,
+        remember: Optional[Callable[[BaseException], bool]] = None,
+    ):
+        self.failure_ttl = failure_ttl
+        self.max_failures = max(1, max_failures)
+        # Which errors are worth remembering; all of them by default
+        self._remember = remember
+        self._inflight: Dict[str, asyncio.Task] = {}
+        # Oldest first: with one TTL for all, also the order in which they expire
+        self._failures: "OrderedDict[str, Tuple[float, BaseException]]" = OrderedDict()
+        self.started = 0
+        self.coalesced = 0
+        self.rejected = 0
+
+    def _finished(self, key: str, task: asyncio.Task):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if task.cancelled():
+            return
+        error = task.exception()  # also marks the exception as retrieved
+        if error is None or self.failure_ttl <= 0 or (self._remember is not None and not self._remember(error)):
+            return
+        now = time.monotonic()
+        while self._failures and next(iter(self._failures.values()))[0] <= now:
+            self._failures.popitem(last=False)
+        self._failures.pop(key, None)
+        self._failures[key] = (now + self.failure_ttl, error)
+        if len(self._failures) > self.max_failures:
+            self._failures.popitem(last=False)
+
+    async def do(self, key: str, work: Callable[[], Awaitable[Any]]) -> Any:
+        failure = self._failures.get(key)
+        if failure is not None:
+            remaining = failure[0] - time.monotonic()
+            if remaining > 0:
+                self.rejected += 1
+                raise RecentFailure(remaining, failure[1])
+            del self._failures[key]
+
+        task = self._inflight.get(key)
+        if task is None:
+            # The work runs in its own task so it survives the first caller going away
+            task = asyncio.ensure_future(work())
+            task.add_done_callback(lambda t: self._finished(key, t))
+            self._inflight[key] = task
+            self.started += 1
+        else:
+            self.coalesced += 1
+        return await asyncio.shield(task)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "in_flight": len(self._inflight),
+            "started": self.started,
+            "coalesced": self.coalesced,
+            "rejected_recent_failure": self.rejected,
+            "recent_failures": len(self._failures),
+            "failure_ttl_seconds": self.failure_ttl,
+        }
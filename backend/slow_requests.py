@@ -0,0 +1,174 @@
+"""
+Sampling profiler for slow requests.
+
+A daemon thread wakes every interval. For each request that has been in
+flight for longer than the threshold it takes two samples:
+- "awaiting": the coroutine chain the request's task is suspended in, e.g.
+  waiting for a scheduler slot or for Gemini's answer;
+- "loop": the Python stack the event loop thread is executing at that
+  moment, if it is executing anything. Code there blocks every request.
+
+When such a request ends, its profile (the most frequent stacks with their
+sample counts, plus the request's stage timings) is handed to every hook
+and kept in a short history. Nothing is sampled while every request is fast.
+"""
+import asyncio
+import collections
+import logging
+import sys
+import threading
+import time
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+log = logging.getLogger(__name__)
+
+# Frames of a stack kept per sample, innermost last
+STACK_DEPTH = 12
+
+# Innermost frames of an event loop waiting for I/O; such samples mean the loop was idle.
+# uvloop's loop is compiled, so while it waits the asyncio runner is the innermost Python frame
+_IDLE_FILES = ("selectors.py", "runners.py")
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_filename.rsplit('/', 1)[-1]}:{code.co_name}:{frame.f_lineno}"
+
+
+def _thread_stack(frame) -> Optional[Tuple[str, ...]]:
+    """The loop thread's stack, or None when it is idle in the selector"""
+    if frame is None or frame.f_code.co_filename.endswith(_IDLE_FILES):
+        return None
+    labels = []
+    while frame is not None and len(labels) < STACK_DEPTH:
+        labels.append(_frame_label(frame))
+        frame = frame.f_back
+    return tuple(reversed(labels))
+
+
+def _await_stack(task: asyncio.Task) -> Tuple[str, ...]:
+    """Where the task is suspended: its coroutine chain down to the awaited object"""
+    labels = []
+    awaitable = task.get_coro()
+    while awaitable is not None and len(labels) < STACK_DEPTH * 2:
+        frame = getattr(awaitable, "cr_frame", None) or getattr(awaitable, "ag_frame", None) or getattr(awaitable, "gi_frame", None)
+        if frame is None:
+            labels.append(type(awaitable).__name__)
+            break
+        labels.append(_frame_label(frame))
+        awaitable = (
+            getattr(awaitable, "cr_await", None) or getattr(awaitable, "ag_await", None) or getattr(awaitable, "gi_yieldfrom", None)
+        )
+    return tuple(labels[-STACK_DEPTH:])
+
+
+class _InFlight:
+    __slots__ = ("method", "path", "start", "task", "samples")
+
+    def __init__(self, method: str, path: str, task: asyncio.Task):
+        self.method = method
+        self.path = path
+        self.start = time.perf_counter()
+        self.task = task
+        self.samples: collections.Counter = collections.Counter()
+
+
+class SlowRequestProfiler:
+    def __init__(self, threshold: float = 2.0, interval: float = 0.01, keep: int = 20, top: int = 5):
+        self.threshold = threshold
+        self.interval = interval
+        self.top = top
+        self.hooks: List[Callable[[Dict[str, Any]], None]] = [self._log_profile]
+        self.recent: Deque[Dict[str, Any]] = collections.deque(maxlen=keep)
+        self._inflight: Dict[int, _InFlight] = {}
+        self._next_key = 0
+        self._loop_thread: Optional[int] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self.profiled = 0
+        self.samples_taken = 0
+
+    def begin(self, scope) -> Optional[int]:
+        task = asyncio.current_task()
+        if task is None:
+            return None
+        if self._thread is None:
+            self._start()
+        self._next_key += 1
+        self._inflight[self._next_key] = _InFlight(scope["method"], scope["path"], task)
+        return self._next_key
+
+    def end(self, key: int, status: int, duration: float, stages: Dict[str, float]):
+        request = self._inflight.pop(key, None)
+        if request is None or duration < self.threshold or not request.samples:
+            return
+        self.profiled += 1
+        total = sum(request.samples.values())
+        profile = {
+            "method": request.method,
+            "path": request.path,
+            "status": status,
+            "duration_ms": round(duration * 1000, 1),
+            "stages_ms": {name: round(seconds * 1000, 1) for name, seconds in stages.items()},
+            "samples": total,
+            "stacks": [
+                {"kind": kind, "share": round(count / total, 3), "stack": list(stack)}
+                for (kind, stack), count in request.samples.most_common(self.top)
+            ],
+        }
+        self.recent.append(profile)
+        for hook in self.hooks:
+            try:
+                hook(profile)
+            except Exception as e:
+                log.warning("❌ Slow request hook failed: %s", e)
+
+    def _start(self):
+        self._loop_thread = threading.get_ident()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="slow-request-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread = None
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            now = time.perf_counter()
+            slow = [r for r in list(self._inflight.values()) if now - r.start >= self.threshold]
+            if not slow:
+                continue
+            running = _thread_stack(sys._current_frames().get(self._loop_thread))
+            for request in slow:
+                try:
+                    request.samples["awaiting", _await_stack(request.task)] += 1
+                except (RuntimeError, AttributeError):
+                    # The task moved on while we walked it
+                    continue
+                if running is not None:
+                    request.samples["loop", running] += 1
+                self.samples_taken += 1
+
+    def _log_profile(self, profile: Dict[str, Any]):
+        hottest = profile["stacks"][0] if profile["stacks"] else None
+        log.warning(
+            "🔬 Profiled slow request %s %s", profile["method"], profile["path"],
+            extra={
+                "duration_ms": profile["duration_ms"],
+                "samples": profile["samples"],
+                "top_kind": hottest and hottest["kind"],
+                "top_share": hottest and hottest["share"],
+                "top_frame": hottest and hottest["stack"][-1],
+            },
+        )
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "threshold_ms": self.threshold * 1000,
+            "interval_ms": self.interval * 1000,
+            "in_flight": len(self._inflight),
+            "profiled": self.profiled,
+            "samples_taken": self.samples_taken,
+            "recent": list(self.recent),
+        }
@@ -0,0 +1,220 @@
+"""
+Global cross-country event timeline.
+
+Events from every country are kept in one date-sorted list plus posting
+lists per category, per severity and per (category, severity) pair, all in
+the same order. A date range query is two bisects and a slice, so a page
+costs O(log n + page) however many countries there are. Lists are kept
+sorted on insert, never rebuilt.
+"""
+import base64
+import json
+from bisect import bisect_left, bisect_right, insort
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from shared_snapshot import PackedRows, pack_rows
+
+# (date, country_id, event_id): unique and naturally ordered by date
+TimelineKey = Tuple[str, str, str]
+
+# Sorts after any date sharing the prefix, so "2022" or "2022-12" bound a whole period
+_HIGH = "\uffff"
+
+
+def encode_cursor(key: TimelineKey) -> str:
+    return base64.urlsafe_b64encode("\x1f".join(key).encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(cursor: str) -> TimelineKey:
+    parts = base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8").split("\x1f")
+    if len(parts) != 3:
+        raise ValueError("malformed cursor")
+    return parts[0], parts[1], parts[2]
+
+
+def _decode_key(row: bytes) -> TimelineKey:
+    date, country_id, event_id = row.decode("utf-8").split("\x1f")
+    return date, country_id, event_id
+
+
+class _KeyList:
+    """Sorted keys of one published list: positions into the global key rows"""
+
+    def __init__(self, keys: PackedRows, positions: Optional[np.ndarray] = None):
+        self._keys = keys
+        self._positions = positions
+
+    def __len__(self) -> int:
+        return len(self._keys) if self._positions is None else len(self._positions)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        return self._keys[i if self._positions is None else int(self._positions[i])]
+
+
+class _PublishedEvents:
+    """Key -> event over the global rows, decoding one event per lookup"""
+
+    def __init__(self, keys: PackedRows, events: PackedRows):
+        self._keys = _KeyList(keys)
+        self._events = events
+
+    def __len__(self) -> int:
+        return len(self._events)
+
+    def __getitem__(self, key: TimelineKey) -> Any:
+        pos = bisect_left(self._keys, key)
+        if pos == len(self._keys) or self._keys[pos] != key:
+            raise KeyError(key)
+        return self._events[pos]
+
+
+class TimelineIndex:
+    def __init__(self):
+        # (category, severity) -> sorted keys; (None, None) is the global list
+        self._lists: Dict[Tuple[Optional[str], Optional[str]], List[TimelineKey]] = {(None, None): []}
+        self._events: Dict[TimelineKey, Any] = {}
+        self._country_keys: Dict[str, List[TimelineKey]] = {}
+        self._country_names: Dict[str, str] = {}
+        # Key -> (event, its JSON) from the last export; events are replaced, never changed
+        self._exported_events: Dict[TimelineKey, Tuple[Any, bytes]] = {}
+        self.read_only = False
+
+    def __len__(self) -> int:
+        return len(self._events)
+
+    def country_name(self, country_id: str) -> Optional[str]:
+        return self._country_names.get(country_id)
+
+    def _list_names(self, event) -> List[Tuple[Optional[str], Optional[str]]]:
+        return [(None, None), (event.category, None), (None, event.severity), (event.category, event.severity)]
+
+    def _insert(self, key: TimelineKey, event):
+        self._events[key] = event
+        for name in self._list_names(event):
+            insort(self._lists.setdefault(name, []), key)
+
+    def _remove(self, key: TimelineKey):
+        event = self._events.pop(key, None)
+        if event is None:
+            return
+        for name in self._list_names(event):
+            keys = self._lists[name]
+            pos = bisect_left(keys, key)
+            if pos < len(keys) and keys[pos] == key:
+                del keys[pos]
+
+    def _check_writable(self):
+        if self.read_only:
+            raise RuntimeError("this timeline was loaded from a shared snapshot and is read-only")
+
+    def index_country(self, country):
+        """Replace the timeline entries of one country"""
+        self._check_writable()
+        self.remove_country(country.id)
+        keys = []
+        for event in country.current_events:
+            key = (event.date or "", country.id, event.id)
+            if key in self._events:
+                # Listed twice with the same date: the later copy replaces the earlier one
+                self._remove(key)
+            else:
+                keys.append(key)
+            self._insert(key, event)
+        self._country_keys[country.id] = keys
+        self._country_names[country.id] = country.name
+
+    def remove_country(self, country_id: str):
+        """Drop the timeline entries of one country"""
+        self._check_writable()
+        for key in self._country_keys.pop(country_id, []):
+            self._remove(key)
+        self._country_names.pop(country_id, None)
+
+    # --- sharing between processes ---
+
+    def export(self) -> Dict[str, bytes]:
+        """The whole timeline as flat sections for a shared snapshot; see load().
+        Events are stored as their model JSON."""
+        keys = self._lists[(None, None)]
+        position = {key: i for i, key in enumerate(keys)}
+        lists, positions = [], []
+        for (category, severity), list_keys in self._lists.items():
+            if (category, severity) != (None, None):
+                lists.append([category, severity, len(positions), len(list_keys)])
+                positions.extend(position[key] for key in list_keys)
+        key_rows, key_offsets = pack_rows("\x1f".join(key).encode("utf-8") for key in keys)
+        previous, exported = self._exported_events, {}
+
+        def event_row(key: TimelineKey) -> bytes:
+            event = self._events[key]
+            entry = previous.get(key)
+            if entry is None or entry[0] is not event:
+                entry = event, event.model_dump_json().encode("utf-8")
+            exported[key] = entry
+            return entry[1]
+
+        events, event_offsets = pack_rows(event_row(key) for key in keys)
+        self._exported_events = exported
+        header = {"lists": lists, "country_names": self._country_names}
+        return {
+            "header": json.dumps(header, ensure_ascii=False).encode("utf-8"),
+            "keys": key_rows,
+            "key_offsets": key_offsets,
+            "events": events,
+            "event_offsets": event_offsets,
+            "positions": np.array(positions, dtype=np.int32).tobytes(),
+        }
+
+    @classmethod
+    def load(cls, sections: Dict[str, memoryview], decode_event: Callable[[bytes], Any]) -> "TimelineIndex":
+        """Read-only timeline over sections from export(); events are decoded per page"""
+        header = json.loads(bytes(sections["header"]))
+        keys = PackedRows(sections["keys"], sections["key_offsets"], _decode_key)
+        positions = np.frombuffer(sections["positions"], dtype=np.int32)
+        index = cls()
+        index._lists = {(None, None): _KeyList(keys)}
+        for category, severity, start, length in header["lists"]:
+            index._lists[(category, severity)] = _KeyList(keys, positions[start:start + length])
+        index._events = _PublishedEvents(keys, PackedRows(sections["events"], sections["event_offsets"], decode_event))
+        index._country_names = header["country_names"]
+        index.read_only = True
+        return index
+
+    def query(
+        self,
+        start: Optional[str] = None,
+        end: Optional[str] = None,
+        category: Optional[str] = None,
+        severity: Optional[str] = None,
+        cursor: Optional[str] = None,
+        limit: int = 50,
+        newest_first: bool = True,
+    ) -> Tuple[List[Tuple[TimelineKey, Any]], Optional[str]]:
+        """Return one page of (key, event) pairs and the cursor of the next page.
+        start/end are inclusive date prefixes ("2020", "2020-06", "2020-06-30")."""
+        keys = self._lists.get((category, severity), [])
+        lo = bisect_left(keys, (start,)) if start else 0
+        hi = bisect_right(keys, (end + _HIGH,)) if end else len(keys)
+
+        if cursor:
+            after = decode_cursor(cursor)
+            if newest_first:
+                hi = min(hi, bisect_left(keys, after))
+            else:
+                lo = max(lo, bisect_right(keys, after))
+
+        if newest_first:
+            page_lo = max(lo, hi - limit)
+            page = keys[page_lo:hi][::-1]
+            more = page_lo > lo
+        else:
+            page_hi = min(hi, lo + limit)
+            page = keys[lo:page_hi]
+            more = page_hi < hi
+
+        next_cursor = encode_cursor(page[-1]) if page and more else None
+        return [(key, self._events[key]) for key in page], next_cursor
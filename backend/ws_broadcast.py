@@ -0,0 +1,194 @@
+"""
+WebSocket fan-out with a bounded send queue per connection.
+
+Each connection gets a writer task that is the only thing sending on its
+socket. A broadcast encodes the message once and only enqueues the text, so
+it never waits on any client. When a slow client's queue is full the
+message is either dropped for that client ("drop") or the client is
+disconnected ("disconnect"). Sockets whose send fails are closed and removed.
+
+Connections can subscribe to topics ("country:<id>", "figure:<id>" or
+"all"); publish() reaches the topic's subscribers plus everyone on "all".
+"""
+import asyncio
+import json
+import re
+from typing import Any, Dict, List, Optional, Set
+
+SLOW_CONSUMER_POLICIES = ("drop", "disconnect")
+
+# "Try Again Later": the client fell too far behind
+CLOSE_SLOW_CONSUMER = 1013
+
+ALL_TOPIC = "all"
+TOPIC_RE = re.compile(r"^(all|(country|figure):[A-Za-z0-9_.-]{1,100})$")
+MAX_TOPICS_PER_CONNECTION = 256
+
+
+class Connection:
+    def __init__(self, websocket, broadcaster: "Broadcaster", queue_size: int):
+        self.websocket = websocket
+        self._broadcaster = broadcaster
+        self._queue: "asyncio.Queue[str]" = asyncio.Queue(maxsize=queue_size)
+        self._writer: Optional[asyncio.Task] = None
+        self.topics: Set[str] = set()
+        self.closed = False
+        # Set by close(), so send() stops waiting on a queue nobody drains anymore
+        self._closed_event = asyncio.Event()
+        self.dropped = 0
+
+    @property
+    def pending(self) -> int:
+        return self._queue.qsize()
+
+    def start(self):
+        self._writer = asyncio.create_task(self._write())
+
+    async def _write(self):
+        try:
+            while True:
+                text = await self._queue.get()
+                await self.websocket.send_text(text)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            # Half-dead socket: stop writing and prune it
+            self._broadcaster.send_errors += 1
+            self.close()
+
+    async def send(self, message: dict) -> bool:
+        """Queue a message for this connection only, waiting while its queue is full.
+        Returns False without waiting any longer once the connection is closed."""
+        if self.closed:
+            return False
+        text = json.dumps(message)
+        try:
+            self._queue.put_nowait(text)
+            return True
+        except asyncio.QueueFull:
+            pass
+        put = asyncio.ensure_future(self._queue.put(text))
+        closed = asyncio.ensure_future(self._closed_event.wait())
+        try:
+            await asyncio.wait((put, closed), return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            put.cancel()
+            closed.cancel()
+        return put.done() and not put.cancelled() and not self.closed
+
+    def offer(self, text: str) -> bool:
+        """Queue pre-encoded text without waiting; False if the connection could not take it"""
+        if self.closed:
+            return False
+        try:
+            self._queue.put_nowait(text)
+            return True
+        except asyncio.QueueFull:
+            pass
+        if self._broadcaster.slow_policy == "disconnect":
+            self._broadcaster.slow_disconnects += 1
+            self.close(CLOSE_SLOW_CONSUMER)
+        else:
+            self.dropped += 1
+            self._broadcaster.dropped += 1
+        return False
+
+    def close(self, code: Optional[int] = None):
+        if self.closed:
+            return
+        self.closed = True
+        self._closed_event.set()
+        self._broadcaster.connections.discard(self)
+        for topic in list(self.topics):
+            self._broadcaster.unsubscribe(self, topic)
+        if self._writer is not None and self._writer is not asyncio.current_task():
+            self._writer.cancel()
+        if code is not None:
+            asyncio.create_task(self._close_socket(code))
+
+    async def _close_socket(self, code: int):
+        try:
+            await self.websocket.close(code=code)
+        except Exception:
+            pass
+
+
+class Broadcaster:
+    def __init__(self, queue_size: int = 256, slow_policy: str = "drop"):
+        if slow_policy not in SLOW_CONSUMER_POLICIES:
+            raise ValueError(f"slow_policy must be one of {SLOW_CONSUMER_POLICIES}, got {slow_policy!r}")
+        self.queue_size = queue_size
+        self.slow_policy = slow_policy
+        self.connections: Set[Connection] = set()
+        self.topics: Dict[str, Set[Connection]] = {}
+        self.broadcasts = 0
+        self.published = 0
+        self.dropped = 0
+        self.slow_disconnects = 0
+        self.send_errors = 0
+
+    async def connect(self, websocket) -> Connection:
+        await websocket.accept()
+        connection = Connection(websocket, self, self.queue_size)
+        connection.start()
+        self.connections.add(connection)
+        return connection
+
+    def disconnect(self, connection: Connection):
+        connection.close()
+
+    def broadcast(self, message: Dict[str, Any]) -> int:
+        """Encode once and enqueue for every connection; returns how many accepted it"""
+        self.broadcasts += 1
+        text = json.dumps(message)
+        # Copy: offer() may prune connections while we iterate
+        return sum(connection.offer(text) for connection in list(self.connections))
+
+    # --- topics ---
+
+    def subscribe(self, connection: Connection, topics: List[str]) -> List[str]:
+        """Subscribe to the valid topics among topics; returns the ones accepted"""
+        accepted = []
+        for topic in topics:
+            if not isinstance(topic, str) or not TOPIC_RE.match(topic):
+                continue
+            if topic not in connection.topics and len(connection.topics) >= MAX_TOPICS_PER_CONNECTION:
+                break
+            connection.topics.add(topic)
+            self.topics.setdefault(topic, set()).add(connection)
+            accepted.append(topic)
+        return accepted
+
+    def unsubscribe(self, connection: Connection, topic: str):
+        connection.topics.discard(topic)
+        subscribers = self.topics.get(topic)
+        if subscribers is not None:
+            subscribers.discard(connection)
+            if not subscribers:
+                del self.topics[topic]
+
+    def has_subscribers(self, topic: str) -> bool:
+        return topic in self.topics or ALL_TOPIC in self.topics
+
+    def publish(self, topic: str, message: Dict[str, Any]) -> int:
+        """Encode once and enqueue for the subscribers of topic and of ALL_TOPIC"""
+        subscribers = self.topics.get(topic, set()) | self.topics.get(ALL_TOPIC, set())
+        if not subscribers:
+            return 0
+        self.published += 1
+        text = json.dumps({"topic": topic, **message})
+        return sum(connection.offer(text) for connection in subscribers)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "connections": len(self.connections),
+            "queued": sum(connection.pending for connection in self.connections),
+            "queue_size": self.queue_size,
+            "slow_policy": self.slow_policy,
+            "topics": len(self.topics),
+            "broadcasts": self.broadcasts,
+            "published": self.published,
+            "dropped": self.dropped,
+            "slow_disconnects": self.slow_disconnects,
+            "send_errors": self.send_errors,
+        }
@@ -1,15 +1,17 @@
 import React, { useState, useRef, useEffect } from 'react'
 import { MessageCircle, X, Send, Loader } from 'lucide-react'
 import { useAppStore } from '../services/store'
-import { sendChatMessage } from '../services/api'
+import { streamChatMessage } from '../services/api'
 import './ChatWidget.css'
 
 const ChatWidget = () => {
   const { isChatOpen, toggleChat, closeChat, chatHistory, addChatMessage, chatContext } = useAppStore()
   const [inputMessage, setInputMessage] = useState('')
   const [isLoading, setIsLoading] = useState(false)
+  const [streamingText, setStreamingText] = useState('')
   const messagesEndRef = useRef(null)
   const inputRef = useRef(null)
+  const abortRef = useRef(null)
 
   const scrollToBottom = () => {
     messagesEndRef.current?.scrollIntoView({ behavior: 'smooth' })
@@ -17,7 +19,10 @@ const ChatWidget = () => {
 
   useEffect(() => {
     scrollToBottom()
-  }, [chatHistory])
+  }, [chatHistory, streamingText])
+
+  // Abort an in-flight answer when the widget unmounts
+  useEffect(() => () => abortRef.current?.abort(), [])
 
   useEffect(() => {
     if (isChatOpen && inputRef.current) {
@@ -36,12 +41,16 @@ const ChatWidget = () => {
     addChatMessage(userMessage)
     setInputMessage('')
     setIsLoading(true)
+    setStreamingText('')
+    abortRef.current = new AbortController()
 
     try {
-      const response = await sendChatMessage(
+      const response = await streamChatMessage(
         inputMessage,
         chatContext,
-        chatHistory
+        chatHistory,
+        (text) => setStreamingText((prev) => prev + text),
+        abortRef.current.signal
       )
 
       console.log('✅ Chat API Response:', response)
@@ -57,6 +66,7 @@ const ChatWidget = () => {
 
       addChatMessage(assistantMessage)
     } catch (error) {
+      if (error.name === 'AbortError') return
       console.error('❌ Chat error:', error)
       console.error('Error details:', error.message, error.stack)
       
@@ -75,6 +85,7 @@ const ChatWidget = () => {
       })
     } finally {
       setIsLoading(false)
+      setStreamingText('')
     }
   }
 
@@ -136,8 +147,14 @@ const ChatWidget = () => {
                 {isLoading && (
                   <div className="chat-message assistant">
                     <div className="message-content">
-                      <Loader size={16} className="spinner" />
-                      <span>Thinking...</span>
+                      {streamingText ? (
+                        streamingText
+                      ) : (
+                        <>
+                          <Loader size={16} className="spinner" />
+                          <span>Thinking...</span>
+                        </>
+                      )}
                     </div>
                   </div>
                 )}
@@ -1,11 +1,59 @@
-import React from 'react'
+import React, { useEffect, useState } from 'react'
+import { Link } from 'react-router-dom'
+import { analyzeText } from '../services/api'
 import './HighlightedText.css'
 
+// Entities are resolved locally on the backend, so one small request per text is cheap;
+// results are still memoized so re-renders never hit the API twice for the same text.
+const entityCache = new Map()
+
 const HighlightedText = ({ text, countryContext = null }) => {
-  // Simple component - just display text without AI analysis
-  // This makes the app stable and fast
+  // Entities are kept with the text they were found in: offsets of a previous text
+  // must never be applied to a new one while its analysis is in flight
+  const [analysis, setAnalysis] = useState(() => ({ text, entities: entityCache.get(text) || [] }))
+  const entities = analysis.text === text ? analysis.entities : entityCache.get(text) || []
+
+  useEffect(() => {
+    setAnalysis({ text, entities: entityCache.get(text) || [] })
+    if (!text || entityCache.has(text)) return
+
+    let cancelled = false
+    analyzeText(text, countryContext)
+      .then((result) => {
+        entityCache.set(text, result.entities || [])
+        if (!cancelled) setAnalysis({ text, entities: result.entities || [] })
+      })
+      .catch((error) => {
+        console.error('❌ Text analysis error:', error)
+      })
+
+    return () => {
+      cancelled = true
+    }
+  }, [text, countryContext])
+
+  if (!text || entities.length === 0) {
+    return <div className="highlighted-text">{text}</div>
+  }
+
+  const segments = []
+  let cursor = 0
+  entities.forEach((entity, idx) => {
+    if (entity.start < cursor || entity.end > text.length) return
+    if (entity.start > cursor) {
+      segments.push(text.slice(cursor, entity.start))
+    }
+    const path = entity.type === 'figure' ? `/figure/${entity.id}` : `/country/${entity.id}`
+    segments.push(
+      <Link key={idx} to={path} className={`highlighted-entity ${entity.type}`}>
+        {text.slice(entity.start, entity.end)}
+      </Link>
+    )
+    cursor = entity.end
+  })
+  segments.push(text.slice(cursor))
 
-  return <div className="highlighted-text">{text}</div>
+  return <div className="highlighted-text">{segments}</div>
 }
 
 export default HighlightedText
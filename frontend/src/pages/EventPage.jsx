@@ -18,7 +18,7 @@ import {
   ChevronRight,
   BookOpen
 } from 'lucide-react'
-import { getCountry, listCountries, listFigures } from '../services/api'
+import { getCountry, listCountries, listFigures, subscribeToUpdates } from '../services/api'
 import { useAppStore } from '../services/store'
 import { getGroupKey, getGroupMembers } from '../data/countryGroups'
 import HighlightedText from '../components/HighlightedText'
@@ -49,7 +49,7 @@ const SEVERITY_COLORS = {
 const EventPage = () => {
   const { countryId, eventId } = useParams()
   const navigate = useNavigate()
-  const { countries: storeCountries, setCountries } = useAppStore()
+  const { countries: storeCountries, setCountries, applyCountryUpdate } = useAppStore()
   const [country, setCountry] = useState(null)
   const [event, setEvent] = useState(null)
   const [loading, setLoading] = useState(true)
@@ -78,6 +78,17 @@ const EventPage = () => {
     loadEvent()
   }, [countryId, eventId])
 
+  // Live updates to this country (e.g. regenerated events) without re-fetching
+  useEffect(() => {
+    return subscribeToUpdates([`country:${countryId}`], (update) => {
+      if (update.type !== 'country.update' || update.id !== countryId) return
+      applyCountryUpdate(update.id, update.fields)
+      setCountry((prev) => (prev ? { ...prev, ...update.fields } : prev))
+      const updatedEvent = update.fields.current_events?.find((e) => e.id === eventId)
+      if (updatedEvent) setEvent(updatedEvent)
+    })
+  }, [countryId, eventId])
+
   useEffect(() => {
     if (countries.length === 0) {
       listCountries().then((data) => {
@@ -3,11 +3,11 @@ import { Globe, Search, ChevronUp, ChevronDown, Trophy } from 'lucide-react'
 import WorldMap from '../components/WorldMap'
 import ChatWidget from '../components/ChatWidget'
 import { useAppStore } from '../services/store'
-import { listCountries } from '../services/api'
+import { listCountries, subscribeToUpdates } from '../services/api'
 import './WorldMapPage.css'
 
 const WorldMapPage = () => {
-  const { countries, setCountries, openQuiz } = useAppStore()
+  const { countries, setCountries, applyCountryUpdate, removeCountry, openQuiz } = useAppStore()
   const [searchQuery, setSearchQuery] = useState('')
   const [isHeaderCollapsed, setIsHeaderCollapsed] = useState(false)
   const searchRef = React.useRef(null)
@@ -16,6 +16,14 @@ const WorldMapPage = () => {
     loadCountries()
   }, [])
 
+  // Keep the list current from /ws deltas instead of re-fetching it
+  useEffect(() => {
+    return subscribeToUpdates(['all'], (update) => {
+      if (update.type === 'country.update') applyCountryUpdate(update.id, update.fields)
+      else if (update.type === 'country.remove') removeCountry(update.id)
+    })
+  }, [])
+
   // Close search results when clicking outside
   useEffect(() => {
     const handleClickOutside = (event) => {
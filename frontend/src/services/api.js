@@ -20,6 +20,55 @@ export const sendChatMessage = async (message, context = null, history = []) =>
   return response.data
 }
 
+// Streaming chat: calls onDelta(text) for each fragment, resolves with the full answer
+export const streamChatMessage = async (message, context = null, history = [], onDelta = () => {}, signal = undefined) => {
+  const response = await fetch(`${API_BASE}/api/chat/stream`, {
+    method: 'POST',
+    headers: { 'Content-Type': 'application/json' },
+    body: JSON.stringify({ message, context, history }),
+    signal,
+  })
+
+  if (!response.ok) {
+    const error = new Error(`Chat stream failed with status ${response.status}`)
+    error.response = { status: response.status }
+    throw error
+  }
+
+  const reader = response.body.getReader()
+  const decoder = new TextDecoder()
+  let buffer = ''
+
+  while (true) {
+    const { done, value } = await reader.read()
+    if (done) break
+    buffer += decoder.decode(value, { stream: true })
+
+    let boundary
+    while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+      const rawEvent = buffer.slice(0, boundary)
+      buffer = buffer.slice(boundary + 2)
+
+      const eventName = rawEvent.match(/^event: (.*)$/m)?.[1]
+      const dataLine = rawEvent.match(/^data: (.*)$/m)?.[1]
+      if (!eventName || !dataLine) continue
+      const data = JSON.parse(dataLine)
+
+      if (eventName === 'delta') {
+        onDelta(data.text)
+      } else if (eventName === 'done') {
+        return data
+      } else if (eventName === 'error') {
+        const error = new Error(data.detail)
+        error.response = { status: data.status }
+        throw error
+      }
+    }
+  }
+
+  throw new Error('Chat stream ended unexpectedly')
+}
+
 // Text Analysis API
 export const analyzeText = async (text, countryContext = null) => {
   const response = await api.post('/api/analyze-text', {
@@ -87,4 +136,17 @@ export const connectWebSocket = (onMessage) => {
   return ws
 }
 
+// Live data pushes over /ws. topics: 'all', 'country:<id>', 'figure:<id>'.
+// onUpdate receives country.update / figure.update frames (changed fields only)
+// and country.remove / figure.remove. Returns a function that closes the socket.
+export const subscribeToUpdates = (topics, onUpdate) => {
+  const ws = connectWebSocket((data) => {
+    if (/^(country|figure)\.(update|remove)$/.test(data.type || '')) onUpdate(data)
+  })
+  ws.addEventListener('open', () => {
+    ws.send(JSON.stringify({ type: 'subscribe', topics }))
+  })
+  return () => ws.close()
+}
+
 export default api
@@ -18,6 +18,18 @@ export const useAppStore = create((set) => ({
   // Actions
   setCountries: (countries) => set({ countries }),
   setCurrentCountry: (country) => set({ currentCountry: country }),
+  // Live /ws deltas: merge the changed fields into the cached countries
+  applyCountryUpdate: (id, fields) => set((state) => ({
+    countries: state.countries.some((c) => c.id === id)
+      ? state.countries.map((c) => (c.id === id ? { ...c, ...fields } : c))
+      : [...state.countries, { id, ...fields }],
+    currentCountry: state.currentCountry?.id === id
+      ? { ...state.currentCountry, ...fields }
+      : state.currentCountry,
+  })),
+  removeCountry: (id) => set((state) => ({
+    countries: state.countries.filter((c) => c.id !== id),
+  })),
   
   toggleChat: () => set((state) => ({ isChatOpen: !state.isChatOpen })),
   openChat: () => set({ isChatOpen: true }),